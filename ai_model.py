@@ -1,41 +1,81 @@
 import random
 import datetime
+import json
+import logging
 from openai import OpenAI
 import requests
-import os
-from dotenv import load_dotenv
-from personality_prompt import PersonalityPrompt
+import functools
+from personality_prompt import personality_prompts
 from constants.action_types import ActionType
+from settings import get_settings
+from services.priority_scheduler import llm_scheduler
 
-try:
-    load_dotenv()
-except:
-    pass
+# RRULE weekday codes, Monday first
+WEEKDAY_CODES = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+# Weeks a repeating event runs when the text doesn't say when it ends; never open-ended
+WEEKLY_DEFAULT_WEEKS = 12
+
+# Batched generation packs many items into one request. Sizes are bounded by a rough
+# character budget (~4 characters per token) on both the prompt and the expected answer
+BATCH_MAX_ITEMS = 25
+BATCH_MAX_PROMPT_CHARS = 16000
+BATCH_MAX_OUTPUT_CHARS = 6000
+BATCH_MAX_ATTEMPTS = 3
+
+# (connect, read) seconds for LLM requests; calls hold a priority_scheduler slot, so a hung
+# connection must give the slot back eventually
+GROK_TIMEOUT = (5, 60)
+OPENAI_TIMEOUT = 60
 
 # Tasks:
 # 1. Repeat messages until user responds
 # 2. Make the messages actually funny/ entertaining
 # 3. Make other people able to use this app
 
+@functools.lru_cache(maxsize=8)
+def _openai_client(api_key: str) -> OpenAI:
+    return OpenAI(api_key=api_key, timeout=OPENAI_TIMEOUT)
+
+
 class AIModel:
     def __init__(self):
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        self.model = "gpt-4.1-mini"
+        # Construction is cheap: everything comes from the current settings snapshot
+        settings = get_settings()
+        self.openai_api_key = settings.openai_api_key
+        self.model = settings.openai_model
         self.use_grok = True
-        self.grok_api_key = os.getenv('GROK_API_KEY')
+        self.grok_api_key = settings.grok_api_key
         self.grok_base_url = "https://api.x.ai/v1"
-        self.grok_model = "grok-4-latest"
-        self.personality_prompt = PersonalityPrompt()
-        self.personality = self.personality_prompt.get_prompt("schmidt")
+        self.grok_model = settings.grok_model
+        self.embedding_model = "text-embedding-3-small"
+        self.embedding_dim = 1536
+        self.personality_prompt = personality_prompts
+        self._personality_name = None
+        self._personality = None
 
-    def _call_grok_api(self, user_message: str, system_prompt: str = "") -> str:
+    @property
+    def personality(self) -> str:
+        """System prompt for the configured personality; follows settings reloads, so long-lived models pick up a change"""
+        name = get_settings().personality
+        if name != self._personality_name:
+            # "random" picks once per model, not once per call
+            self._personality_name = name
+            self._personality = self.personality_prompt.get_prompt(name)
+        return self._personality
+
+    @property
+    def client(self) -> OpenAI:
+        """OpenAI client, created on first use and shared by models with the same key"""
+        return _openai_client(self.openai_api_key)
+
+    def _call_grok_api(self, user_message: str, system_prompt: str = "", history: list[dict] = None) -> str:
         headers = {
             "Authorization": f"Bearer {self.grok_api_key}",
             "Content-Type": "application/json"
         }
     
         data = {
-            "messages": [
+            "messages": (history or []) + [
                 {"role": "user", "content": user_message + " " + system_prompt}
             ],
             "model": self.grok_model,
@@ -43,13 +83,22 @@ class AIModel:
             "temperature": 0.7
         }
         
-        response = requests.post(f"https://api.x.ai/v1/chat/completions", headers=headers, json=data)
+        with llm_scheduler.slot():
+            response = requests.post(f"https://api.x.ai/v1/chat/completions", headers=headers, json=data,
+                                     timeout=GROK_TIMEOUT)
         response.raise_for_status()
         return response.json()["choices"][0]["message"]["content"]
     
-    def first_message(self, user_interests: str) -> str:
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        """Embed a batch of texts in one request"""
+        with llm_scheduler.slot():
+            response = self.client.embeddings.create(model=self.embedding_model, input=texts)
+        return [item.embedding for item in response.data]
+
+    def first_message(self, user_interests: str, history: list[dict] = None, personality: str = None) -> str:
         user_message = f"Based on the user's interests: {user_interests}. Generate a motivating, rude question to get them started on their habits. Keep it under 100 characters. Return only the question, nothing else."
-        return self._call_grok_api(user_message, self.personality)
+        system_prompt = self.personality_prompt.get_prompt(personality) if personality else self.personality
+        return self._call_grok_api(user_message, system_prompt, history)
     
     # Given a user's input, choose a tag for the note
     def choose_tag(self, user_input: str, tags: list[str]):
@@ -92,65 +141,283 @@ class AIModel:
             
             return response.output_text
     
-    def choose_action_type(self, user_input: str):
-        return ActionType.HABITIFY
-    
-    def habitify_action(self, user_input: str, actions: list[str]) -> str:
-        prompt = f"""Based on this text, choose the most appropriate action from these options:
-            {actions}
+    def first_messages(self, user_interests: list[str], personality: str = None) -> list[str]:
+        """Batch variant of first_message: one conversation starter per entry of `user_interests`"""
+        system_prompt = self.personality_prompt.get_prompt(personality) if personality else self.personality
+        instructions = """For each item, generate a motivating, rude question to get the user started on their habits,
+            based on the item's interests. Keep each question under 100 characters."""
+        return self._generate_batch(
+            [{"interests": interests} for interests in user_interests],
+            instructions,
+            lambda result, item: result.strip() if isinstance(result, str) and 0 < len(result.strip()) <= 150 else None,
+            lambda item: self.first_message(item["interests"], personality=personality),
+            output_chars=120,
+            system_prompt=system_prompt
+        )
 
-            Text: "{user_input}"
+    def choose_tags(self, user_inputs: list[str], tags: list[str]) -> list[str]:
+        """Batch variant of choose_tag: one tag from `tags` per entry of `user_inputs`"""
+        by_name = {tag.lower(): tag for tag in tags}
+        instructions = f"""For each item, choose the most appropriate tag for its text from these options:
+            {tags}
+            The result must be exactly one of the option names."""
+        return self._generate_batch(
+            [{"text": user_input} for user_input in user_inputs],
+            instructions,
+            lambda result, item: by_name.get(result.strip().lower()) if isinstance(result, str) else None,
+            lambda item: self.choose_tag(item["text"], tags),
+            output_chars=max((len(tag) for tag in tags), default=0) + 20
+        )
+
+    def choose_titles(self, user_inputs: list[str]) -> list[str]:
+        """Batch variant of choose_title: one title per entry of `user_inputs`"""
+        date = datetime.datetime.now().strftime("%Y-%m-%d")
+        instructions = f"""For each item, generate a concise, descriptive title (under 20 characters) for its text.
+            If it's a daily log, use today's date format: YYYY-MM-DD - {date} as the title.
+            Otherwise, create a meaningful title that captures the essence."""
+        return self._generate_batch(
+            [{"text": user_input} for user_input in user_inputs],
+            instructions,
+            lambda result, item: result.strip() if isinstance(result, str) and 0 < len(result.strip()) <= 60 else None,
+            lambda item: self.choose_title(item["text"]),
+            output_chars=60
+        )
+
+    def _generate_batch(self, items: list[dict], instructions: str, validate, fallback,
+                        output_chars: int, system_prompt: str = "") -> list:
+        """
+        Run one task over many items with as few requests as possible
+
+        Items are packed into requests asking for a JSON array of {"id", "result"}.
+        Each element is checked with `validate(result, item)` (returns the cleaned value
+        or None); only items without a valid result are sent again. Items still failing
+        after BATCH_MAX_ATTEMPTS rounds go through `fallback(item)`, the single-item call.
+        """
+        # Shrinks when a batch comes back unusable, grows back after clean batches. Local to
+        # the call, since one model is shared by several threads
+        batch_size = BATCH_MAX_ITEMS
+        results = [None] * len(items)
+        pending = list(range(len(items)))
+        for _ in range(BATCH_MAX_ATTEMPTS):
+            if not pending:
+                break
+            failed = []
+            for chunk in self._batch_chunks(pending, items, len(instructions), output_chars, batch_size):
+                payload = json.dumps([{"id": i, **items[i]} for i in chunk], ensure_ascii=False)
+                prompt = f"""{instructions}
+
+Items:
+{payload}
+
+Return a JSON array with one object per item: {{"id": <the item's id>, "result": <string>}}.
+Return ONLY valid JSON, nothing else."""
+
+                answered = {}
+                try:
+                    response = self._call_grok_api(prompt, system_prompt)
+                    start_idx = response.find('[')
+                    end_idx = response.rfind(']') + 1
+                    if start_idx == -1 or end_idx <= start_idx:
+                        raise ValueError("No JSON array found in response")
+                    for element in json.loads(response[start_idx:end_idx]):
+                        if isinstance(element, dict) and element.get("id") in chunk:
+                            value = validate(element.get("result"), items[element["id"]])
+                            if value is not None:
+                                answered[element["id"]] = value
+                except (requests.RequestException, json.JSONDecodeError, ValueError, TypeError) as e:
+                    logging.warning(f"Batch of {len(chunk)} items failed: {e}")
+
+                for i in chunk:
+                    if i in answered:
+                        results[i] = answered[i]
+                    else:
+                        failed.append(i)
+
+                # Unusable answers usually mean the batch was too big for the model's limits
+                if len(answered) < len(chunk) / 2:
+                    batch_size = max(1, len(chunk) // 2)
+                elif len(answered) == len(chunk):
+                    batch_size = min(BATCH_MAX_ITEMS, batch_size + max(1, batch_size // 2))
+            pending = failed
+
+        for i in pending:
+            results[i] = fallback(items[i])
+        return results
+
+    def _batch_chunks(self, indices: list[int], items: list[dict], overhead: int, output_chars: int,
+                      batch_size: int = BATCH_MAX_ITEMS):
+        """Split `indices` into batches within the item, prompt and output budgets"""
+        max_items = max(1, min(batch_size, BATCH_MAX_OUTPUT_CHARS // max(1, output_chars + 20)))
+        chunk, chunk_chars = [], overhead
+        for i in indices:
+            item_chars = len(json.dumps(items[i], ensure_ascii=False)) + 20
+            if chunk and (len(chunk) >= max_items or chunk_chars + item_chars > BATCH_MAX_PROMPT_CHARS):
+                yield chunk
+                chunk, chunk_chars = [], overhead
+            chunk.append(i)
+            chunk_chars += item_chars
+        if chunk:
+            yield chunk
+
+    def answer_from_notes(self, question: str, notes: list[dict], history: list[dict] = None) -> str:
+        """Answer a question about the user from the top-ranked snippets of their notes"""
+        if not notes:
+            return "I couldn't find anything about that in your notes."
+
+        context = "\n".join(
+            f"- [{datetime.datetime.fromtimestamp(note['created_ts']).strftime('%Y-%m-%d')}] {note['title']}: {note['snippet']}"
+            for note in notes
+        )
+        prompt = f"""Answer the question using only these excerpts from the user's notes:
+            {context}
+
+            Question: "{question}"
+
+            If the excerpts don't answer it, say so. Keep it under 300 characters."""
+
+        return self._call_grok_api(prompt, self.personality, history)
+
+    def summarize_conversation(self, summary: str, turns: list[dict]) -> str:
+        """Fold older turns into the rolling summary of a conversation"""
+        transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+        prompt = f"""Update this summary of a text conversation with a user to include the new messages.
+            Keep facts about the user, their habits and anything they asked to be reminded of.
 
-            Return only the action, nothing else."""
+            Current summary: "{summary}"
+
+            New messages:
+            {transcript}
+
+            Return only the updated summary, under 800 characters."""
 
         return self._call_grok_api(prompt)
 
+    def choose_action_type(self, user_input: str, options: dict = None) -> ActionType:
+        """
+        Classify a reply into one of the offered action types
+
+        Args:
+            options: ActionType -> description of when it applies (default: every action type)
+
+        Returns:
+            ActionType: ActionType.ERROR when the answer isn't one of the options
+        """
+        if options is None:
+            options = {action_type: action_type.value for action_type in ActionType if action_type != ActionType.ERROR}
+        if not options:
+            return ActionType.ERROR
+        choices = "\n".join(f"- {action_type.name}: {description}" for action_type, description in options.items())
+        prompt = f"""Decide what the user wants done with this text message. Options:
+            {choices}
+
+            Text: "{user_input}"
+
+            Return only the option name, nothing else."""
+
+        answer = self._call_grok_api(prompt).strip().strip('"\'.` ').upper()
+        for action_type in options:
+            if answer in (action_type.name, action_type.value.upper()):
+                return action_type
+        return ActionType.ERROR
+
     def parse_calendar_event(self, user_input: str) -> dict:
         """
-        Parse natural language text into calendar event details
+        Parse natural language text into a single calendar event
         Returns dict with: summary, start_datetime, end_datetime, description
         """
+        return self.parse_calendar_events(user_input)[0]
+
+    def parse_calendar_events(self, user_input: str) -> list[dict]:
+        """
+        Parse natural language text into one or more calendar events
+        Returns list of dicts with: summary, start_datetime, end_datetime, description
+        and, for weekly patterns, recurrence (list of RRULE strings, always bounded by UNTIL or COUNT)
+        """
         current_datetime = datetime.datetime.now()
-        prompt = f"""Parse this text into calendar event details. Today is {current_datetime.strftime('%A, %B %d, %Y')} at {current_datetime.strftime('%I:%M %p')}.
+        prompt = f"""Parse this text into calendar events. Today is {current_datetime.strftime('%A, %B %d, %Y')} at {current_datetime.strftime('%I:%M %p')}.
 
 Text: "{user_input}"
 
-Return a JSON object with these fields:
+Return a JSON array with one object per distinct event, with these fields:
 - summary: (string) A concise event title
-- start_datetime: (ISO 8601 format) When the event starts
+- start_datetime: (ISO 8601 format) When the event starts. For repeating events, the first occurrence
 - end_datetime: (ISO 8601 format) When the event ends (if not specified, default to 1 hour after start)
 - description: (string) Any additional details from the text
+- weekly_days: (optional list) If the event repeats on certain weekdays, the days as MO, TU, WE, TH, FR, SA, SU
+- repeat_until: (optional, YYYY-MM-DD) For repeating events, the last day it repeats, only if the text says when it ends
+
+Something that repeats on several weekdays is ONE event with weekly_days, not one event per day.
 
 Example response format:
-{{"summary": "Team Meeting", "start_datetime": "2025-11-24T14:00:00", "end_datetime": "2025-11-24T15:00:00", "description": "Discuss project updates"}}
+[{{"summary": "Gym", "start_datetime": "2025-11-24T07:00:00", "end_datetime": "2025-11-24T08:00:00", "description": "", "weekly_days": ["MO", "WE", "FR"], "repeat_until": "2026-01-31"}},
+ {{"summary": "Dentist", "start_datetime": "2025-11-27T14:00:00", "end_datetime": "2025-11-27T15:00:00", "description": ""}}]
 
 Return ONLY valid JSON, nothing else."""
 
         response = self._call_grok_api(prompt)
 
         # Parse the JSON response
-        import json
         try:
-            # Clean up response in case there's extra text
-            start_idx = response.find('{')
-            end_idx = response.rfind('}') + 1
-            if start_idx != -1 and end_idx > start_idx:
-                json_str = response[start_idx:end_idx]
-                event_data = json.loads(json_str)
-
-                # Convert ISO strings to datetime objects
-                event_data['start_datetime'] = datetime.datetime.fromisoformat(event_data['start_datetime'])
-                event_data['end_datetime'] = datetime.datetime.fromisoformat(event_data['end_datetime'])
-
-                return event_data
-            else:
-                raise ValueError("No JSON found in response")
-        except (json.JSONDecodeError, ValueError, KeyError) as e:
+            return self._parse_calendar_response(response)
+        except (json.JSONDecodeError, ValueError, KeyError, TypeError) as e:
             # Return default event if parsing fails
             start_time = current_datetime + datetime.timedelta(hours=1)
-            return {
+            return [{
                 'summary': user_input[:50],  # Use first 50 chars as title
                 'start_datetime': start_time,
                 'end_datetime': start_time + datetime.timedelta(hours=1),
                 'description': user_input
-            }
\ No newline at end of file
+            }]
+
+    def _parse_calendar_response(self, response: str) -> list[dict]:
+        """
+        Events from a parse_calendar_events answer
+
+        Raises:
+            json.JSONDecodeError, ValueError, KeyError, TypeError: The answer is not usable
+        """
+        # Clean up response in case there's extra text
+        start_idx = response.find('[')
+        end_idx = response.rfind(']') + 1
+        object_idx = response.find('{')
+        if start_idx == -1 or end_idx <= start_idx or -1 < object_idx < start_idx:
+            # Tolerate a single bare object (whose weekly_days list is not the outer array)
+            start_idx = object_idx
+            end_idx = response.rfind('}') + 1
+        if start_idx == -1 or end_idx <= start_idx:
+            raise ValueError("No JSON found in response")
+        parsed = json.loads(response[start_idx:end_idx])
+        if isinstance(parsed, dict):
+            parsed = [parsed]
+        if not parsed:
+            raise ValueError("No events in response")
+        return [self._to_calendar_event(event_data) for event_data in parsed]
+
+    def _to_calendar_event(self, event_data: dict) -> dict:
+        # Convert ISO strings to datetime objects
+        event = {
+            'summary': event_data['summary'],
+            'start_datetime': datetime.datetime.fromisoformat(event_data['start_datetime']),
+            'end_datetime': datetime.datetime.fromisoformat(event_data['end_datetime']),
+            'description': event_data.get('description', '')
+        }
+
+        weekly_days = event_data.get('weekly_days')
+        if weekly_days:
+            days = [day.upper()[:2] for day in weekly_days]
+            if any(day not in WEEKDAY_CODES for day in days):
+                raise ValueError(f"Invalid weekly_days: {weekly_days}")
+            # Keep weekday order stable so identical patterns produce identical rules
+            days = sorted(set(days), key=WEEKDAY_CODES.index)
+            rule = f"RRULE:FREQ=WEEKLY;BYDAY={','.join(days)}"
+            if event_data.get('repeat_until'):
+                until = datetime.date.fromisoformat(event_data['repeat_until'][:10])
+                if until < event['start_datetime'].date():
+                    raise ValueError(f"repeat_until {until} is before the first occurrence")
+                # RFC 5545: with a zoned start, UNTIL is given in UTC; the end of that day covers it
+                rule += f";UNTIL={until.strftime('%Y%m%d')}T235959Z"
+            else:
+                rule += f";COUNT={WEEKLY_DEFAULT_WEEKS * len(days)}"
+            event['recurrence'] = [rule]
+
+        return event
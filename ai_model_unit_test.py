@@ -0,0 +1,191 @@
+import datetime
+import json
+import os
+import unittest
+from unittest.mock import patch
+from ai_model import AIModel, BATCH_MAX_ITEMS, GROK_TIMEOUT
+from api_interaction.textbot import Textbot, TEXTBELT_TIMEOUT
+from constants.action_types import ActionType
+from personality_prompt import personality_prompts
+from settings import Settings
+
+
+class TestParseCalendarEvents(unittest.TestCase):
+    """Test suite for AIModel.parse_calendar_events, with the LLM call mocked"""
+
+    def setUp(self):
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            self.ai_model = AIModel()
+
+    def test_multiple_events_with_weekly_pattern(self):
+        """A weekly pattern becomes one recurring event next to one-off events"""
+        response = """[
+            {"summary": "Gym", "start_datetime": "2025-11-24T07:00:00", "end_datetime": "2025-11-24T08:00:00",
+             "description": "", "weekly_days": ["FR", "mo", "WE"]},
+            {"summary": "Dentist", "start_datetime": "2025-11-27T14:00:00", "end_datetime": "2025-11-27T15:00:00",
+             "description": ""}
+        ]"""
+        with patch.object(self.ai_model, "_call_grok_api", return_value=response):
+            events = self.ai_model.parse_calendar_events("gym mon wed fri 7am and dentist thursday 2pm")
+
+        self.assertEqual(len(events), 2)
+        self.assertEqual(events[0]["recurrence"], ["RRULE:FREQ=WEEKLY;BYDAY=MO,WE,FR;COUNT=36"])
+        self.assertEqual(events[0]["start_datetime"], datetime.datetime(2025, 11, 24, 7, 0))
+        self.assertNotIn("recurrence", events[1])
+
+    def test_repeat_until_bounds_the_rule(self):
+        """An end date from the text becomes UNTIL; one before the start is rejected"""
+        response = """{"summary": "Gym", "start_datetime": "2025-11-24T07:00:00", "end_datetime": "2025-11-24T08:00:00",
+                       "weekly_days": ["MO"], "repeat_until": "2025-12-31"}"""
+        with patch.object(self.ai_model, "_call_grok_api", return_value=response):
+            events = self.ai_model.parse_calendar_events("gym mondays until new year")
+        self.assertEqual(events[0]["recurrence"], ["RRULE:FREQ=WEEKLY;BYDAY=MO;UNTIL=20251231T235959Z"])
+
+        with self.assertRaises(ValueError):
+            self.ai_model._parse_calendar_response(response.replace("2025-12-31", "2025-01-01"))
+
+    def test_single_object_response(self):
+        """A bare JSON object is still accepted"""
+        response = '{"summary": "Call mom", "start_datetime": "2025-11-24T18:00:00", "end_datetime": "2025-11-24T18:30:00"}'
+        with patch.object(self.ai_model, "_call_grok_api", return_value=response):
+            event = self.ai_model.parse_calendar_event("call mom at 6")
+
+        self.assertEqual(event["summary"], "Call mom")
+        self.assertEqual(event["description"], "")
+
+    def test_invalid_response_falls_back(self):
+        """Unparseable output falls back to one event built from the text"""
+        with patch.object(self.ai_model, "_call_grok_api", return_value="sorry, no idea"):
+            events = self.ai_model.parse_calendar_events("something vague")
+
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["summary"], "something vague")
+
+    def test_invalid_weekday_falls_back(self):
+        """Weekday codes outside RRULE's vocabulary are rejected"""
+        response = '[{"summary": "Gym", "start_datetime": "2025-11-24T07:00:00", "end_datetime": "2025-11-24T08:00:00", "weekly_days": ["XX"]}]'
+        with patch.object(self.ai_model, "_call_grok_api", return_value=response):
+            events = self.ai_model.parse_calendar_events("gym sometimes")
+
+        self.assertEqual(events[0]["summary"], "gym sometimes")
+
+
+class TestBatchedGeneration(unittest.TestCase):
+    """Test suite for the batch variants of first_message, choose_tag and choose_title"""
+
+    def setUp(self):
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            self.ai_model = AIModel()
+        self.prompts = []
+
+    def items_in(self, prompt):
+        start = prompt.index("Items:\n") + len("Items:\n")
+        return json.loads(prompt[start:prompt.index("\n", start)])
+
+    def test_choose_tags_in_one_request(self):
+        def respond(prompt, system_prompt=""):
+            self.prompts.append(prompt)
+            return json.dumps([{"id": item["id"], "result": "work" if "meeting" in item["text"] else "Health"}
+                               for item in self.items_in(prompt)])
+
+        with patch.object(self.ai_model, "_call_grok_api", side_effect=respond):
+            tags = self.ai_model.choose_tags(["ran 5k", "meeting notes", "slept 8h"], ["Health", "Work"])
+
+        self.assertEqual(tags, ["Health", "Work", "Health"])
+        self.assertEqual(len(self.prompts), 1)
+
+    def test_only_invalid_items_are_requested_again(self):
+        def respond(prompt, system_prompt=""):
+            items = self.items_in(prompt)
+            self.prompts.append([item["id"] for item in items])
+            # The first answer gives item 2 a tag that is not an option and skips item 3
+            if len(self.prompts) == 1:
+                return json.dumps([{"id": 0, "result": "Health"}, {"id": 1, "result": "health"},
+                                   {"id": 2, "result": "Chores"}])
+            return json.dumps([{"id": item["id"], "result": "Work"} for item in items])
+
+        with patch.object(self.ai_model, "_call_grok_api", side_effect=respond):
+            tags = self.ai_model.choose_tags(["a", "b", "c", "d"], ["Health", "Work"])
+
+        self.assertEqual(tags, ["Health", "Health", "Work", "Work"])
+        self.assertEqual(self.prompts, [[0, 1, 2, 3], [2, 3]])
+
+    def test_shrinks_batches_and_falls_back_to_single_calls(self):
+        def respond(prompt, system_prompt=""):
+            if "Items:" in prompt:
+                self.prompts.append(len(self.items_in(prompt)))
+                return "sorry, that's too much"
+            return "Title"
+
+        inputs = [f"note {i}" for i in range(BATCH_MAX_ITEMS)]
+        with patch.object(self.ai_model, "_call_grok_api", side_effect=respond):
+            titles = self.ai_model.choose_titles(inputs)
+
+        self.assertEqual(titles, ["Title"] * len(inputs))
+        self.assertEqual(self.prompts[0], BATCH_MAX_ITEMS)
+        self.assertLess(self.prompts[1], BATCH_MAX_ITEMS)
+
+    def test_first_messages_reject_overlong_results(self):
+        def respond(prompt, system_prompt="", history=None):
+            if "Items:" not in prompt:
+                return "Single?"
+            return json.dumps([{"id": item["id"], "result": "x" * 500 if item["id"] else "Batched?"}
+                               for item in self.items_in(prompt)])
+
+        with patch.object(self.ai_model, "_call_grok_api", side_effect=respond):
+            messages = self.ai_model.first_messages(["running", "chess"])
+
+        self.assertEqual(messages, ["Batched?", "Single?"])
+
+
+
+class TestChooseActionType(unittest.TestCase):
+    """Test suite for AIModel.choose_action_type, with the LLM call mocked"""
+
+    def setUp(self):
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            self.ai_model = AIModel()
+        self.options = {ActionType.NOTION: "Save a note", ActionType.CALENDAR: "Add an event"}
+
+    def test_parses_answer(self):
+        for answer in ["CALENDAR", " calendar.", '"Calendar"']:
+            with patch.object(self.ai_model, "_call_grok_api", return_value=answer):
+                self.assertEqual(self.ai_model.choose_action_type("dentist at 2", self.options), ActionType.CALENDAR)
+
+    def test_only_offered_options_are_accepted(self):
+        with patch.object(self.ai_model, "_call_grok_api", return_value="NOTION_QUERY") as call:
+            self.assertEqual(self.ai_model.choose_action_type("what did I log?", self.options), ActionType.ERROR)
+        self.assertNotIn("NOTION_QUERY", call.call_args.args[0])
+        self.assertEqual(self.ai_model.choose_action_type("hi", {}), ActionType.ERROR)
+
+
+class TestPersonality(unittest.TestCase):
+
+    def test_follows_settings_reloads(self):
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            ai_model = AIModel()
+        with patch("ai_model.get_settings", return_value=Settings(personality="uncle_iroh")):
+            self.assertEqual(ai_model.personality, personality_prompts.uncle_iroh_prompt)
+        with patch("ai_model.get_settings", return_value=Settings(personality="schmidt")):
+            self.assertEqual(ai_model.personality, personality_prompts.schmidt_prompt)
+
+
+class TestProviderTimeouts(unittest.TestCase):
+
+    def test_grok_requests_time_out(self):
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            ai_model = AIModel()
+        with patch("ai_model.requests.post") as post:
+            post.return_value.json.return_value = {"choices": [{"message": {"content": "ok"}}]}
+            self.assertEqual(ai_model._call_grok_api("hi"), "ok")
+        self.assertEqual(post.call_args.kwargs["timeout"], GROK_TIMEOUT)
+
+    def test_textbelt_requests_time_out(self):
+        with patch("api_interaction.textbot.requests.post") as post:
+            post.return_value.json.return_value = {"success": True}
+            Textbot("https://example.com").send_text("hi", "+15551234567")
+        self.assertEqual(post.call_args.kwargs["timeout"], TEXTBELT_TIMEOUT)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,248 @@
+import datetime
+import logging
+import sqlite3
+import time
+from zoneinfo import ZoneInfo
+
+from api_interaction.google_cal_api import GoogleCalendarAPI
+
+
+# What Does this module do?
+# Keeps a compact local copy of each connected user's calendar
+#   - CalendarEventStore holds events in SQLite, indexed by user and start time
+#   - CalendarSync pulls changes with events().list(syncToken=...), falling back
+#     to a full sync when Google expires the token (HTTP 410)
+#   - A full sync covers lookback into the past to horizon into the future, so recurring
+#     series expand into a bounded number of instances
+# Reads like "next event" or "what's on today" never touch Google
+# The store file (CALENDAR_STORE_PATH) must be on storage shared by every instance, or each
+# instance keeps (and re-syncs) its own copy and loses it on redeploy
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calendar_events (
+    phone_number TEXT NOT NULL,
+    calendar_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    start_ts REAL NOT NULL,
+    end_ts REAL NOT NULL,
+    all_day INTEGER NOT NULL,
+    PRIMARY KEY (phone_number, calendar_id, event_id)
+);
+CREATE INDEX IF NOT EXISTS calendar_events_by_start
+    ON calendar_events (phone_number, start_ts);
+CREATE TABLE IF NOT EXISTS calendar_sync_state (
+    phone_number TEXT NOT NULL,
+    calendar_id TEXT NOT NULL,
+    sync_token TEXT,
+    synced_at REAL,
+    PRIMARY KEY (phone_number, calendar_id)
+);
+"""
+
+EVENT_COLUMNS = "event_id, summary, start_ts, end_ts, all_day"
+
+
+def _event_dict(row) -> dict:
+    event_id, summary, start_ts, end_ts, all_day = row
+    return {
+        'id': event_id,
+        'summary': summary,
+        'start': start_ts,
+        'end': end_ts,
+        'all_day': bool(all_day)
+    }
+
+
+def _to_timestamp(when: dict, timezone: str) -> tuple:
+    """Convert a Google start/end object to (epoch seconds, is_all_day)"""
+    if 'dateTime' in when:
+        value = datetime.datetime.fromisoformat(when['dateTime'].replace('Z', '+00:00'))
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=ZoneInfo(when.get('timeZone') or timezone))
+        return value.timestamp(), False
+
+    # All-day events carry only a date, which means midnight in the user's timezone
+    day = datetime.date.fromisoformat(when['date'])
+    value = datetime.datetime(day.year, day.month, day.day, tzinfo=ZoneInfo(timezone))
+    return value.timestamp(), True
+
+
+class CalendarEventStore:
+    def __init__(self, db_path: str = "calendar_events.db"):
+        """
+        Args:
+            db_path: SQLite file holding the synced events
+        """
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get_sync_token(self, phone_number: str, calendar_id: str = 'primary'):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT sync_token FROM calendar_sync_state WHERE phone_number = ? AND calendar_id = ?",
+                (phone_number, calendar_id)
+            ).fetchone()
+        return row[0] if row else None
+
+    def apply_changes(self, phone_number: str, calendar_id: str, items: list, timezone: str,
+                      sync_token: str = None, replace: bool = False):
+        """
+        Apply one sync page of events in a single transaction
+
+        Args:
+            phone_number: Owner of the calendar
+            calendar_id: Calendar the items came from
+            items: Event resources from events().list
+            timezone: User's timezone, used for all-day events
+            sync_token: Token to store once this page is applied (last page only)
+            replace: Drop the user's existing events first (start of a full sync)
+        """
+        upserts = []
+        deletes = []
+        for item in items:
+            if item.get('status') == 'cancelled' or 'start' not in item:
+                deletes.append((phone_number, calendar_id, item['id']))
+                continue
+            start_ts, all_day = _to_timestamp(item['start'], timezone)
+            end_ts, _ = _to_timestamp(item['end'], timezone)
+            upserts.append((phone_number, calendar_id, item['id'], item.get('summary', ''), start_ts, end_ts, int(all_day)))
+
+        with self._connect() as conn:
+            if replace:
+                conn.execute(
+                    "DELETE FROM calendar_events WHERE phone_number = ? AND calendar_id = ?",
+                    (phone_number, calendar_id)
+                )
+            conn.executemany(
+                "DELETE FROM calendar_events WHERE phone_number = ? AND calendar_id = ? AND event_id = ?",
+                deletes
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO calendar_events "
+                "(phone_number, calendar_id, event_id, summary, start_ts, end_ts, all_day) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                upserts
+            )
+            if sync_token:
+                conn.execute(
+                    "INSERT OR REPLACE INTO calendar_sync_state (phone_number, calendar_id, sync_token, synced_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (phone_number, calendar_id, sync_token, time.time())
+                )
+
+    def clear(self, phone_number: str, calendar_id: str = 'primary'):
+        """Forget a user's events and sync token, e.g. after they disconnect"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM calendar_events WHERE phone_number = ? AND calendar_id = ?",
+                         (phone_number, calendar_id))
+            conn.execute("DELETE FROM calendar_sync_state WHERE phone_number = ? AND calendar_id = ?",
+                         (phone_number, calendar_id))
+
+    def prune(self, before: float):
+        """Drop events that ended before the `before` timestamp"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM calendar_events WHERE end_ts < ?", (before,))
+
+    def next_event(self, phone_number: str, now: float = None):
+        """The next event starting at or after `now`, or None"""
+        now = time.time() if now is None else now
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {EVENT_COLUMNS} FROM calendar_events "
+                "WHERE phone_number = ? AND start_ts >= ? ORDER BY start_ts LIMIT 1",
+                (phone_number, now)
+            ).fetchone()
+        return _event_dict(row) if row else None
+
+    def events_between(self, phone_number: str, start: float, end: float) -> list:
+        """Events overlapping [start, end), ordered by start time"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {EVENT_COLUMNS} FROM calendar_events "
+                "WHERE phone_number = ? AND start_ts < ? AND end_ts > ? ORDER BY start_ts",
+                (phone_number, end, start)
+            ).fetchall()
+        return [_event_dict(row) for row in rows]
+
+    def agenda(self, phone_number: str, day: datetime.date, timezone: str = 'America/Los_Angeles') -> list:
+        """Events overlapping a calendar day in the user's timezone"""
+        start = datetime.datetime(day.year, day.month, day.day, tzinfo=ZoneInfo(timezone))
+        end = start + datetime.timedelta(days=1)
+        return self.events_between(phone_number, start.timestamp(), end.timestamp())
+
+
+class CalendarSync:
+    def __init__(self, store: CalendarEventStore, lookback: datetime.timedelta = datetime.timedelta(days=1),
+                 horizon: datetime.timedelta = datetime.timedelta(days=180)):
+        """
+        Args:
+            store: Where synced events are kept
+            lookback: How far into the past a full sync reaches
+            horizon: How far into the future a full sync reaches
+        """
+        self.store = store
+        self.lookback = lookback
+        self.horizon = horizon
+
+    def sync(self, phone_number: str, calendar_api: GoogleCalendarAPI, calendar_id: str = 'primary',
+             timezone: str = 'America/Los_Angeles') -> dict:
+        """
+        Bring the local copy of a user's calendar up to date
+
+        Uses the stored sync token when there is one. If Google rejects it
+        with 410 Gone, the user's events are re-fetched from scratch.
+
+        Returns:
+            dict: Status and number of changed events
+        """
+        sync_token = self.store.get_sync_token(phone_number, calendar_id)
+        result = self._sync_pages(phone_number, calendar_api, calendar_id, timezone, sync_token)
+
+        if result['status'] == 'error' and result.get('code') == 410:
+            logging.info(f"Sync token expired for {phone_number}, running a full calendar sync")
+            result = self._sync_pages(phone_number, calendar_api, calendar_id, timezone, None)
+
+        return result
+
+    def _sync_pages(self, phone_number, calendar_api, calendar_id, timezone, sync_token) -> dict:
+        full_sync = sync_token is None
+        now = datetime.datetime.now(datetime.timezone.utc)
+        time_min = now - self.lookback if full_sync else None
+        time_max = now + self.horizon if full_sync else None
+
+        # Pages are buffered so a sync that fails halfway leaves the store untouched
+        items = []
+        page_token = None
+        while True:
+            page = calendar_api.list_events_page(
+                calendar_id=calendar_id,
+                sync_token=sync_token,
+                page_token=page_token,
+                time_min=time_min,
+                time_max=time_max
+            )
+            if page['status'] != 'success':
+                return page
+
+            items.extend(page['items'])
+            page_token = page['next_page_token']
+            if not page_token:
+                break
+
+        self.store.apply_changes(
+            phone_number, calendar_id, items, timezone,
+            sync_token=page['next_sync_token'],
+            replace=full_sync
+        )
+        logging.info(f"Synced {len(items)} calendar changes for {phone_number} ({'full' if full_sync else 'incremental'})")
+        return {
+            'status': 'success',
+            'changed': len(items),
+            'event_ids': [item['id'] for item in items],
+            'full_sync': full_sync
+        }
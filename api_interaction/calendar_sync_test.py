@@ -0,0 +1,111 @@
+import datetime
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+from api_interaction.calendar_sync import CalendarEventStore, CalendarSync
+
+
+def event(event_id, summary, start, end, status='confirmed'):
+    return {
+        'id': event_id,
+        'summary': summary,
+        'status': status,
+        'start': {'dateTime': start},
+        'end': {'dateTime': end}
+    }
+
+
+def page(items, next_page_token=None, next_sync_token=None):
+    return {
+        'status': 'success',
+        'items': items,
+        'next_page_token': next_page_token,
+        'next_sync_token': next_sync_token
+    }
+
+
+class TestCalendarSync(unittest.TestCase):
+    """Test suite for CalendarSync and CalendarEventStore"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = CalendarEventStore(os.path.join(self.tmp.name, "events.db"))
+        self.sync = CalendarSync(self.store)
+        self.calendar_api = Mock()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_full_sync_pages_and_stores_token(self):
+        """A first sync walks every page and saves the final sync token"""
+        self.calendar_api.list_events_page.side_effect = [
+            page([event('a', 'Gym', '2025-11-24T07:00:00-08:00', '2025-11-24T08:00:00-08:00')], next_page_token='p2'),
+            page([event('b', 'Dentist', '2025-11-24T14:00:00-08:00', '2025-11-24T15:00:00-08:00')], next_sync_token='s1'),
+        ]
+
+        result = self.sync.sync('+1555', self.calendar_api)
+
+        self.assertTrue(result['full_sync'])
+        self.assertEqual(result['changed'], 2)
+        self.assertEqual(len(result['event_ids']), 2)
+        self.assertEqual(self.store.get_sync_token('+1555'), 's1')
+        agenda = self.store.agenda('+1555', datetime.date(2025, 11, 24))
+        self.assertEqual([e['summary'] for e in agenda], ['Gym', 'Dentist'])
+        # A full sync is bounded on both sides, so recurring series expand into a bounded list
+        kwargs = self.calendar_api.list_events_page.call_args.kwargs
+        self.assertEqual(kwargs['time_max'] - kwargs['time_min'], datetime.timedelta(days=181))
+
+    def test_incremental_sync_applies_updates_and_cancellations(self):
+        """Changes since the last token update or remove local events"""
+        self.calendar_api.list_events_page.side_effect = [
+            page([event('a', 'Gym', '2025-11-24T07:00:00-08:00', '2025-11-24T08:00:00-08:00'),
+                  event('b', 'Dentist', '2025-11-24T14:00:00-08:00', '2025-11-24T15:00:00-08:00')],
+                 next_sync_token='s1'),
+            page([{'id': 'a', 'status': 'cancelled'},
+                  event('b', 'Dentist (moved)', '2025-11-24T16:00:00-08:00', '2025-11-24T17:00:00-08:00')],
+                 next_sync_token='s2'),
+        ]
+
+        self.sync.sync('+1555', self.calendar_api)
+        result = self.sync.sync('+1555', self.calendar_api)
+
+        self.assertFalse(result['full_sync'])
+        self.assertEqual(self.calendar_api.list_events_page.call_args.kwargs['sync_token'], 's1')
+        self.assertIsNone(self.calendar_api.list_events_page.call_args.kwargs['time_max'])
+        agenda = self.store.agenda('+1555', datetime.date(2025, 11, 24))
+        self.assertEqual([e['summary'] for e in agenda], ['Dentist (moved)'])
+        self.assertEqual(self.store.get_sync_token('+1555'), 's2')
+
+    def test_expired_token_triggers_full_resync(self):
+        """A 410 drops the token and re-fetches everything"""
+        self.calendar_api.list_events_page.side_effect = [
+            page([event('a', 'Gym', '2025-11-24T07:00:00-08:00', '2025-11-24T08:00:00-08:00')], next_sync_token='s1'),
+            {'status': 'error', 'code': 410, 'message': 'Gone'},
+            page([event('c', 'Lunch', '2025-11-24T12:00:00-08:00', '2025-11-24T13:00:00-08:00')], next_sync_token='s3'),
+        ]
+
+        self.sync.sync('+1555', self.calendar_api)
+        result = self.sync.sync('+1555', self.calendar_api)
+
+        self.assertEqual(result['status'], 'success')
+        self.assertTrue(result['full_sync'])
+        agenda = self.store.agenda('+1555', datetime.date(2025, 11, 24))
+        self.assertEqual([e['summary'] for e in agenda], ['Lunch'])
+
+    def test_next_event_and_all_day_events(self):
+        """All-day events are stored from midnight in the user's timezone"""
+        self.store.apply_changes('+1555', 'primary', [
+            {'id': 'h', 'summary': 'Holiday', 'start': {'date': '2025-11-27'}, 'end': {'date': '2025-11-28'}},
+            event('a', 'Gym', '2025-11-24T07:00:00-08:00', '2025-11-24T08:00:00-08:00'),
+        ], 'America/Los_Angeles')
+
+        now = datetime.datetime(2025, 11, 24, 9, tzinfo=datetime.timezone.utc).timestamp()
+        self.assertEqual(self.store.next_event('+1555', now)['summary'], 'Gym')
+        holiday = self.store.agenda('+1555', datetime.date(2025, 11, 27))
+        self.assertTrue(holiday[0]['all_day'])
+        self.assertEqual(self.store.agenda('+1555', datetime.date(2025, 11, 28)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,10 +4,14 @@ from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 import logging
+from services.priority_scheduler import calendar_scheduler
 
 # Calendar API scope
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
+# Google recommends keeping batches to 50 requests or fewer
+MAX_BATCH_SIZE = 50
+
 
 class GoogleCalendarAPI:
     """
@@ -42,6 +46,11 @@ class GoogleCalendarAPI:
         else:
             raise Exception("Invalid credentials")
 
+    def _execute(self, request):
+        """Send a request (or batch) while holding a calendar_scheduler slot"""
+        with calendar_scheduler.slot():
+            return request.execute()
+
     def create_event(
         self,
         summary: str,
@@ -50,7 +59,8 @@ class GoogleCalendarAPI:
         description: str = "",
         calendar_id: str = 'primary',
         color_id: str = None,
-        timezone: str = 'America/Los_Angeles'
+        timezone: str = 'America/Los_Angeles',
+        recurrence: list = None
     ) -> dict:
         """
         Create a calendar event
@@ -63,31 +73,20 @@ class GoogleCalendarAPI:
             calendar_id: Calendar ID (default: 'primary')
             color_id: Color ID (1-11)
             timezone: Timezone for the event
+            recurrence: RRULE strings for repeating events, e.g. ["RRULE:FREQ=WEEKLY;BYDAY=MO,WE"]
 
         Returns:
             dict: Created event details
         """
-        event = {
-            'summary': summary,
-            'description': description,
-            'start': {
-                'dateTime': start_datetime.isoformat(),
-                'timeZone': timezone,
-            },
-            'end': {
-                'dateTime': end_datetime.isoformat(),
-                'timeZone': timezone,
-            },
-        }
-
-        if color_id:
-            event['colorId'] = str(color_id)
+        event = self._build_event_body(
+            summary, start_datetime, end_datetime, description, color_id, timezone, recurrence
+        )
 
         try:
-            event = self.service.events().insert(
+            event = self._execute(self.service.events().insert(
                 calendarId=calendar_id,
                 body=event
-            ).execute()
+            ))
 
             logging.info(f"Event created: {event.get('summary')}")
             return {
@@ -104,6 +103,107 @@ class GoogleCalendarAPI:
                 'message': str(error)
             }
 
+    def create_events(
+        self,
+        events: list,
+        calendar_id: str = 'primary',
+        timezone: str = 'America/Los_Angeles'
+    ) -> list:
+        """
+        Create several calendar events using batched HTTP requests
+
+        Args:
+            events: Dicts with summary, start_datetime, end_datetime and
+                    optionally description, color_id, recurrence
+            calendar_id: Calendar ID (default: 'primary')
+            timezone: Timezone for the events
+
+        Returns:
+            list: One result dict per event, in the same order as `events`,
+                  shaped like the return value of create_event
+        """
+        results = [None] * len(events)
+
+        def on_response(request_id, response, exception):
+            index = int(request_id)
+            if exception is not None:
+                logging.error(f"Error creating event: {exception}")
+                results[index] = {
+                    'status': 'error',
+                    'message': str(exception)
+                }
+            else:
+                logging.info(f"Event created: {response.get('summary')}")
+                results[index] = {
+                    'status': 'success',
+                    'event_id': response['id'],
+                    'link': response.get('htmlLink'),
+                    'summary': response.get('summary')
+                }
+
+        for chunk_start in range(0, len(events), MAX_BATCH_SIZE):
+            batch = self.service.new_batch_http_request(callback=on_response)
+            for index in range(chunk_start, min(chunk_start + MAX_BATCH_SIZE, len(events))):
+                event = events[index]
+                body = self._build_event_body(
+                    event['summary'],
+                    event['start_datetime'],
+                    event['end_datetime'],
+                    event.get('description', ''),
+                    event.get('color_id'),
+                    timezone,
+                    event.get('recurrence')
+                )
+                batch.add(
+                    self.service.events().insert(calendarId=calendar_id, body=body),
+                    request_id=str(index)
+                )
+
+            try:
+                self._execute(batch)
+            except HttpError as error:
+                # The batch request itself failed, so none of its events were created
+                logging.error(f"Error executing event batch: {error}")
+                for index in range(chunk_start, min(chunk_start + MAX_BATCH_SIZE, len(events))):
+                    if results[index] is None:
+                        results[index] = {
+                            'status': 'error',
+                            'message': str(error)
+                        }
+
+        return results
+
+    def _build_event_body(
+        self,
+        summary: str,
+        start_datetime: datetime,
+        end_datetime: datetime,
+        description: str,
+        color_id: str,
+        timezone: str,
+        recurrence: list = None
+    ) -> dict:
+        event = {
+            'summary': summary,
+            'description': description,
+            'start': {
+                'dateTime': start_datetime.isoformat(),
+                'timeZone': timezone,
+            },
+            'end': {
+                'dateTime': end_datetime.isoformat(),
+                'timeZone': timezone,
+            },
+        }
+
+        if color_id:
+            event['colorId'] = str(color_id)
+
+        if recurrence:
+            event['recurrence'] = list(recurrence)
+
+        return event
+
     def get_event(self, event_id: str, calendar_id: str = 'primary') -> dict:
         """
         Get a specific calendar event
@@ -116,10 +216,10 @@ class GoogleCalendarAPI:
             dict: Event details
         """
         try:
-            event = self.service.events().get(
+            event = self._execute(self.service.events().get(
                 calendarId=calendar_id,
                 eventId=event_id
-            ).execute()
+            ))
 
             return {
                 'status': 'success',
@@ -141,6 +241,66 @@ class GoogleCalendarAPI:
                 'message': str(error)
             }
 
+    def list_events_page(
+        self,
+        calendar_id: str = 'primary',
+        sync_token: str = None,
+        page_token: str = None,
+        time_min: datetime = None,
+        time_max: datetime = None
+    ) -> dict:
+        """
+        Fetch one page of events, for full or incremental sync
+
+        Recurring events are expanded into single instances. With `sync_token`
+        only changes since that token are returned, including cancelled events.
+
+        Args:
+            calendar_id: Calendar ID (default: 'primary')
+            sync_token: nextSyncToken from a previous sync
+            page_token: nextPageToken from the previous page
+            time_min: Earliest event end to include (full sync only)
+            time_max: Latest event start to include (full sync only); bounds how many
+                      instances a recurring series expands into
+
+        Returns:
+            dict: items, next_page_token and next_sync_token, or error details
+                  with the HTTP status code (410 means the sync token expired)
+        """
+        params = {
+            'calendarId': calendar_id,
+            'singleEvents': True,
+            'maxResults': 250,
+        }
+        if sync_token:
+            params['syncToken'] = sync_token
+        else:
+            # Google rejects time bounds together with a sync token
+            if time_min:
+                params['timeMin'] = time_min.isoformat()
+            if time_max:
+                params['timeMax'] = time_max.isoformat()
+        if page_token:
+            params['pageToken'] = page_token
+
+        try:
+            response = self._execute(self.service.events().list(**params))
+
+            return {
+                'status': 'success',
+                'items': response.get('items', []),
+                'next_page_token': response.get('nextPageToken'),
+                'next_sync_token': response.get('nextSyncToken')
+            }
+
+        except HttpError as error:
+            logging.error(f"Error listing events: {error}")
+            return {
+                'status': 'error',
+                'code': error.resp.status,
+                'message': str(error)
+            }
+
     def delete_event(self, event_id: str, calendar_id: str = 'primary') -> dict:
         """
         Delete a calendar event
@@ -153,10 +313,10 @@ class GoogleCalendarAPI:
             dict: Status of the deletion
         """
         try:
-            self.service.events().delete(
+            self._execute(self.service.events().delete(
                 calendarId=calendar_id,
                 eventId=event_id
-            ).execute()
+            ))
 
             logging.info(f"Event {event_id} deleted successfully")
             return {
@@ -1,10 +1,15 @@
+import json
 import os
+import unittest
+from unittest.mock import MagicMock
 from datetime import datetime, timedelta
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from services.priority_scheduler import calendar_scheduler, CLASSES
+from testing.cassettes import install_or_skip
 
 # If modifying these scopes, delete the file token.json.
 SCOPES = ['https://www.googleapis.com/auth/calendar']
@@ -215,6 +220,134 @@ class GoogleCalendarAPI:
             }
 
 
+class FakeBatch:
+    """Stand-in for googleapiclient's BatchHttpRequest"""
+
+    def __init__(self, callback, failures):
+        self.callback = callback
+        self.failures = failures
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        for request_id, request in self.requests:
+            body = request.body
+            if body['summary'] in self.failures:
+                self.callback(request_id, None, Exception(f"failed {body['summary']}"))
+            else:
+                self.callback(request_id, {'id': f"id-{request_id}", 'summary': body['summary'],
+                                           'htmlLink': f"link-{request_id}"}, None)
+
+
+class TestCreateEventsBatch(unittest.TestCase):
+    """Test suite for the web GoogleCalendarAPI.create_events, with a mocked service"""
+
+    def setUp(self):
+        from api_interaction.google_cal_api import GoogleCalendarAPI as WebGoogleCalendarAPI
+        self.batches = []
+        self.failures = set()
+
+        def new_batch(callback):
+            batch = FakeBatch(callback, self.failures)
+            self.batches.append(batch)
+            return batch
+
+        def insert(calendarId, body):
+            request = MagicMock()
+            request.body = body
+            return request
+
+        self.calendar_api = WebGoogleCalendarAPI()
+        self.calendar_api.service = MagicMock()
+        self.calendar_api.service.new_batch_http_request.side_effect = new_batch
+        self.calendar_api.service.events.return_value.insert.side_effect = insert
+
+    def _event(self, summary, **extra):
+        start = datetime(2025, 11, 24, 7, 0)
+        return dict(summary=summary, start_datetime=start, end_datetime=start + timedelta(hours=1), **extra)
+
+    def test_reports_each_event_in_order(self):
+        """Every event gets its own result, failures included"""
+        self.failures.add("Dentist")
+        events = [
+            self._event("Gym", recurrence=["RRULE:FREQ=WEEKLY;BYDAY=MO,WE,FR"]),
+            self._event("Dentist"),
+        ]
+
+        results = self.calendar_api.create_events(events)
+
+        self.assertEqual(len(self.batches), 1)
+        self.assertEqual([r['status'] for r in results], ['success', 'error'])
+        self.assertEqual(results[0]['event_id'], 'id-0')
+        gym_body = self.batches[0].requests[0][1].body
+        self.assertEqual(gym_body['recurrence'], ["RRULE:FREQ=WEEKLY;BYDAY=MO,WE,FR"])
+
+    def test_batches_hold_a_calendar_slot(self):
+        """Each batch request runs while holding a calendar_scheduler slot"""
+        held = []
+        self.calendar_api.service.new_batch_http_request.side_effect = lambda callback: MagicMock(
+            execute=lambda: held.append(sum(calendar_scheduler.stats()[c]["running"] for c in CLASSES))
+        )
+
+        self.calendar_api.create_events([self._event("Gym")])
+
+        self.assertEqual(held, [1])
+
+    def test_splits_large_batches(self):
+        """More than 50 events are sent in several batch requests"""
+        results = self.calendar_api.create_events([self._event(f"Event {i}") for i in range(120)])
+
+        self.assertEqual([len(batch.requests) for batch in self.batches], [50, 50, 20])
+        self.assertTrue(all(r['status'] == 'success' for r in results))
+        self.assertEqual(results[119]['event_id'], 'id-119')
+
+
+class TestGoogleCalendarAPILive(unittest.TestCase):
+    """The web GoogleCalendarAPI against a real calendar, replayed from a cassette"""
+
+    # Fixed times, so the recorded requests match on every run
+    START = datetime(2030, 1, 7, 9, 0)
+
+    @classmethod
+    def setUpClass(cls):
+        from api_interaction.google_cal_api import GoogleCalendarAPI as WebGoogleCalendarAPI
+        # Recording needs an authorized-user token (token, refresh_token, client_id, client_secret)
+        cls.cassette = install_or_skip("google_cal_api.json", "GOOGLE_CALENDAR_TEST_TOKEN")
+        token = os.getenv("GOOGLE_CALENDAR_TEST_TOKEN")
+        credentials = json.loads(token) if token else {
+            "token": "recorded", "refresh_token": "recorded", "client_id": "recorded", "client_secret": "recorded"
+        }
+        cls.calendar_api = WebGoogleCalendarAPI(credentials)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.cassette.eject()
+
+    def test_event_lifecycle(self):
+        """A created event can be read back, is listed, and can be deleted"""
+        created = self.calendar_api.create_event(
+            summary="Cassette test event",
+            start_datetime=self.START,
+            end_datetime=self.START + timedelta(hours=1),
+            description="Created by google_cal_api_test",
+            timezone='America/Los_Angeles'
+        )
+        self.assertEqual(created['status'], 'success')
+        event_id = created['event_id']
+
+        fetched = self.calendar_api.get_event(event_id)
+        self.assertEqual(fetched['event']['summary'], "Cassette test event")
+
+        page = self.calendar_api.list_events_page(time_min=self.START - timedelta(days=1),
+                                                  time_max=self.START + timedelta(days=1))
+        self.assertEqual(page['status'], 'success')
+        self.assertIn(event_id, [item['id'] for item in page['items']])
+
+        self.assertEqual(self.calendar_api.delete_event(event_id)['status'], 'success')
+
+
 def main():
     """Interactive test of Google Calendar API"""
     print("=== Google Calendar API Test ===\n")
@@ -1,26 +1,60 @@
 import os
 from notion_client import Client, APIResponseError
 from ai_model import AIModel
+from api_interaction.notion_client_pool import notion_client_pool
+from services.tag_ranker import TagRanker
 import logging
 
 
 # What Does this class do?
 # Create Notion API Object
 # Writes a note to a database with tags
-# Decides what tags to add to a note
+# Decides what tags to add to a note (shortlisted locally, see services/tag_ranker.py)
 # Decides what title to use for a note
+# Appends daily-log entries to a single page per user per day
 
 # Long Term
 #   - Could I parse a note and maybe separate certain data 
 #   and store that in a different note with a different title/ tag?
 #   - Can I query my notion to get information about me?
+#     (services/note_index.py keeps a local full-text index for this)
+
+DAILY_LOG_TAG = "Daily Log"
+
+# Several users share one database; this phone_number property says whose page it is
+OWNER_PROPERTY = "Phone"
+
+# Notion accepts at most 100 child blocks per request
+MAX_CHILDREN_PER_REQUEST = 100
+
+
+def owner_filter(owner: str) -> dict:
+    return {"property": OWNER_PROPERTY, "phone_number": {"equals": owner}}
+
+
+def page_owner(page: dict):
+    """Phone number a page belongs to, or None if it has none"""
+    return page.get("properties", {}).get(OWNER_PROPERTY, {}).get("phone_number")
+
+
+def paragraph_block(content: str) -> dict:
+    return {
+        "object": "block",
+        "type": "paragraph",
+        "paragraph": {
+            "rich_text": [{"type": "text", "text": {"content": content}}]
+        }
+    }
+
 
 class NotionAPI:
-    def __init__(self, notion_api_key: str, database_id: str, ai_model: AIModel):
+    def __init__(self, notion_api_key: str, database_id: str, ai_model: AIModel, notion_client: Client = None,
+                 tag_ranker: TagRanker = None):
         # self.notion_api_key = notion_api_key
         self.database_id = database_id
         self.ai_model = ai_model
-        self.notion = Client(auth=notion_api_key)
+        self.notion = notion_client or notion_client_pool.get(notion_api_key)
+        self.tag_ranker = tag_ranker or TagRanker()
 
     def list_accessible_databases(self):
         print("Listing accessible databases")
@@ -55,40 +89,181 @@ class NotionAPI:
             return []
 
     
-    def create_note_with_tags(self, content):
-        try:
-            all_tags = self.get_all_tags()
-            logging.info(f"All tags: {all_tags}")
-            tags = [self.ai_model.choose_tag(content, all_tags)]
-            title = self.ai_model.choose_title(content)
+    def write_note(self, content, tag_counts: dict = None, owner: str = None):
+        """
+        Create a tagged, titled note in the database
+
+        Unlike create_note_with_tags, Notion errors are raised rather than
+        swallowed so callers like the write queue can retry them.
+
+        Args:
+            tag_counts: Optional tag -> times the user has used it, to favour their usual tags
+            owner: Phone number of the user the note belongs to
+
+        Returns:
+            dict: page_id, title and tags of the created note
+        """
+        all_tags = self.get_all_tags()
+        candidates, tag = self.tag_ranker.shortlist(content, all_tags, tag_counts)
+        logging.info(f"Tag candidates: {candidates} of {len(all_tags)}")
+        tags = [tag or self.ai_model.choose_tag(content, candidates)]
+        title = self.ai_model.choose_title(content)
+
+        properties = {
+            "Name": {
+                "title": [
+                    {"text": {"content": title}}
+                ]
+            },
+            "Tags": {
+                "multi_select": [{"name": tag} for tag in tags]
+            }
+        }
+        if owner:
+            properties[OWNER_PROPERTY] = {"phone_number": owner}
+
+        response = self.notion.pages.create(
+            parent={"database_id": self.database_id},
+            properties=properties,
+            children=[paragraph_block(content)]
+        )
+
+        logging.info("✅ Note created successfully. ID: %s", response["id"])
+        return {"page_id": response["id"], "title": title, "tags": tags}
+
+    def find_page_by_title(self, title: str, owner: str = None):
+        """Return the ID of a page in the database with exactly this title (and owner, if given), or None"""
+        database = self.notion.databases.retrieve(database_id=self.database_id)
+        data_sources = database.get("data_sources", [])
+        if not data_sources:
+            return None
+
+        title_filter = {"property": "Name", "title": {"equals": title}}
+        response = self.notion.data_sources.query(
+            data_source_id=data_sources[0]["id"],
+            filter={"and": [title_filter, owner_filter(owner)]} if owner else title_filter,
+            page_size=1
+        )
+        results = response.get("results", [])
+        return results[0]["id"] if results else None
+
+    def write_daily_log(self, contents: list[str], date_title: str, page_id: str = None, owner: str = None) -> str:
+        """
+        Append entries to `owner`'s daily-log page titled `date_title`
+
+        The page is looked up by title and owner when `page_id` is not known, and
+        created if it does not exist yet. No LLM calls are made for daily-log entries.
+
+        Args:
+            contents: Entries to append, in order
+            date_title: Page title, YYYY-MM-DD
+            page_id: Cached ID of the day's page, if known
+            owner: Phone number of the user whose day it is; users sharing the database get separate pages
+
+        Returns:
+            str: ID of the day's page
+        """
+        blocks = [paragraph_block(content) for content in contents]
+
+        if page_id is None:
+            page_id = self.find_page_by_title(date_title, owner)
+
+        if page_id is None:
+            properties = {
+                "Name": {
+                    "title": [
+                        {"text": {"content": date_title}}
+                    ]
+                },
+                "Tags": {
+                    "multi_select": [{"name": DAILY_LOG_TAG}]
+                }
+            }
+            if owner:
+                properties[OWNER_PROPERTY] = {"phone_number": owner}
 
             response = self.notion.pages.create(
                 parent={"database_id": self.database_id},
-                properties={
-                    "Name": {
-                        "title": [
-                            {"text": {"content": title}}
-                        ]
-                    },
-                    "Tags": {
-                        "multi_select": [{"name": tag} for tag in tags]
-                    }
-                },
-                children=[
-                    {
-                        "object": "block",
-                        "type": "paragraph",
-                        "paragraph": {
-                            "rich_text": [{"type": "text", "text": {"content": content}}]
-                        }
-                    }
-                ]
+                properties=properties,
+                children=blocks[:MAX_CHILDREN_PER_REQUEST]
             )
+            page_id = response["id"]
+            blocks = blocks[MAX_CHILDREN_PER_REQUEST:]
+            logging.info("✅ Daily log page created. ID: %s", page_id)
+
+        for i in range(0, len(blocks), MAX_CHILDREN_PER_REQUEST):
+            self.notion.blocks.children.append(
+                block_id=page_id,
+                children=blocks[i:i + MAX_CHILDREN_PER_REQUEST]
+            )
+
+        logging.info("✅ Appended %d entries to daily log %s", len(contents), date_title)
+        return page_id
 
-            logging.info("✅ Note created successfully. ID: %s", response["id"])
-            return {"status": "ok", "page_id": response["id"]}
+    def query_pages_edited_since(self, since: str = None, owner: str = None) -> list:
+        """
+        All pages in the database edited at or after `since`, oldest edit first
+
+        Args:
+            since: ISO 8601 timestamp, or None for every page
+            owner: Only pages whose OWNER_PROPERTY is this phone number
+
+        Returns:
+            list: Page objects
+        """
+        database = self.notion.databases.retrieve(database_id=self.database_id)
+        data_sources = database.get("data_sources", [])
+        if not data_sources:
+            return []
+
+        query = {
+            "data_source_id": data_sources[0]["id"],
+            "sorts": [{"timestamp": "last_edited_time", "direction": "ascending"}],
+            "page_size": 100
+        }
+        filters = []
+        if since:
+            filters.append({"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": since}})
+        if owner:
+            filters.append(owner_filter(owner))
+        if len(filters) == 1:
+            query["filter"] = filters[0]
+        elif filters:
+            query["filter"] = {"and": filters}
+
+        pages = []
+        while True:
+            response = self.notion.data_sources.query(**query)
+            pages.extend(response.get("results", []))
+            if not response.get("has_more"):
+                return pages
+            query["start_cursor"] = response["next_cursor"]
+
+    def get_page_text(self, page_id: str) -> str:
+        """Plain text of a page's top-level blocks, one block per line"""
+        lines = []
+        cursor = None
+        while True:
+            kwargs = {"block_id": page_id, "page_size": 100}
+            if cursor:
+                kwargs["start_cursor"] = cursor
+            response = self.notion.blocks.children.list(**kwargs)
+
+            for block in response.get("results", []):
+                rich_text = block.get(block.get("type"), {}).get("rich_text", [])
+                text = "".join(part.get("plain_text", "") for part in rich_text)
+                if text:
+                    lines.append(text)
+
+            if not response.get("has_more"):
+                return "\n".join(lines)
+            cursor = response["next_cursor"]
+
+    def create_note_with_tags(self, content):
+        try:
+            note = self.write_note(content)
+            return {"status": "ok", "page_id": note["page_id"]}
 
         except APIResponseError as e:
             logging.error("❌ Failed to create Notion note: %s", e)
             return {"status": "error", "message": str(e)}
-    
\ No newline at end of file
@@ -5,10 +5,13 @@ from dotenv import load_dotenv
 from api_interaction.notion_api import NotionAPI
 from ai_model import AIModel
 from notion_client import APIResponseError
+from testing.cassettes import install_cassette
 
 # Load environment variables
 load_dotenv()
 
+# Live Notion/LLM calls replay from recorded cassettes (see testing/cassettes.py)
+
 
 class TestNotionAPI(unittest.TestCase):
     """Test suite for NotionAPI class"""
@@ -16,12 +19,18 @@ class TestNotionAPI(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         """Set up test fixtures that are used across all tests"""
-        cls.notion_api_key = os.getenv('HASAN_NOTION_API_KEY')
+        cls.cassette = install_cassette("notion_api.json")
+        cls.notion_api_key = os.getenv('HASAN_NOTION_API_KEY') or ("recorded" if cls.cassette.recorded else None)
         cls.database_id = "23eb9e96-e8f3-80a4-8b8d-c5e9cd16ef40"  # Default database from app.py
 
         if not cls.notion_api_key:
+            cls.cassette.eject()
             raise ValueError("HASAN_NOTION_API_KEY environment variable not set")
 
+    @classmethod
+    def tearDownClass(cls):
+        cls.cassette.eject()
+
     def setUp(self):
         """Set up test fixtures before each test method"""
         self.mock_ai_model = Mock(spec=AIModel)
@@ -189,14 +198,20 @@ class TestNotionAPIWithRealAIModel(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         """Set up test fixtures"""
-        cls.notion_api_key = os.getenv('HASAN_NOTION_API_KEY')
+        cls.cassette = install_cassette("notion_api_real_ai_model.json")
+        cls.notion_api_key = os.getenv('HASAN_NOTION_API_KEY') or ("recorded" if cls.cassette.recorded else None)
         cls.database_id = "23eb9e96-e8f3-80a4-8b8d-c5e9cd16ef40"
 
         if not cls.notion_api_key:
+            cls.cassette.eject()
             raise ValueError("HASAN_NOTION_API_KEY environment variable not set")
 
         # Check if OpenAI or Grok API key is available
-        cls.has_ai_api_key = bool(os.getenv('OPENAI_API_KEY') or os.getenv('GROK_API_KEY'))
+        cls.has_ai_api_key = bool(os.getenv('OPENAI_API_KEY') or os.getenv('GROK_API_KEY') or cls.cassette.recorded)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.cassette.eject()
 
     def setUp(self):
         """Set up test fixtures before each test"""
@@ -224,6 +239,69 @@ class TestNotionAPIWithRealAIModel(unittest.TestCase):
         # by deleting it from Notion using result["page_id"]
 
 
+class TestNotionDailyLog(unittest.TestCase):
+    """Test suite for daily-log aggregation, using a mocked Notion client"""
+
+    def setUp(self):
+        self.mock_client = Mock()
+        self.mock_ai_model = Mock(spec=AIModel)
+        self.notion_api = NotionAPI(
+            notion_api_key="unused",
+            database_id="database-id",
+            ai_model=self.mock_ai_model,
+            notion_client=self.mock_client
+        )
+
+    def test_appends_to_cached_page(self):
+        """A known page ID goes straight to blocks.children.append"""
+        page_id = self.notion_api.write_daily_log(["ran 5k", "read 20 pages"], "2025-11-24", page_id="page-1")
+
+        self.assertEqual(page_id, "page-1")
+        self.mock_client.pages.create.assert_not_called()
+        self.mock_client.data_sources.query.assert_not_called()
+        self.mock_client.blocks.children.append.assert_called_once()
+        children = self.mock_client.blocks.children.append.call_args.kwargs["children"]
+        self.assertEqual(len(children), 2)
+
+    def test_creates_page_when_missing(self):
+        """The first entry of the day creates the page with the entries as its content"""
+        self.mock_client.databases.retrieve.return_value = {"data_sources": [{"id": "source-1"}]}
+        self.mock_client.data_sources.query.return_value = {"results": []}
+        self.mock_client.pages.create.return_value = {"id": "new-page"}
+
+        page_id = self.notion_api.write_daily_log(["ran 5k"], "2025-11-24", owner="+1555")
+
+        self.assertEqual(page_id, "new-page")
+        self.mock_client.blocks.children.append.assert_not_called()
+        properties = self.mock_client.pages.create.call_args.kwargs["properties"]
+        self.assertEqual(properties["Name"]["title"][0]["text"]["content"], "2025-11-24")
+        self.assertEqual(properties["Phone"], {"phone_number": "+1555"})
+        self.mock_ai_model.choose_title.assert_not_called()
+        self.mock_ai_model.choose_tag.assert_not_called()
+
+    def test_reuses_existing_page_found_by_title(self):
+        """An existing page for the day is found by title and appended to"""
+        self.mock_client.databases.retrieve.return_value = {"data_sources": [{"id": "source-1"}]}
+        self.mock_client.data_sources.query.return_value = {"results": [{"id": "existing"}]}
+
+        page_id = self.notion_api.write_daily_log(["ran 5k"], "2025-11-24", owner="+1555")
+
+        self.assertEqual(page_id, "existing")
+        self.mock_client.pages.create.assert_not_called()
+
+    def test_page_lookup_is_per_user(self):
+        """Users sharing the database each get their own page for the day"""
+        self.mock_client.databases.retrieve.return_value = {"data_sources": [{"id": "source-1"}]}
+        self.mock_client.data_sources.query.return_value = {"results": []}
+
+        self.notion_api.find_page_by_title("2025-11-24", "+1555")
+
+        self.assertEqual(self.mock_client.data_sources.query.call_args.kwargs["filter"], {"and": [
+            {"property": "Name", "title": {"equals": "2025-11-24"}},
+            {"property": "Phone", "phone_number": {"equals": "+1555"}},
+        ]})
+
+
 if __name__ == '__main__':
     # Run tests with verbosity
     unittest.main(verbosity=2)
@@ -246,12 +324,18 @@ class TestNotionAPI(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         """Set up test fixtures that are used across all tests"""
-        cls.notion_api_key = os.getenv('HASAN_NOTION_API_KEY')
+        cls.cassette = install_cassette("notion_api.json")
+        cls.notion_api_key = os.getenv('HASAN_NOTION_API_KEY') or ("recorded" if cls.cassette.recorded else None)
         cls.database_id = "23eb9e96-e8f3-80a4-8b8d-c5e9cd16ef40"  # Default database from app.py
 
         if not cls.notion_api_key:
+            cls.cassette.eject()
             raise ValueError("HASAN_NOTION_API_KEY environment variable not set")
 
+    @classmethod
+    def tearDownClass(cls):
+        cls.cassette.eject()
+
     def setUp(self):
         """Set up test fixtures before each test method"""
         self.mock_ai_model = Mock(spec=AIModel)
@@ -419,14 +503,20 @@ class TestNotionAPIWithRealAIModel(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         """Set up test fixtures"""
-        cls.notion_api_key = os.getenv('HASAN_NOTION_API_KEY')
+        cls.cassette = install_cassette("notion_api_real_ai_model.json")
+        cls.notion_api_key = os.getenv('HASAN_NOTION_API_KEY') or ("recorded" if cls.cassette.recorded else None)
         cls.database_id = "23eb9e96-e8f3-80a4-8b8d-c5e9cd16ef40"
 
         if not cls.notion_api_key:
+            cls.cassette.eject()
             raise ValueError("HASAN_NOTION_API_KEY environment variable not set")
 
         # Check if OpenAI or Grok API key is available
-        cls.has_ai_api_key = bool(os.getenv('OPENAI_API_KEY') or os.getenv('GROK_API_KEY'))
+        cls.has_ai_api_key = bool(os.getenv('OPENAI_API_KEY') or os.getenv('GROK_API_KEY') or cls.cassette.recorded)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.cassette.eject()
 
     def setUp(self):
         """Set up test fixtures before each test"""
@@ -454,6 +544,42 @@ class TestNotionAPIWithRealAIModel(unittest.TestCase):
         # by deleting it from Notion using result["page_id"]
 
 
+class TestNotionTagShortlist(unittest.TestCase):
+    """Test suite for shortlisting tags before choose_tag, using a mocked Notion client"""
+
+    def setUp(self):
+        self.mock_client = Mock()
+        self.mock_client.databases.retrieve.return_value = {"data_sources": [{"id": "source-1"}]}
+        self.mock_client.pages.create.return_value = {"id": "new-page"}
+        self.mock_ai_model = Mock(spec=AIModel)
+        self.mock_ai_model.choose_title.return_value = "Title"
+        self.notion_api = NotionAPI(
+            notion_api_key="unused",
+            database_id="database-id",
+            ai_model=self.mock_ai_model,
+            notion_client=self.mock_client
+        )
+        self.tags = ["Health", "Work", "Faith", "Finance", "Journal", "Prayer", "Reading", "Fitness",
+                     "Nutrition", "Career", "Family", "Travel"]
+        self.notion_api.get_all_tags = Mock(return_value=self.tags)
+
+    def test_only_the_shortlist_reaches_the_llm(self):
+        self.mock_ai_model.choose_tag.return_value = "Nutrition"
+
+        note = self.notion_api.write_note("Meal prepped chicken and rice", tag_counts={"Nutrition": 12})
+
+        self.assertEqual(note["tags"], ["Nutrition"])
+        offered = self.mock_ai_model.choose_tag.call_args.args[1]
+        self.assertEqual(len(offered), self.notion_api.tag_ranker.k)
+        self.assertEqual(offered[0], "Nutrition")
+
+    def test_clear_winner_skips_the_llm(self):
+        note = self.notion_api.write_note("Read 30 pages before bed")
+
+        self.assertEqual(note["tags"], ["Reading"])
+        self.mock_ai_model.choose_tag.assert_not_called()
+
+
 if __name__ == '__main__':
     # Run tests with verbosity
     unittest.main(verbosity=2)
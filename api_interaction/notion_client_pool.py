@@ -0,0 +1,90 @@
+import hashlib
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+
+from notion_client import Client
+from services.priority_scheduler import notion_scheduler
+
+
+def integration_key_hash(notion_api_key: str) -> str:
+    """Stable identifier for an integration token that is safe to log"""
+    return hashlib.sha256(notion_api_key.encode("utf-8")).hexdigest()[:16]
+
+
+class ScheduledClient(Client):
+    """Client whose requests each hold a notion_scheduler slot, so replies go ahead of syncs"""
+
+    def request(self, *args, **kwargs):
+        with notion_scheduler.slot():
+            return super().request(*args, **kwargs)
+
+
+class NotionClientPool:
+    """
+    Bounded LRU pool of Notion clients keyed by integration token
+
+    Each notion_client.Client owns an httpx connection pool, so reusing clients
+    keeps connections to api.notion.com alive between messages. When the pool is
+    full the least recently used client is evicted. A NotionAPI on another thread
+    may still be using it, so its connections are closed only once the last
+    reference to it is gone.
+    """
+
+    def __init__(self, max_size: int = 128, client_options: dict = None):
+        """
+        Args:
+            max_size: Maximum number of clients kept open
+            client_options: Extra keyword arguments passed to every Client
+        """
+        self.max_size = max_size
+        self.client_options = client_options or {}
+        self.clients = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, notion_api_key: str) -> Client:
+        """Return the pooled client for this token, creating it if needed"""
+        key = integration_key_hash(notion_api_key)
+        with self.lock:
+            client = self.clients.get(key)
+            if client is not None:
+                self.clients.move_to_end(key)
+                return client
+
+            client = ScheduledClient(auth=notion_api_key, **self.client_options)
+            # Close the connections when the client is collected; the callback must not
+            # reference the client itself, or it would never be collected
+            weakref.finalize(client, self._close, key, client.client)
+            self.clients[key] = client
+            while len(self.clients) > self.max_size:
+                self.clients.popitem(last=False)
+        return client
+
+    def discard(self, notion_api_key: str):
+        """Drop the client for a token, e.g. after it was revoked; it closes once no longer in use"""
+        key = integration_key_hash(notion_api_key)
+        with self.lock:
+            self.clients.pop(key, None)
+
+    def close(self):
+        """Close every pooled client now, e.g. at shutdown"""
+        with self.lock:
+            clients = list(self.clients.items())
+            self.clients.clear()
+        for key, client in clients:
+            self._close(key, client.client)
+
+    def __len__(self):
+        return len(self.clients)
+
+    @staticmethod
+    def _close(key: str, http_client):
+        try:
+            http_client.close()
+        except Exception as e:
+            logging.warning(f"Error closing Notion client {key}: {e}")
+
+
+# Shared by every NotionAPI that is not handed an explicit client
+notion_client_pool = NotionClientPool()
@@ -0,0 +1,73 @@
+import gc
+import unittest
+from unittest.mock import patch
+from notion_client import Client
+from api_interaction.notion_client_pool import NotionClientPool, integration_key_hash
+from services.priority_scheduler import notion_scheduler, priority, INTERACTIVE
+
+
+class TestNotionClientPool(unittest.TestCase):
+    """Test suite for NotionClientPool"""
+
+    def test_reuses_client_per_token(self):
+        """The same token gets the same client back"""
+        pool = NotionClientPool(max_size=4)
+
+        first = pool.get("secret_a")
+        self.assertIs(pool.get("secret_a"), first)
+        self.assertIsNot(pool.get("secret_b"), first)
+        self.assertEqual(len(pool), 2)
+
+    def test_evicted_client_closes_once_no_longer_used(self):
+        """The pool stays bounded; an evicted client still in use keeps its connections until released"""
+        pool = NotionClientPool(max_size=2)
+        client_a = pool.get("secret_a")
+        client_b = pool.get("secret_b")
+        pool.get("secret_a")
+        http_b = client_b.client
+
+        with patch.object(http_b, "close") as close_b, patch.object(client_a.client, "close") as close_a:
+            pool.get("secret_c")
+            self.assertEqual(len(pool), 2)
+            self.assertNotIn(integration_key_hash("secret_b"), pool.clients)
+            close_b.assert_not_called()
+
+            del client_b
+            gc.collect()
+            close_b.assert_called_once()
+            close_a.assert_not_called()
+        self.assertIs(pool.get("secret_a"), client_a)
+
+    def test_client_options_are_applied(self):
+        """Options such as retry=False reach every pooled client"""
+        pool = NotionClientPool(client_options={"retry": False})
+
+        client = pool.get("secret_a")
+
+        self.assertEqual(client._max_retries, 0)
+
+    def test_keys_are_hashed(self):
+        """Raw tokens are never used as pool keys"""
+        pool = NotionClientPool()
+        pool.get("secret_a")
+
+        self.assertNotIn("secret_a", pool.clients)
+        self.assertIn(integration_key_hash("secret_a"), pool.clients)
+
+    def test_requests_hold_a_notion_slot(self):
+        """Pooled clients take a notion_scheduler slot for each request, in the caller's priority class"""
+        held = []
+
+        def request(client, *args, **kwargs):
+            held.append(notion_scheduler.stats()[INTERACTIVE]["running"])
+            return {"results": []}
+
+        with patch.object(Client, "request", request), priority(INTERACTIVE):
+            NotionClientPool().get("secret_a").search(query="")
+
+        self.assertEqual(held, [1])
+        self.assertEqual(notion_scheduler.stats()[INTERACTIVE]["running"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,473 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from notion_client import APIResponseError
+from notion_client.errors import RequestTimeoutError
+from ai_model import AIModel
+from api_interaction.notion_api import NotionAPI, DAILY_LOG_TAG
+from api_interaction.notion_client_pool import NotionClientPool, integration_key_hash
+from services.token_bucket import TokenBucket
+from services.priority_scheduler import priority, INTERACTIVE
+
+
+# What Does this class do?
+# Durable write-behind queue for Notion operations
+#   - Rows live in SQLite so queued writes survive a restart; in production the file
+#     (NOTION_QUEUE_PATH) must be on storage shared by every instance, and rows are
+#     claimed with leases so instances sharing it never run the same write twice
+#   - Writes for one user replay strictly in the order they arrived
+#   - Every integration key gets its own token bucket (~3 req/s on Notion's side)
+#   - 429s honor Retry-After, other transient failures back off exponentially
+#   - Daily-log entries are appended to one page per user per day, and entries
+#     queued back to back go out in a single append
+#   - Integration tokens are never written to disk: rows keep a hash of the token, and the
+#     token itself is kept in memory, or looked up from the user after a restart
+
+# Notion requests made by each operation, charged against the integration's bucket
+OPERATION_COST = {
+    "create_note": 2,  # databases.retrieve for tags + pages.create
+    "append_daily_log": 3,  # databases.retrieve + data_sources.query + create/append, on a page cache miss
+}
+
+# Notion accepts at most 100 child blocks per append
+DAILY_LOG_BATCH_SIZE = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notion_writes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    phone_number TEXT NOT NULL,
+    integration_key TEXT NOT NULL,
+    database_id TEXT NOT NULL,
+    operation TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    lease_expires_at REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS notion_writes_user_order
+    ON notion_writes (phone_number, status, id);
+"""
+
+# Oldest unfinished row of every user, if it is due. A user whose head row is
+# in flight or backing off has nothing ready, which keeps their writes in order.
+READY_HEADS_QUERY = """
+SELECT id, phone_number, integration_key, database_id, operation, payload, attempts
+FROM notion_writes AS w
+WHERE status = 'pending'
+  AND next_attempt_at <= ?
+  AND id = (
+      SELECT MIN(id) FROM notion_writes
+      WHERE phone_number = w.phone_number AND status IN ('pending', 'in_flight')
+  )
+ORDER BY id
+"""
+
+
+def parse_retry_after(value, default: float) -> float:
+    """Parse a Retry-After header given either as seconds or as an HTTP date"""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+# The queue does its own 429 handling, so its clients must not sleep on retries
+queue_client_pool = NotionClientPool(client_options={"retry": False})
+
+
+def default_notion_api_factory(notion_api_key: str, database_id: str) -> NotionAPI:
+    client = queue_client_pool.get(notion_api_key)
+    return NotionAPI(notion_api_key, database_id, AIModel(), notion_client=client)
+
+
+class DailyLogPageCache:
+    """Page ID of each user's daily-log page, keyed by (phone_number, date)"""
+
+    def __init__(self):
+        self.pages = {}
+        self.latest_date = ""
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            return self.pages.get(key)
+
+    def __setitem__(self, key, page_id):
+        with self.lock:
+            _, date = key
+            if date > self.latest_date:
+                # Only the current day's pages are appended to, so drop older days
+                self.pages = {k: v for k, v in self.pages.items() if k[1] >= date}
+                self.latest_date = date
+            self.pages[key] = page_id
+
+    def pop(self, key, default=None):
+        with self.lock:
+            return self.pages.pop(key, default)
+
+
+class NotionWriteQueue:
+    def __init__(
+        self,
+        db_path: str = "notion_writes.db",
+        rate_per_second: float = 3.0,
+        burst: float = 3.0,
+        max_attempts: int = 8,
+        base_backoff: float = 1.0,
+        max_backoff: float = 300.0,
+        lease_seconds: float = 120.0,
+        workers: int = 4,
+        notion_api_factory=default_notion_api_factory,
+        on_failure=None,
+        on_written=None,
+        tag_counts=None,
+        notion_api_key_for=None,
+        clock=time.time,
+    ):
+        """
+        Args:
+            db_path: SQLite file holding the queue
+            rate_per_second: Sustained Notion requests per second per integration
+            burst: Requests an idle integration may send back to back
+            max_attempts: Attempts before a write is marked failed
+            base_backoff: First retry delay in seconds, doubled per attempt
+            max_backoff: Upper bound on the retry delay
+            lease_seconds: How long a claimed row stays in flight before another worker may retry it
+            workers: Number of background worker threads started by start()
+            notion_api_factory: Callable (notion_api_key, database_id) -> NotionAPI
+            on_failure: Optional callable (phone_number, operation, error) for writes that gave up
+            on_written: Optional callable (phone_number, operation, written) after a successful write,
+                        where written has page_id, title, tags and the contents that were written
+            tag_counts: Optional callable phone_number -> {tag: times used}, to shortlist a note's tags
+            notion_api_key_for: Optional callable phone_number -> the user's Notion token (or None), for
+                                rows queued before a restart; tokens are not stored in the queue
+            clock: Clock used for scheduling and rate limiting, injectable for tests
+        """
+        self.db_path = db_path
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.lease_seconds = lease_seconds
+        self.workers = workers
+        self.notion_api_factory = notion_api_factory
+        self.on_failure = on_failure
+        self.on_written = on_written
+        self.tag_counts = tag_counts
+        self.notion_api_key_for = notion_api_key_for
+        self.clock = clock
+
+        # integration_key -> token, for rows enqueued by this process
+        self.notion_api_keys = {}
+
+        self.buckets = {}
+        self.daily_log_pages = DailyLogPageCache()
+        self.buckets_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopping = threading.Event()
+        self.threads = []
+
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _bucket(self, integration_key: str) -> TokenBucket:
+        with self.buckets_lock:
+            bucket = self.buckets.get(integration_key)
+            if bucket is None:
+                bucket = TokenBucket(self.rate_per_second, self.burst, clock=self.clock)
+                self.buckets[integration_key] = bucket
+            return bucket
+
+    def acquire(self, notion_api_key: str, requests: int = 1, timeout: float = None) -> bool:
+        """
+        Block until the integration may send `requests` more Notion requests
+
+        For other Notion work (e.g. note index syncs) that must share the queue's rate limit.
+        Returns False if `timeout` runs out first.
+        """
+        return self._bucket(integration_key_hash(notion_api_key)).acquire(requests, timeout)
+
+    def _backoff(self, attempts: int) -> float:
+        return min(self.max_backoff, self.base_backoff * (2 ** max(0, attempts - 1)))
+
+    def enqueue(self, phone_number: str, notion_api_key: str, database_id: str, operation: str, payload: dict) -> int:
+        """
+        Queue a Notion operation for a user
+
+        Returns:
+            int: ID of the queued row
+        """
+        if not notion_api_key:
+            raise ValueError(f"No Notion integration key for {phone_number}")
+        if operation not in OPERATION_COST:
+            raise ValueError(f"Unknown Notion operation: {operation}")
+        if operation == "append_daily_log" and "date" not in payload:
+            raise ValueError("append_daily_log payload needs a date")
+
+        now = self.clock()
+        integration_key = integration_key_hash(notion_api_key)
+        self.notion_api_keys[integration_key] = notion_api_key
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO notion_writes "
+                "(phone_number, integration_key, database_id, operation, payload, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (phone_number, integration_key, database_id, operation, json.dumps(payload), now, now)
+            )
+            row_id = cursor.lastrowid
+
+        self.wake.set()
+        return row_id
+
+    def pending_count(self, phone_number: str = None) -> int:
+        """Number of writes not yet completed, optionally for one user"""
+        query = "SELECT COUNT(*) FROM notion_writes WHERE status IN ('pending', 'in_flight')"
+        args = ()
+        if phone_number:
+            query += " AND phone_number = ?"
+            args = (phone_number,)
+        with self._connect() as conn:
+            return conn.execute(query, args).fetchone()[0]
+
+    def _recover_expired_leases(self, conn, now: float):
+        # Rows claimed by a worker that died mid-write go back to pending
+        conn.execute(
+            "UPDATE notion_writes SET status = 'pending', lease_expires_at = NULL "
+            "WHERE status = 'in_flight' AND lease_expires_at < ?",
+            (now,)
+        )
+
+    def _claim(self, conn, row_ids: list, now: float) -> bool:
+        placeholders = ", ".join("?" for _ in row_ids)
+        cursor = conn.execute(
+            "UPDATE notion_writes SET status = 'in_flight', lease_expires_at = ? "
+            f"WHERE id IN ({placeholders}) AND status = 'pending'",
+            (now + self.lease_seconds, *row_ids)
+        )
+        return cursor.rowcount == len(row_ids)
+
+    def _daily_log_batch(self, conn, head: tuple, phone_number: str, integration_key: str, now: float) -> list:
+        """
+        Head row plus the consecutive daily-log rows queued right behind it, as (id, payload, attempts)
+
+        Rows for the same day are appended to the page in a single request.
+        """
+        head_id, payload, _ = head
+        rows = conn.execute(
+            "SELECT id, integration_key, operation, payload, next_attempt_at, attempts FROM notion_writes "
+            "WHERE phone_number = ? AND status = 'pending' AND id > ? ORDER BY id LIMIT ?",
+            (phone_number, head_id, DAILY_LOG_BATCH_SIZE - 1)
+        ).fetchall()
+
+        batch = [head]
+        for row_id, row_key, operation, row_payload, next_attempt_at, attempts in rows:
+            row_payload = json.loads(row_payload)
+            if (operation != "append_daily_log" or row_key != integration_key
+                    or row_payload["date"] != payload["date"] or next_attempt_at > now):
+                break
+            batch.append((row_id, row_payload, attempts))
+        return batch
+
+    def _cost(self, phone_number: str, operation: str, payload: dict) -> int:
+        if operation == "append_daily_log" and self.daily_log_pages.get((phone_number, payload["date"])):
+            return 1  # blocks.children.append on the cached page
+        return OPERATION_COST[operation]
+
+    def process_due(self) -> int:
+        """
+        Run every write that is due and within its integration's rate budget
+
+        Returns:
+            int: Number of rows attempted
+        """
+        now = self.clock()
+        with self._connect() as conn:
+            self._recover_expired_leases(conn, now)
+            rows = conn.execute(READY_HEADS_QUERY, (now,)).fetchall()
+
+        attempted = 0
+        for row in rows:
+            row_id, phone_number, integration_key, database_id, operation, payload, attempts = row
+            payload = json.loads(payload)
+
+            bucket = self._bucket(integration_key)
+            cost = self._cost(phone_number, operation, payload)
+            if bucket.try_acquire(cost) > 0:
+                continue
+
+            with self._connect() as conn:
+                batch = [(row_id, payload, attempts)]
+                if operation == "append_daily_log":
+                    batch = self._daily_log_batch(conn, batch[0], phone_number, integration_key, now)
+                claimed = self._claim(conn, [row_id], now)
+                if claimed and len(batch) > 1:
+                    # Rows behind an in-flight head are never heads themselves
+                    self._claim(conn, [batch_id for batch_id, _, _ in batch[1:]], now)
+            if not claimed:
+                # Another worker got there first
+                bucket.refund(cost)
+                continue
+
+            attempted += len(batch)
+            self._execute(batch, phone_number, integration_key, database_id, operation)
+
+        return attempted
+
+    def _notion_api_key(self, phone_number: str, integration_key: str):
+        notion_api_key = self.notion_api_keys.get(integration_key)
+        if notion_api_key is None and self.notion_api_key_for:
+            notion_api_key = self.notion_api_key_for(phone_number)
+        return notion_api_key
+
+    def _execute(self, batch, phone_number, integration_key, database_id, operation):
+        """Run one claimed batch of (row id, payload, attempts so far) rows"""
+        row_ids = [row_id for row_id, _, _ in batch]
+        # The head row has been tried the most; it decides the backoff
+        attempts = batch[0][2] + 1
+        notion_api_key = self._notion_api_key(phone_number, integration_key)
+        if not notion_api_key:
+            self._fail(batch, phone_number, operation, ValueError(f"No Notion integration key for {phone_number}"))
+            return
+        try:
+            notion_api = self.notion_api_factory(notion_api_key, database_id)
+            if operation == "create_note":
+                kwargs = {"tag_counts": self.tag_counts(phone_number)} if self.tag_counts else {}
+                note = notion_api.write_note(batch[0][1]["content"], owner=phone_number, **kwargs)
+                written = dict(note, contents=[batch[0][1]["content"]])
+            elif operation == "append_daily_log":
+                date = batch[0][1]["date"]
+                contents = [payload["content"] for _, payload, _ in batch]
+                page_id = notion_api.write_daily_log(
+                    contents,
+                    date,
+                    page_id=self.daily_log_pages.get((phone_number, date)),
+                    owner=phone_number
+                )
+                self.daily_log_pages[(phone_number, date)] = page_id
+                written = {"page_id": page_id, "title": date, "tags": [DAILY_LOG_TAG], "contents": contents}
+
+            with self._connect() as conn:
+                placeholders = ", ".join("?" for _ in row_ids)
+                conn.execute(f"DELETE FROM notion_writes WHERE id IN ({placeholders})", row_ids)
+            logging.info(f"Notion {operation} for {phone_number} completed {len(row_ids)} row(s) after {attempts} attempt(s)")
+            self._notify_written(phone_number, operation, written)
+
+        except APIResponseError as e:
+            if e.status == 429:
+                delay = parse_retry_after(e.headers.get("Retry-After"), self._backoff(attempts))
+                self._bucket(integration_key).pause(delay)
+                self._retry(batch, phone_number, operation, e, max(delay, self._backoff(attempts)))
+            elif e.status >= 500:
+                self._retry(batch, phone_number, operation, e, self._backoff(attempts))
+            elif e.status == 404 and operation == "append_daily_log":
+                # The cached page was deleted or unshared; look it up again
+                self.daily_log_pages.pop((phone_number, batch[0][1]["date"]), None)
+                self._retry(batch, phone_number, operation, e, self._backoff(attempts))
+            else:
+                self._fail(batch, phone_number, operation, e)
+
+        except RequestTimeoutError as e:
+            self._retry(batch, phone_number, operation, e, self._backoff(attempts))
+
+        except Exception as e:
+            # LLM and network errors are usually transient
+            self._retry(batch, phone_number, operation, e, self._backoff(attempts))
+
+    def _notify_written(self, phone_number, operation, written):
+        if not self.on_written:
+            return
+        try:
+            self.on_written(phone_number, operation, written)
+        except Exception as e:
+            logging.error(f"Error in Notion write callback: {e}")
+
+    def _retry(self, batch, phone_number, operation, error, delay):
+        # Each row counts its own attempts; rows that joined a batch late have fewer
+        exhausted = [row for row in batch if row[2] + 1 >= self.max_attempts]
+        if exhausted:
+            self._fail(exhausted, phone_number, operation, error)
+        row_ids = [row_id for row_id, _, attempts in batch if attempts + 1 < self.max_attempts]
+        if not row_ids:
+            return
+
+        logging.warning(f"Notion {operation} for {phone_number} failed (attempt {batch[0][2] + 1}), retrying in {delay:.1f}s: {error}")
+        placeholders = ", ".join("?" for _ in row_ids)
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE notion_writes SET status = 'pending', attempts = attempts + 1, next_attempt_at = ?, "
+                f"lease_expires_at = NULL, last_error = ? WHERE id IN ({placeholders})",
+                (self.clock() + delay, str(error), *row_ids)
+            )
+
+    def _fail(self, batch, phone_number, operation, error):
+        row_ids = [row_id for row_id, _, _ in batch]
+        logging.error(f"❌ Notion {operation} for {phone_number} failed permanently after {batch[0][2] + 1} attempt(s): {error}")
+        placeholders = ", ".join("?" for _ in row_ids)
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE notion_writes SET status = 'failed', attempts = attempts + 1, lease_expires_at = NULL, "
+                f"last_error = ? WHERE id IN ({placeholders})",
+                (str(error), *row_ids)
+            )
+        if self.on_failure:
+            try:
+                self.on_failure(phone_number, operation, error)
+            except Exception as e:
+                logging.error(f"Error in Notion write failure callback: {e}")
+
+    def _worker_loop(self, poll_interval: float):
+        # Queued writes come from users' messages, so their tag/title calls are interactive
+        with priority(INTERACTIVE):
+            self._drain_loop(poll_interval)
+
+    def _drain_loop(self, poll_interval: float):
+        while not self.stopping.is_set():
+            try:
+                attempted = self.process_due()
+            except Exception as e:
+                logging.error(f"Error processing Notion write queue: {e}")
+                attempted = 0
+
+            if not attempted:
+                self.wake.wait(poll_interval)
+                self.wake.clear()
+
+    def start(self, poll_interval: float = 0.5):
+        """Start background worker threads"""
+        if self.threads:
+            return
+        self.stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._worker_loop,
+                args=(poll_interval,),
+                name=f"notion-write-queue-{i}",
+                daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        """Stop background workers; unfinished rows stay queued on disk"""
+        self.stopping.set()
+        self.wake.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
@@ -0,0 +1,241 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import Mock
+import httpx
+from notion_client import APIResponseError
+from api_interaction.notion_write_queue import NotionWriteQueue, parse_retry_after
+from services.token_bucket import TokenBucket
+from testing.fake_clock import FakeClock
+
+
+def rate_limited_error(retry_after="7"):
+    return APIResponseError(
+        code="rate_limited",
+        status=429,
+        message="Rate limited",
+        headers=httpx.Headers({"Retry-After": retry_after}),
+        raw_body_text=""
+    )
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_refill(self):
+        """Tokens run out after the burst and come back at the configured rate"""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=3, capacity=3, clock=clock)
+
+        for _ in range(3):
+            self.assertEqual(bucket.try_acquire(), 0.0)
+        self.assertAlmostEqual(bucket.try_acquire(), 1 / 3)
+
+        clock.now += 1
+        self.assertEqual(bucket.try_acquire(3), 0.0)
+
+    def test_pause_withholds_tokens(self):
+        """pause() blocks acquisition until the pause ends"""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=3, capacity=3, clock=clock)
+
+        bucket.pause(5)
+        self.assertAlmostEqual(bucket.try_acquire(), 5)
+
+        clock.now += 5.5
+        self.assertEqual(bucket.try_acquire(), 0.0)
+
+
+class TestNotionWriteQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.clock = FakeClock()
+        self.notion_api = Mock()
+        self.written = []
+        self.notion_api.write_note.side_effect = lambda content, **kwargs: self.written.append(content) or self._note()
+        self.on_failure = Mock()
+        self.queue = NotionWriteQueue(
+            os.path.join(self.tmp.name, "queue.db"),
+            rate_per_second=3,
+            burst=4,
+            max_attempts=3,
+            notion_api_factory=lambda key, database_id: self.notion_api,
+            on_failure=self.on_failure,
+            clock=self.clock
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _note(self):
+        return {"page_id": "page-id", "title": "Title", "tags": ["General"]}
+
+    def test_writes_replay_in_order_per_user(self):
+        """A user's writes run one at a time in arrival order"""
+        self.queue.enqueue("+1555", "key-a", "db", "create_note", {"content": "first"})
+        self.queue.enqueue("+1555", "key-a", "db", "create_note", {"content": "second"})
+
+        self.assertEqual(self.queue.process_due(), 1)
+        self.assertEqual(self.written, ["first"])
+
+        self.clock.now += 1
+        self.assertEqual(self.queue.process_due(), 1)
+        self.assertEqual(self.written, ["first", "second"])
+        self.assertEqual(self.queue.pending_count(), 0)
+
+    def test_rate_limit_is_per_integration(self):
+        """One integration's budget does not hold back another's"""
+        self.queue.enqueue("+1111", "key-a", "db", "create_note", {"content": "a1"})
+        self.queue.enqueue("+2222", "key-a", "db", "create_note", {"content": "a2"})
+        self.queue.enqueue("+3333", "key-a", "db", "create_note", {"content": "a3"})
+        self.queue.enqueue("+4444", "key-b", "db", "create_note", {"content": "b1"})
+
+        self.queue.process_due()
+
+        # Burst of 4 tokens covers two create_note operations on key-a
+        self.assertEqual(self.written, ["a1", "a2", "b1"])
+        self.assertEqual(self.queue.pending_count("+3333"), 1)
+
+    def test_other_notion_work_shares_the_budget(self):
+        """Requests taken with acquire() (e.g. note syncs) hold back writes on that integration"""
+        self.assertTrue(self.queue.acquire("key-a", 3, timeout=0))
+        self.queue.enqueue("+1111", "key-a", "db", "create_note", {"content": "a1"})
+
+        self.assertEqual(self.queue.process_due(), 0)
+        self.clock.now += 1
+        self.assertEqual(self.queue.process_due(), 1)
+
+    def test_429_honors_retry_after_and_keeps_order(self):
+        """A rate-limited write waits for Retry-After and blocks the user's later writes"""
+        self.notion_api.write_note.side_effect = [rate_limited_error("7"), self._note(), self._note()]
+        self.queue.enqueue("+1555", "key-a", "db", "create_note", {"content": "first"})
+        self.queue.enqueue("+1555", "key-a", "db", "create_note", {"content": "second"})
+
+        self.queue.process_due()
+        self.clock.now += 5
+        self.assertEqual(self.queue.process_due(), 0)
+
+        self.clock.now += 3
+        self.queue.process_due()
+        self.clock.now += 1
+        self.queue.process_due()
+
+        contents = [call.args[0] for call in self.notion_api.write_note.call_args_list]
+        self.assertEqual(contents, ["first", "first", "second"])
+        self.assertEqual(self.queue.pending_count(), 0)
+
+    def test_gives_up_after_max_attempts(self):
+        """Writes that keep failing are marked failed and reported"""
+        self.notion_api.write_note.side_effect = RuntimeError("LLM unavailable")
+        self.queue.enqueue("+1555", "key-a", "db", "create_note", {"content": "note"})
+
+        for _ in range(3):
+            self.queue.process_due()
+            self.clock.now += 600
+
+        self.assertEqual(self.queue.pending_count(), 0)
+        self.on_failure.assert_called_once()
+        self.assertEqual(self.on_failure.call_args.args[:2], ("+1555", "create_note"))
+
+    def test_queue_survives_restart(self):
+        """Rows are on disk, so a new queue instance picks them up"""
+        self.queue.enqueue("+1555", "key-a", "db", "create_note", {"content": "durable"})
+
+        factory = Mock(return_value=self.notion_api)
+        restarted = NotionWriteQueue(
+            self.queue.db_path,
+            notion_api_factory=factory,
+            notion_api_key_for=lambda phone_number: "key-a",
+            clock=self.clock
+        )
+        restarted.process_due()
+
+        self.assertEqual(self.written, ["durable"])
+        self.assertEqual(factory.call_args.args, ("key-a", "db"))
+
+    def test_tokens_are_not_stored(self):
+        """Only a hash of the integration token reaches the queue file"""
+        self.queue.enqueue("+1555", "key-a", "db", "create_note", {"content": "note"})
+        with open(self.queue.db_path, "rb") as f:
+            self.assertNotIn(b"key-a", f.read())
+        with self.assertRaises(ValueError):
+            self.queue.enqueue("+1555", None, "db", "create_note", {"content": "note"})
+
+    def test_parse_retry_after(self):
+        """Retry-After accepts seconds and falls back to the default"""
+        self.assertEqual(parse_retry_after("2.5", 1.0), 2.5)
+        self.assertEqual(parse_retry_after(None, 1.0), 1.0)
+        self.assertEqual(parse_retry_after("garbage", 1.0), 1.0)
+
+
+    def test_daily_log_entries_are_batched(self):
+        """Back-to-back daily-log entries go out as one append and reuse the cached page"""
+        self.notion_api.write_daily_log.return_value = "page-1"
+        for content in ["ran 5k", "read 20 pages", "slept 8h"]:
+            self.queue.enqueue("+1555", "key-a", "db", "append_daily_log", {"content": content, "date": "2025-11-24"})
+
+        self.assertEqual(self.queue.process_due(), 3)
+        self.notion_api.write_daily_log.assert_called_once_with(
+            ["ran 5k", "read 20 pages", "slept 8h"], "2025-11-24", page_id=None, owner="+1555"
+        )
+
+        self.clock.now += 1
+        self.queue.enqueue("+1555", "key-a", "db", "append_daily_log", {"content": "meditated", "date": "2025-11-24"})
+        self.queue.process_due()
+
+        self.assertEqual(self.notion_api.write_daily_log.call_args.kwargs["page_id"], "page-1")
+        self.assertEqual(self.queue.pending_count(), 0)
+
+    def test_daily_log_batch_stops_at_other_operations(self):
+        """A batch never reorders a user's writes around a different operation"""
+        self.queue.enqueue("+1555", "key-a", "db", "append_daily_log", {"content": "one", "date": "2025-11-24"})
+        self.queue.enqueue("+1555", "key-a", "db", "create_note", {"content": "note"})
+        self.queue.enqueue("+1555", "key-a", "db", "append_daily_log", {"content": "two", "date": "2025-11-24"})
+
+        self.assertEqual(self.queue.process_due(), 1)
+        self.assertEqual(self.notion_api.write_daily_log.call_args.args[0], ["one"])
+
+    def test_batched_rows_count_their_own_attempts(self):
+        """A row that joined a failing batch late is not failed along with the head"""
+        self.notion_api.write_daily_log.side_effect = RuntimeError("Notion unavailable")
+        self.queue.enqueue("+1555", "key-a", "db", "append_daily_log", {"content": "one", "date": "2025-11-24"})
+        self.queue.process_due()
+        self.clock.now += 600
+        self.queue.enqueue("+1555", "key-a", "db", "append_daily_log", {"content": "two", "date": "2025-11-24"})
+        self.queue.process_due()
+        self.clock.now += 600
+        self.queue.process_due()
+
+        # The head failed for the third time; the second row has one attempt left
+        self.on_failure.assert_called_once()
+        self.assertEqual(self.queue.pending_count(), 1)
+        with sqlite3.connect(self.queue.db_path) as conn:
+            self.assertEqual(conn.execute("SELECT status, attempts FROM notion_writes ORDER BY id").fetchall(),
+                             [("failed", 3), ("pending", 2)])
+
+    def test_on_written_reports_what_was_written(self):
+        """Successful writes are reported with the page and contents"""
+        on_written = Mock()
+        self.queue.on_written = on_written
+        self.queue.enqueue("+1555", "key-a", "db", "create_note", {"content": "ran 5k"})
+
+        self.queue.process_due()
+
+        phone_number, operation, written = on_written.call_args.args
+        self.assertEqual((phone_number, operation), ("+1555", "create_note"))
+        self.assertEqual(written["page_id"], "page-id")
+        self.assertEqual(written["contents"], ["ran 5k"])
+
+    def test_tag_counts_are_passed_to_write_note(self):
+        """The writer's tag history reaches write_note for the tag shortlist"""
+        self.notion_api.write_note.side_effect = None
+        self.notion_api.write_note.return_value = self._note()
+        self.queue.tag_counts = Mock(return_value={"Fitness": 3})
+        self.queue.enqueue("+1555", "key-a", "db", "create_note", {"content": "ran 5k"})
+
+        self.queue.process_due()
+
+        self.queue.tag_counts.assert_called_once_with("+1555")
+        self.notion_api.write_note.assert_called_once_with("ran 5k", owner="+1555", tag_counts={"Fitness": 3})
+
+if __name__ == '__main__':
+    unittest.main()
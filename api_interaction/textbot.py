@@ -1,6 +1,10 @@
 import os
 import requests
 import logging
+from services.priority_scheduler import sms_scheduler
+
+# (connect, read) seconds; a send holds an sms_scheduler slot until it returns
+TEXTBELT_TIMEOUT = (5, 15)
 
 class Textbot:
     def __init__(self, reply_webhook_url):
@@ -10,12 +14,13 @@ class Textbot:
     def send_text(self, text: str, phone_number: str):
         phone_number = phone_number.strip("+")
         logging.info(f"Sending text to {phone_number}: {text}")
-        resp = requests.post('https://textbelt.com/text', {
-            'phone': str(phone_number),
-            'message': text,
-            'key': os.getenv('TEXTBELT_INTERNATIONAL_KEY'), 
-            'replyWebhookUrl': self.reply_webhook_url + '/api/handleSmsReply'
-        })
+        with sms_scheduler.slot():
+            resp = requests.post('https://textbelt.com/text', {
+                'phone': str(phone_number),
+                'message': text,
+                'key': os.getenv('TEXTBELT_INTERNATIONAL_KEY'), 
+                'replyWebhookUrl': self.reply_webhook_url + '/api/handleSmsReply'
+            }, timeout=TEXTBELT_TIMEOUT)
         logging.info("Textbot response: %s", str(resp.json()))
         print("PRINT Textbot response: %s", str(resp.json()))
         return resp.json()
\ No newline at end of file
@@ -1,124 +1,189 @@
 import string
+import time
+import types
 from ai_model import AIModel
 import firebase_admin
 from firebase_admin import credentials
 from firebase_admin import firestore
-from flask import Flask, request, jsonify, redirect, session
+from flask import Flask, request, jsonify, redirect
 import json
 import logging
+from api_interaction.notion_write_queue import NotionWriteQueue
 from api_interaction.notion_api import NotionAPI
-from notion_client import Client
-import os
 import requests
 from api_interaction.textbot import Textbot
-from user import User
-from dotenv import load_dotenv
+from user import UserRecord
 from constants.action_types import ActionType
-from api_interaction.habitify_api import HabitifyAPI
-from api_interaction.google_cal_api import GoogleCalendarAPI
+from handlers.registry import ACTION_HANDLERS, ReplyContext
+from services.note_index import NoteIndex, NoteSyncer
+from services.embedding_index import EmbeddingIndex
+from services.conversation_memory import ConversationMemory, FirestoreConversationStore
+from services.nudge_scheduler import FirestoreNudgeStore, NudgeScheduler
+from services.message_pool import MessagePool
+from services.user_cache import UserCache
+from services.traffic_recorder import TrafficRecorder
+from services.traffic_replay import WAIT_HEADER
+from services.partitioned_executor import PartitionedExecutor, LaneFull
+from services.admission import AdmissionController, ADMITTED, RATE_LIMITED
+from services.priority_scheduler import (prioritized, INTERACTIVE, SCHEDULED, BULK, llm_scheduler, sms_scheduler,
+                                         notion_scheduler, calendar_scheduler)
+from concurrent.futures import ThreadPoolExecutor
+from services.oauth_state import FirestoreOAuthStateStore
+from services.shard_leases import FirestoreLeaseStore, ShardCoordinator, ShardedJob
 from google_auth_oauthlib.flow import Flow
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from settings import get_settings, load_settings, watch_settings
 
-# Load environment variables
-try:
-    load_dotenv()
-except:
-    pass
+# Set up basic config — do this once, near the top of your app
+logging.basicConfig(level=logging.INFO)
 
-PUBLIC_URL = "https://textbot-service-939342988447.us-central1.run.app"
-LOCAL_URL = "https://fine-prawn-driven.ngrok-free.app"
-IS_PUBLIC = True
+# Settings are loaded and validated once; URLs, personality etc. can change without a
+# restart via SIGHUP or by editing $SETTINGS_FILE. Secrets below are only read at startup
+# Checked by this process only; other users of settings (tests, tools) don't need Firebase
+REQUIRED_SETTINGS = ("FIREBASE_SERVICE_ACCOUNT",)
+startup_settings = load_settings(required=REQUIRED_SETTINGS)
+watch_settings(required=REQUIRED_SETTINGS)
 
-cred_info = json.loads(os.environ["FIREBASE_SERVICE_ACCOUNT"])
+cred_info = json.loads(startup_settings.firebase_service_account)
 cred = credentials.Certificate(cred_info)
 firebase_admin.initialize_app(cred)
 
 db = firestore.client()
 
-# Set up basic config — do this once, near the top of your app
-logging.basicConfig(level=logging.INFO)
-
 app = Flask(__name__)
-app.secret_key = os.environ.get("FLASK_SECRET_KEY", "your-secret-key-here")  # Change this in production
-database_id = "23eb9e96-e8f3-80a4-8b8d-c5e9cd16ef40"
+app.secret_key = startup_settings.flask_secret_key  # Change this in production
 
-reply_webhook_url = PUBLIC_URL if IS_PUBLIC else LOCAL_URL
+if startup_settings.stub_providers:
+    # Imported here, like the cassette below: the stubs load every provider client
+    from services import provider_stubs
+    provider_stubs.install(action=startup_settings.stub_action)
+elif startup_settings.cassette_path:
+    from services.cassette import Cassette
+    Cassette(startup_settings.cassette_path, startup_settings.cassette_mode,
+             recorded_latency=startup_settings.cassette_recorded_latency).install()
 
-# Google OAuth Configuration
-GOOGLE_CALENDAR_SCOPES = ['https://www.googleapis.com/auth/calendar']
-GOOGLE_OAUTH_REDIRECT_URI = f"{PUBLIC_URL if IS_PUBLIC else LOCAL_URL}/api/auth/google/callback"
+# Samples of real webhook traffic for load testing; on while TRAFFIC_RECORD_PATH is set
+traffic_recorder = TrafficRecorder(startup_settings.traffic_record_salt)
 
 def send_sms(phone_number, message):
-    textbot = Textbot(reply_webhook_url)
+    textbot = Textbot(get_settings().base_url)
     response = textbot.send_text(message, phone_number)
     logging.info(response)
-
-def find_user_key(phone_number: string, key_type: ActionType):
-    users_ref = db.collection('users')
-    print(phone_number)
-    docs = users_ref.where('PhoneNumber', '==', phone_number).stream()
-
-    for doc in docs:
-        user_data = doc.to_dict()
-        return user_data[key_type.value]
-
-    return None
-
-def get_google_calendar_credentials(phone_number: string):
-    """
-    Retrieves and refreshes Google Calendar credentials for a user
-    Returns a valid Credentials object or None if not found
-    """
-    from google.auth.transport.requests import Request
-
-    users_ref = db.collection('users')
-    docs = users_ref.where('PhoneNumber', '==', phone_number).stream()
-
-    for doc in docs:
-        user_data = doc.to_dict()
-        creds_data = user_data.get('GoogleCalendarCreds')
-
-        if not creds_data:
-            logging.warning(f"No Google Calendar credentials found for {phone_number}")
-            return None
-
-        # Reconstruct Credentials object from stored data
-        creds = Credentials(
-            token=creds_data.get('token'),
-            refresh_token=creds_data.get('refresh_token'),
-            token_uri=creds_data.get('token_uri'),
-            client_id=creds_data.get('client_id'),
-            client_secret=creds_data.get('client_secret'),
-            scopes=creds_data.get('scopes')
+    conversation_memory.record(phone_number, "assistant", message)
+
+def notify_notion_write_failed(phone_number, operation, error):
+    send_sms(phone_number, f"Error logging to Notion: {error}")
+
+# Local full-text and embedding indexes of users' notes, for answering questions about them
+note_index = NoteIndex(startup_settings.note_index_path)
+# Used by background work (embeddings, summaries) that outlives a single request
+background_ai_model = AIModel()
+embedding_index = EmbeddingIndex(
+    startup_settings.embedding_index_dir,
+    background_ai_model.embed_texts,
+    background_ai_model.embedding_dim,
+    model=background_ai_model.embedding_model,
+    quantize=startup_settings.embedding_index_quantize
+)
+
+# Recent turns plus a rolling summary, so replies can refer back to earlier messages
+conversation_memory = ConversationMemory(
+    FirestoreConversationStore(db),
+    prioritized(BULK)(background_ai_model.summarize_conversation)
+)
+
+# Recently seen users, so replies don't re-query Firestore for every message
+user_cache = UserCache(db)
+
+@prioritized(SCHEDULED)
+def send_nudges(nudges):
+    """Follow up with users who have not replied yet"""
+    for nudge in nudges:
+        user = user_cache.get(nudge.phone_number, fields=('interests', 'personality'))
+        if user is None:
+            continue
+        message = background_ai_model.first_message(
+            user.interests_text,
+            conversation_memory.context(nudge.phone_number),
+            user.personality
         )
-
-        # Check if token is expired and refresh if needed
-        if creds.expired and creds.refresh_token:
-            try:
-                logging.info(f"Refreshing expired token for {phone_number}")
-                creds.refresh(Request())
-
-                # Update stored credentials with new token
-                updated_creds_data = {
-                    'token': creds.token,
-                    'refresh_token': creds.refresh_token,
-                    'token_uri': creds.token_uri,
-                    'client_id': creds.client_id,
-                    'client_secret': creds.client_secret,
-                    'scopes': creds.scopes
-                }
-                doc.reference.update({'GoogleCalendarCreds': updated_creds_data})
-                logging.info(f"Token refreshed and updated for {phone_number}")
-
-            except Exception as e:
-                logging.error(f"Error refreshing token for {phone_number}: {e}")
-                return None
-
-        return creds
-
-    logging.warning(f"User not found: {phone_number}")
-    return None
+        send_sms(nudge.phone_number, message)
+
+# Repeats messages until the user responds; a reply cancels the pending nudge
+nudge_scheduler = NudgeScheduler(send_nudges, store=FirestoreNudgeStore(db))
+nudge_scheduler.start()
+
+# Splits users across running instances so periodic jobs run exactly once per user
+# Started by the first ShardedJob and stopped with the last, so it costs nothing while none runs
+shard_coordinator = ShardCoordinator(
+    FirestoreLeaseStore(db),
+    num_shards=startup_settings.shard_count
+)
+
+@prioritized(BULK)
+def index_notion_write(phone_number, operation, written):
+    note_index.record_write(phone_number, operation, written)
+    embedding_index.record_write(phone_number, operation, written)
+
+def notion_api_key_for(phone_number):
+    """The user's Notion token, for writes queued before a restart (the queue doesn't store tokens)"""
+    user = user_cache.get(phone_number, fields=("notion_api_key",))
+    return user.notion_api_key if user else None
+
+# Notion writes complete in the background so the user gets an immediate reply
+notion_write_queue = NotionWriteQueue(
+    startup_settings.notion_queue_path,
+    on_failure=notify_notion_write_failed,
+    on_written=index_notion_write,
+    tag_counts=note_index.tag_counts,
+    notion_api_key_for=notion_api_key_for
+)
+notion_write_queue.start()
+
+# Catches the note index up on pages edited directly in Notion, within each integration's rate limit
+note_syncer = NoteSyncer(
+    note_index,
+    lambda notion_api_key, database_id: NotionAPI(notion_api_key, database_id, background_ai_model),
+    acquire=notion_write_queue.acquire
+)
+
+# What action handlers (handlers/registry.py) get to work with; each handler is imported on first use
+handler_services = types.SimpleNamespace(
+    db=db,
+    user_cache=user_cache,
+    notion_write_queue=notion_write_queue,
+    note_index=note_index,
+    note_syncer=note_syncer,
+    embedding_index=embedding_index
+)
+
+# Provider calls in flight at once, shared by interactive, scheduled and bulk work
+llm_scheduler.resize(startup_settings.llm_concurrency)
+sms_scheduler.resize(startup_settings.sms_send_concurrency)
+notion_scheduler.resize(startup_settings.notion_concurrency)
+calendar_scheduler.resize(startup_settings.calendar_concurrency)
+
+# Replies are processed off the request thread: in arrival order per sender, in parallel across senders
+sms_executor = PartitionedExecutor(
+    lanes=startup_settings.sms_lanes,
+    max_queue_depth=startup_settings.sms_lane_depth,
+    name="sms-lane"
+)
+
+# Per-sender rate limits and a cap on the backlog, checked before any paid call
+admission = AdmissionController(
+    sender_rate=startup_settings.sms_sender_per_minute / 60,
+    sender_burst=startup_settings.sms_sender_burst,
+    max_in_flight=startup_settings.sms_max_in_flight
+)
+RATE_LIMITED_NOTICE = "You're sending messages faster than I can keep up. Give me a minute and try again."
+BUSY_NOTICE = "I'm swamped right now and couldn't handle that message. Please send it again in a few minutes."
+
+# Notices go out off the request thread and skip conversation memory
+notice_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="sms-notice")
+
+def send_notice(phone_number, message):
+    if admission.should_notify(phone_number):
+        notice_executor.submit(prioritized(INTERACTIVE)(Textbot(get_settings().base_url).send_text), message, phone_number)
 
 # Core Function for this App
 # 1) Receive Message from User
@@ -126,93 +191,155 @@ def get_google_calendar_credentials(phone_number: string):
 # 3) Perform Action
 @app.route('/api/handleSmsReply', methods=['POST'])
 def handle_sms_reply():
+    received_at = time.time()
     data = request.get_json()
+    settings = get_settings()
+    if settings.traffic_record_path:
+        try:
+            traffic_recorder.record(settings.traffic_record_path, data, received_at)
+        except Exception as e:
+            logging.error(f"Error recording traffic: {e}")
     text_id: string = data.get('textId')
     from_number: string = data.get('fromNumber')
     text: string = data.get('text')
 
     logging.info(f"📩 Received reply from {from_number}: '{text}' (textId: {text_id})")
+    if not from_number:
+        return '', 400
+
+    # Traffic replays against a stubbed instance (services/traffic_replay.py) time the whole
+    # reply rather than the acknowledgement, and need to see which replies were shed
+    replay_wait = settings.stub_providers and request.headers.get(WAIT_HEADER)
+
+    # Limited messages are still acknowledged so Textbelt doesn't retry them
+    decision = admission.admit(from_number)
+    if decision != ADMITTED:
+        logging.warning(f"Not processing reply from {from_number}: {decision}")
+        send_notice(from_number, RATE_LIMITED_NOTICE if decision == RATE_LIMITED else BUSY_NOTICE)
+        return '', (429 if decision == RATE_LIMITED else 503) if replay_wait else 200
+
+    try:
+        future = sms_executor.submit(from_number, process_sms_reply, from_number, text, settings)
+    except LaneFull as e:
+        admission.release()
+        logging.error(f"Dropping reply from {from_number}: {e}")
+        send_notice(from_number, BUSY_NOTICE)
+        return '', 503 if replay_wait else 200
+    future.add_done_callback(lambda _: admission.release())
+
+    if replay_wait:
+        try:
+            future.result()
+        except Exception:
+            return '', 500
+
+    return '', 200  # Respond OK so Textbelt knows you received it
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Load and admission counters, for dashboards and alerts"""
+    return jsonify({
+        'admission': admission.metrics(),
+        'sms_lane_depths': sms_executor.depths(),
+        'notion_writes_pending': notion_write_queue.pending_count(),
+        'nudges_pending': len(nudge_scheduler),
+        'llm_scheduler': llm_scheduler.stats(),
+        'sms_scheduler': sms_scheduler.stats(),
+        'notion_scheduler': notion_scheduler.stats(),
+        'calendar_scheduler': calendar_scheduler.stats(),
+        'handlers_loaded': ACTION_HANDLERS.loaded()
+    }), 200
+
+@prioritized(INTERACTIVE)
+def process_sms_reply(from_number: string, text: string, settings):
+    """Act on one reply; runs on the sender's lane, after their earlier messages"""
+    nudge_scheduler.cancel(from_number)
+    history = conversation_memory.context(from_number)
+    conversation_memory.record(from_number, "user", text)
     
     ai_model: AIModel = AIModel()
     
-    action_type: ActionType = ai_model.choose_action_type(text)
-    
+    enabled_actions = settings.enabled_actions
     try:
-        if action_type == ActionType.NOTION:
-            action_key = find_user_key(from_number, action_type)
-
-            notion_api = NotionAPI(action_key, database_id, ai_model)
-            notion_api.create_note_with_tags(text)
-            send_sms(from_number, "Logged to Notion")
-
-        elif action_type == ActionType.CALENDAR or action_type == ActionType.GOOGLE_CALENDAR:
-            # Get user's Google Calendar credentials
-            creds = get_google_calendar_credentials(from_number)
-
-            if not creds:
-                # User needs to authenticate first
-                send_sms(from_number, "Please authenticate your Google Calendar first. Visit: " +
-                        f"{PUBLIC_URL if IS_PUBLIC else LOCAL_URL}/api/auth/google/start")
-                return '', 200
-
-            # Parse the event details from the text using AI
-            event_details = ai_model.parse_calendar_event(text)
-
-            # Create credentials dictionary for GoogleCalendarAPI
-            creds_dict = {
-                'token': creds.token,
-                'refresh_token': creds.refresh_token,
-                'token_uri': creds.token_uri,
-                'client_id': creds.client_id,
-                'client_secret': creds.client_secret,
-                'scopes': creds.scopes
-            }
-
-            # Initialize Google Calendar API and create event
-            calendar_api = GoogleCalendarAPI(creds_dict)
-            result = calendar_api.create_event(
-                summary=event_details['summary'],
-                start_datetime=event_details['start_datetime'],
-                end_datetime=event_details['end_datetime'],
-                description=event_details.get('description', ''),
-                timezone='America/Los_Angeles'
-            )
-
-            if result['status'] == 'success':
-                send_sms(from_number, f"Event created: {result['summary']}\n{result['link']}")
-            else:
-                send_sms(from_number, f"Error creating event: {result['message']}")
-
-        else:
+        action_type: ActionType = ai_model.choose_action_type(text, ACTION_HANDLERS.options(enabled_actions))
+        handler = ACTION_HANDLERS.get(action_type, enabled_actions)
+        user = user_cache.get(from_number, fields=handler.user_fields) if handler else None
+        if handler is None or (user is None and handler.needs_user):
             send_sms(from_number, "Error: User not found in database or unsupported action")
+            return
+
+        handler.load()(ReplyContext(from_number, text, user, history, settings, ai_model, send_sms, handler_services))
     except Exception as e:
         logging.error(f"Error: {e}")
         send_sms(from_number, "Error: " + str(e))
 
-    return '', 200  # Respond OK so Textbelt knows you received it
+# Conversation starters generated off-peak, one pool per distinct interests/personality group
+message_pool = MessagePool(
+    startup_settings.message_pool_path,
+    lambda interests, personality: background_ai_model.first_message(interests, personality=personality),
+    generate_batch=lambda interests, personality: background_ai_model.first_messages(interests, personality)
+)
 
-@app.route('/api/text_test', methods=['GET'])
-def text_test():
-    textbot = Textbot(reply_webhook_url)
+@prioritized(BULK)
+def broadcast_first_messages(owns=None):
+    """
+    Text each user a conversation starter and start nudging them
+
+    Args:
+        owns: Optional filter on phone numbers; the periodic job passes the
+              shard coordinator's so each user is handled by one instance
+    """
+    textbot = Textbot(get_settings().base_url)
     ai_model = AIModel()
     
     # Fetch all users from the database
     users_ref = db.collection('users')
     docs = users_ref.stream()
     
+    default_personality = get_settings().personality
     for doc in docs:
-        user_data = doc.to_dict()
-        phone_number = user_data.get('PhoneNumber')
-        interests = user_data.get('UserInterests')
+        user = UserRecord.from_firestore(doc.id, doc.to_dict())
+        phone_number = user.phone_number
+        if not phone_number or (owns is not None and not owns(phone_number)):
+            continue
+        user_cache.put(user)
         print(f"PRINT phone_number - {phone_number}")
         if phone_number == "+19162206037":
             # textbot should send message to whatever the user wants
-            message = ai_model.first_message(interests)
+            personality = user.personality or default_personality
+            message = message_pool.pick(phone_number, user.interests, personality)
+            if message is None:
+                message = ai_model.first_message(user.interests_text, conversation_memory.context(phone_number), personality)
             logging.info(f"Sending message to {phone_number}: {message}")
             send_sms(phone_number, message)
-    
+            nudge_scheduler.schedule(phone_number, quiet_hours=(22, 8), timezone=user.timezone)
+
+# Every instance runs the broadcast for the users in its own shards (off unless configured)
+BROADCAST_INTERVAL_SECONDS = startup_settings.broadcast_interval_seconds
+broadcast_job = ShardedJob(shard_coordinator, BROADCAST_INTERVAL_SECONDS, broadcast_first_messages, name="broadcast")
+if BROADCAST_INTERVAL_SECONDS > 0:
+    broadcast_job.start()
+
+@app.route('/api/text_test', methods=['GET'])
+def text_test():
+    broadcast_first_messages()
     return '', 200  # Respond OK so Textbelt knows you received it
 
+@app.route('/api/jobs/precompute_messages', methods=['GET'])
+@prioritized(BULK)
+def precompute_messages():
+    """Off-peak job: refill the conversation starter pool for every interest group"""
+    default_personality = get_settings().personality
+    users = (
+        (user.interests, user.personality or default_personality)
+        for user in (UserRecord.from_firestore(doc.id, doc.to_dict()) for doc in db.collection('users').stream())
+    )
+    return jsonify(message_pool.precompute(users)), 200
+
+# Pending Google OAuth flows, keyed by the OAuth state. Kept in Firestore, so any instance can
+# finish a flow and flows survive a redeploy; the SQLite store is for single-host setups only
+oauth_state_store = FirestoreOAuthStateStore(db)
+
 #TODO: Add Registration API Call
 # Should be triggered when we receive a text from a user that is not registered
 # Should respond with probably a notion api sign in page thing/ A thing for people to sign into
@@ -233,10 +360,11 @@ def start_google_auth():
             return jsonify({'error': 'phone_number is required'}), 400
 
         # Create OAuth flow
-        flow = Flow.from_client_secrets_file(
-            'calendar_creds.json',
-            scopes=GOOGLE_CALENDAR_SCOPES,
-            redirect_uri=GOOGLE_OAUTH_REDIRECT_URI
+        settings = get_settings()
+        flow = Flow.from_client_config(
+            settings.google_client_config(),
+            scopes=list(settings.google_calendar_scopes),
+            redirect_uri=settings.google_oauth_redirect_uri
         )
 
         # Generate authorization URL
@@ -246,9 +374,9 @@ def start_google_auth():
             prompt='consent'  # Force consent screen to get refresh token
         )
 
-        # Store state and phone number in session for callback
-        session['state'] = state
-        session['phone_number'] = phone_number
+        # The link is opened from a text message, usually in a browser with no session
+        # cookie, so the callback looks the flow up by its state instead
+        oauth_state_store.put(state, {'phone_number': phone_number, 'code_verifier': flow.code_verifier})
 
         # Send SMS with authorization link
         message = f"Please authorize Google Calendar access by clicking this link: {authorization_url}"
@@ -271,20 +399,24 @@ def google_auth_callback():
     """
     Handles the OAuth callback from Google
     """
+    phone_number = None
     try:
-        # Get state from session
-        state = session.get('state')
-        phone_number = session.get('phone_number')
+        # Each state can be redeemed once, before it expires
+        state = request.args.get('state')
+        pending = oauth_state_store.pop(state) if state else None
 
-        if not state or not phone_number:
-            return "Error: Session expired or invalid. Please start the authentication process again.", 400
+        if not pending:
+            return "Error: Link expired or already used. Please start the authentication process again.", 400
+        phone_number = pending['phone_number']
 
         # Create flow with the same state
-        flow = Flow.from_client_secrets_file(
-            'calendar_creds.json',
-            scopes=GOOGLE_CALENDAR_SCOPES,
+        settings = get_settings()
+        flow = Flow.from_client_config(
+            settings.google_client_config(),
+            scopes=list(settings.google_calendar_scopes),
             state=state,
-            redirect_uri=GOOGLE_OAUTH_REDIRECT_URI
+            redirect_uri=settings.google_oauth_redirect_uri,
+            code_verifier=pending.get('code_verifier')
         )
 
         # Exchange authorization code for credentials
@@ -303,6 +435,7 @@ def google_auth_callback():
         }
 
         # Store credentials in Firestore
+        user_cache.invalidate(phone_number)
         users_ref = db.collection('users')
         docs = users_ref.where('PhoneNumber', '==', phone_number).stream()
 
@@ -327,10 +460,6 @@ def google_auth_callback():
         # Send confirmation SMS
         send_sms(phone_number, "Google Calendar has been successfully connected to your account!")
 
-        # Clear session
-        session.pop('state', None)
-        session.pop('phone_number', None)
-
         return """
         <html>
             <body>
@@ -343,7 +472,6 @@ def google_auth_callback():
 
     except Exception as e:
         logging.error(f"Error in Google auth callback: {e}")
-        phone_number = session.get('phone_number')
         if phone_number:
             send_sms(phone_number, f"Error connecting Google Calendar: {str(e)}")
         return f"Error: {str(e)}", 500
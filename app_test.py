@@ -21,17 +21,14 @@ class TestAppHelperFunctions(unittest.TestCase):
         """Set up test fixtures before each test method"""
         self.test_phone_number = "+19162206037"
 
-    def find_user_key_test(self):
-        from app import find_user_key
-        result = find_user_key(self.test_phone_number, ActionType.NOTION)
-        print(f"PRINT result - {result}")
-    
-    def process_habitify_action_test(self):
-        from app import process_habitify_action
-        result = process_habitify_action(self.test_text, self.test_action_key, self.test_ai_model)
+    def user_key_test(self):
+        from app import user_cache
+        user = user_cache.get(self.test_phone_number, fields=("notion_api_key",))
+        result = user.key_for(ActionType.NOTION) if user else None
         print(f"PRINT result - {result}")
 
+
 if __name__ == '__main__':
     # Run tests with verbosity
     test_app_helper_functions = TestAppHelperFunctions()
-    test_app_helper_functions.find_user_key_test()
+    test_app_helper_functions.user_key_test()
@@ -4,4 +4,5 @@ class ActionType(Enum):
     NOTION = "NotionAPI"
     CALENDAR = "Calendar"
     GOOGLE_CALENDAR = "GoogleCalendarCreds"
+    NOTION_QUERY = "NotionQuery"
     ERROR = "Error"
\ No newline at end of file
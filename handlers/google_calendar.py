@@ -0,0 +1,152 @@
+import datetime
+import logging
+from zoneinfo import ZoneInfo
+
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+
+from api_interaction.google_cal_api import GoogleCalendarAPI
+from api_interaction.calendar_sync import CalendarEventStore, CalendarSync
+from services.calendar_index import CalendarIndexCache
+from settings import get_settings
+
+
+# What Does this module do?
+# Action handler for Google Calendar: turns a reply into events on the user's calendar
+#   - Stored OAuth credentials are refreshed when expired and written back
+#   - New events are checked for clashes against a local copy of the calendar, which is
+#     kept current with incremental sync after each write. Created events go straight into
+#     the interval index; it is only rebuilt when the sync brings in other changes
+#   - The local copy is only opened once this handler is first used
+
+# Local copy of connected users' calendars, kept current with incremental sync
+calendar_event_store = CalendarEventStore(get_settings().calendar_store_path)
+calendar_sync = CalendarSync(calendar_event_store)
+calendar_index = CalendarIndexCache(calendar_event_store)
+
+
+def event_span(event, timezone):
+    """(start, end) epoch seconds of a parsed event; naive times are in the user's timezone"""
+    tz = ZoneInfo(timezone)
+    start = event['start_datetime']
+    end = event['end_datetime']
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=tz)
+        end = end.replace(tzinfo=tz)
+    return start.timestamp(), end.timestamp()
+
+
+def conflict_warning(phone_number, event, timezone):
+    """
+    Warn about an overlap with the user's synced events and suggest a free slot
+    Returns None when the event does not clash with anything
+    """
+    tz = ZoneInfo(timezone)
+    start_ts, end_ts = event_span(event, timezone)
+
+    index = calendar_index.get(phone_number)
+    if not index.overlapping(start_ts, end_ts):
+        return None
+
+    slot = index.first_free_slot(end_ts - start_ts, start_ts, start_ts + 12 * 3600)
+    if slot is None:
+        return f"Heads up: you're already busy during {event['summary']}."
+    free_at = datetime.datetime.fromtimestamp(slot, tz).strftime('%I:%M %p').lstrip('0')
+    return f"Heads up: you're already busy during {event['summary']}. {free_at} is free."
+
+
+def get_google_calendar_credentials(ctx):
+    """
+    Retrieves and refreshes Google Calendar credentials for a user
+    Returns a valid Credentials object or None if not found
+    """
+    creds_data = ctx.user.google_calendar_creds if ctx.user else None
+    if not creds_data:
+        logging.warning(f"No Google Calendar credentials found for {ctx.phone_number}")
+        return None
+
+    # Reconstruct Credentials object from stored data
+    creds = Credentials(
+        token=creds_data.get('token'),
+        refresh_token=creds_data.get('refresh_token'),
+        token_uri=creds_data.get('token_uri'),
+        client_id=creds_data.get('client_id'),
+        client_secret=creds_data.get('client_secret'),
+        scopes=creds_data.get('scopes')
+    )
+
+    # Check if token is expired and refresh if needed
+    if creds.expired and creds.refresh_token:
+        try:
+            logging.info(f"Refreshing expired token for {ctx.phone_number}")
+            creds.refresh(Request())
+
+            # Update stored credentials with new token
+            updated_creds_data = {
+                'token': creds.token,
+                'refresh_token': creds.refresh_token,
+                'token_uri': creds.token_uri,
+                'client_id': creds.client_id,
+                'client_secret': creds.client_secret,
+                'scopes': creds.scopes
+            }
+            ctx.services.db.collection('users').document(ctx.user.doc_id).update({'GoogleCalendarCreds': updated_creds_data})
+            ctx.services.user_cache.update(ctx.phone_number, google_calendar_creds=updated_creds_data)
+            logging.info(f"Token refreshed and updated for {ctx.phone_number}")
+
+        except Exception as e:
+            logging.error(f"Error refreshing token for {ctx.phone_number}: {e}")
+            return None
+
+    return creds
+
+
+def create_events(ctx):
+    """Create the events described in the reply and report how it went"""
+    creds = get_google_calendar_credentials(ctx)
+
+    if not creds:
+        # User needs to authenticate first
+        ctx.send_sms(ctx.phone_number, "Please authenticate your Google Calendar first. Visit: " +
+                     f"{ctx.settings.base_url}/api/auth/google/start")
+        return
+
+    # Parse the event details from the text using AI
+    events = ctx.ai_model.parse_calendar_events(ctx.text)
+
+    # Create credentials dictionary for GoogleCalendarAPI
+    creds_dict = {
+        'token': creds.token,
+        'refresh_token': creds.refresh_token,
+        'token_uri': creds.token_uri,
+        'client_id': creds.client_id,
+        'client_secret': creds.client_secret,
+        'scopes': creds.scopes
+    }
+    timezone = ctx.user.timezone
+
+    # Check for clashes against the local copy before anything is written
+    warnings = [conflict_warning(ctx.phone_number, event, timezone) for event in events]
+
+    # Initialize Google Calendar API and create all events in one batch
+    calendar_api = GoogleCalendarAPI(creds_dict)
+    results = calendar_api.create_events(events, timezone=timezone)
+
+    lines = [warning for warning in warnings if warning]
+    indexed_ids = set()
+    for event, result in zip(events, results):
+        if result['status'] == 'success':
+            lines.append(f"Event created: {result['summary']}\n{result['link']}")
+            # A repeating event has more than one interval; the sync below brings in its instances
+            if not event.get('recurrence'):
+                calendar_index.add(ctx.phone_number, *event_span(event, timezone), result['event_id'])
+                indexed_ids.add(result['event_id'])
+        else:
+            lines.append(f"Error creating event {event['summary']}: {result['message']}")
+    ctx.send_sms(ctx.phone_number, "\n".join(lines))
+
+    # Pick up the new events (and any edits made elsewhere) in the local copy; the index
+    # only needs rebuilding if something other than the events added above changed
+    sync_result = calendar_sync.sync(ctx.phone_number, calendar_api, timezone=timezone)
+    if set(sync_result.get('event_ids', ())) - indexed_ids:
+        calendar_index.invalidate(ctx.phone_number)
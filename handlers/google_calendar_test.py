@@ -0,0 +1,64 @@
+import datetime
+import types
+import unittest
+from unittest.mock import Mock, patch
+from handlers import google_calendar
+from handlers.registry import ReplyContext
+from services.calendar_index import CalendarIndexCache
+from settings import Settings
+
+
+class TestCreateEvents(unittest.TestCase):
+
+    def setUp(self):
+        store = Mock()
+        store.events_between.return_value = []
+        self.calendar_index = CalendarIndexCache(store)
+        self.calendar_sync = Mock()
+        self.calendar_api = Mock()
+        self.calendar_api.create_events.return_value = [
+            {'status': 'success', 'event_id': 'dentist', 'link': '', 'summary': 'Dentist'}
+        ]
+        self.ai_model = Mock()
+        self.ai_model.parse_calendar_events.return_value = [{
+            'summary': 'Dentist',
+            'start_datetime': datetime.datetime(2025, 11, 24, 9),
+            'end_datetime': datetime.datetime(2025, 11, 24, 10),
+        }]
+        user = types.SimpleNamespace(timezone='America/Los_Angeles')
+        self.ctx = ReplyContext('+1555', 'dentist monday 9am', user, [], Settings(), self.ai_model, Mock(), None)
+        self.patches = [
+            patch.object(google_calendar, 'calendar_index', self.calendar_index),
+            patch.object(google_calendar, 'calendar_sync', self.calendar_sync),
+            patch.object(google_calendar, 'GoogleCalendarAPI', Mock(return_value=self.calendar_api)),
+            patch.object(google_calendar, 'get_google_calendar_credentials', Mock()),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_created_events_are_added_to_the_index(self):
+        """The new event is busy time right away, and a sync of only that event keeps the index"""
+        self.calendar_sync.sync.return_value = {'status': 'success', 'changed': 1, 'event_ids': ['dentist']}
+        index = self.calendar_index.get('+1555')
+
+        google_calendar.create_events(self.ctx)
+
+        self.assertIs(self.calendar_index.get('+1555'), index)
+        start, end = google_calendar.event_span(self.ai_model.parse_calendar_events.return_value[0], 'America/Los_Angeles')
+        self.assertFalse(index.is_free(start, end))
+
+    def test_other_changes_rebuild_the_index(self):
+        self.calendar_sync.sync.return_value = {'status': 'success', 'changed': 2, 'event_ids': ['dentist', 'gym']}
+        index = self.calendar_index.get('+1555')
+
+        google_calendar.create_events(self.ctx)
+
+        self.assertIsNot(self.calendar_index.get('+1555'), index)
+
+
+if __name__ == '__main__':
+    unittest.main()
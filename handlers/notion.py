@@ -0,0 +1,40 @@
+import datetime
+from zoneinfo import ZoneInfo
+
+
+# What Does this module do?
+# Action handlers for Notion: logging a reply as a note and answering questions from notes
+#   - Writes go through the durable write queue, so the user is answered right away
+#   - Questions are answered from the local full-text and embedding indexes; pages edited
+#     directly in Notion are caught up on in the background (services/note_index.py NoteSyncer)
+
+
+def log_note(ctx):
+    """Queue the reply as a Notion note (or daily-log entry) and confirm it"""
+    notion_api_key = ctx.user.notion_api_key
+    database_id = ctx.settings.notion_database_id
+    if ctx.settings.notion_daily_log_mode:
+        # The user's day, not the server's (UTC): an evening entry belongs on that evening's page
+        today = datetime.datetime.now(ZoneInfo(ctx.user.timezone)).date().isoformat()
+        ctx.services.notion_write_queue.enqueue(ctx.phone_number, notion_api_key, database_id, "append_daily_log",
+                                                {"content": ctx.text, "date": today})
+    else:
+        ctx.services.notion_write_queue.enqueue(ctx.phone_number, notion_api_key, database_id, "create_note",
+                                                {"content": ctx.text})
+    ctx.send_sms(ctx.phone_number, "Logged to Notion")
+
+
+def answer_question(ctx):
+    """Answer a question about the user's notes"""
+    note_index = ctx.services.note_index
+
+    # Edits made directly in Notion are picked up in the background, for the next question
+    ctx.services.note_syncer.request(ctx.phone_number, ctx.user.notion_api_key, ctx.settings.notion_database_id)
+    notes = note_index.search(ctx.phone_number, ctx.text, k=5)
+
+    # Blend in semantically similar notes that share no keywords with the question
+    keyword_ids = {note["page_id"] for note in notes}
+    similar_ids = [page_id for page_id, _ in ctx.services.embedding_index.search(ctx.phone_number, ctx.text, k=5)
+                   if page_id not in keyword_ids]
+    notes = (notes + note_index.get_notes(similar_ids))[:8]
+    ctx.send_sms(ctx.phone_number, ctx.ai_model.answer_from_notes(ctx.text, notes, ctx.history))
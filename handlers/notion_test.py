@@ -0,0 +1,60 @@
+import datetime
+import types
+import unittest
+from unittest.mock import Mock, patch
+from handlers.notion import log_note, answer_question
+from handlers.registry import ACTION_HANDLERS, ReplyContext
+from constants.action_types import ActionType
+from settings import Settings
+
+
+class TestLogNote(unittest.TestCase):
+
+    def context(self, timezone):
+        user = types.SimpleNamespace(notion_api_key="key", timezone=timezone)
+        services = types.SimpleNamespace(notion_write_queue=Mock())
+        return ReplyContext("+1555", "ran 5k", user, [], Settings(notion_daily_log_mode=True), None, Mock(), services)
+
+    def logged_date(self, timezone, now):
+        ctx = self.context(timezone)
+        with patch("handlers.notion.datetime") as mock_datetime:
+            mock_datetime.datetime.now.side_effect = lambda tz: now.astimezone(tz)
+            log_note(ctx)
+        return ctx.services.notion_write_queue.enqueue.call_args.args[4]["date"]
+
+    def test_daily_log_uses_the_users_date(self):
+        """An evening entry in California is logged on that day, not the next UTC day"""
+        now = datetime.datetime(2025, 11, 25, 3, 30, tzinfo=datetime.timezone.utc)
+        self.assertEqual(self.logged_date("America/Los_Angeles", now), "2025-11-24")
+        self.assertEqual(self.logged_date("Europe/Berlin", now), "2025-11-25")
+
+    def test_timezone_is_loaded_for_the_handler(self):
+        self.assertIn("timezone", ACTION_HANDLERS.get(ActionType.NOTION).user_fields)
+
+
+
+class TestAnswerQuestion(unittest.TestCase):
+
+    def test_answers_from_the_index_and_syncs_in_the_background(self):
+        """The question is answered from local indexes; Notion is only reached through the syncer"""
+        user = types.SimpleNamespace(notion_api_key="key", timezone="America/Los_Angeles")
+        services = types.SimpleNamespace(note_index=Mock(), note_syncer=Mock(), embedding_index=Mock())
+        services.note_index.search.return_value = [{"page_id": "p1"}]
+        services.note_index.get_notes.return_value = []
+        services.embedding_index.search.return_value = []
+        ai_model = Mock()
+        ai_model.answer_from_notes.return_value = "You ran on Monday"
+        send_sms = Mock()
+        ctx = ReplyContext("+1555", "when did I run?", user, [], Settings(), ai_model, send_sms, services)
+
+        with patch("api_interaction.notion_api.NotionAPI") as notion_api:
+            answer_question(ctx)
+
+        notion_api.assert_not_called()
+        services.note_index.sync_from_notion.assert_not_called()
+        services.note_syncer.request.assert_called_once_with("+1555", "key", Settings().notion_database_id)
+        send_sms.assert_called_once_with("+1555", "You ran on Monday")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import dataclasses
+import functools
+import importlib
+import sys
+
+from constants.action_types import ActionType
+
+
+# What Does this module do?
+# Maps each ActionType to the handler that acts on a reply, without importing it up front
+#   - A handler is named as "module:function" and imported the first time it is used, so a
+#     worker only loads the integrations (Notion, Google Calendar, ...) its users touch
+#   - Handlers declare the UserRecord fields they need; only those are read for the sender
+#   - ENABLED_ACTIONS limits a deployment to some handlers; the rest are neither offered
+#     to the classifier nor dispatched to
+#   - A handler is called with a ReplyContext and sends its own replies
+#   - Senders with no user record only reach handlers that can onboard them (needs_user=False)
+
+
+@dataclasses.dataclass(frozen=True)
+class ReplyContext:
+    """Everything a handler gets for one reply"""
+    phone_number: str
+    text: str
+    user: object  # UserRecord with at least the handler's user_fields read; None if needs_user is False and there is none
+    history: list
+    settings: object
+    ai_model: object
+    send_sms: object  # (phone_number, message) -> None
+    services: object  # Shared app services: db, user_cache, notion_write_queue, note_index, note_syncer, embedding_index
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve(target: str):
+    module_name, _, function_name = target.partition(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+@dataclasses.dataclass(frozen=True)
+class ActionHandler:
+    target: str
+    user_fields: tuple = ()
+    # Shown to the classifier; handlers without one are aliases that are never offered
+    description: str = None
+    # When False the handler also runs for senders with no user record (ctx.user is None)
+    needs_user: bool = True
+
+    def load(self):
+        """The handler function, imported on first use"""
+        return _resolve(self.target)
+
+
+class HandlerRegistry:
+    def __init__(self, handlers: dict = None):
+        """
+        Args:
+            handlers: ActionType -> ActionHandler
+        """
+        self.handlers = dict(handlers or {})
+
+    def register(self, action_type: ActionType, handler: ActionHandler):
+        self.handlers[action_type] = handler
+
+    def enabled(self, enabled_actions: tuple = None) -> dict:
+        """Handlers this deployment serves; enabled_actions holds ActionType names, None means all"""
+        return {action_type: handler for action_type, handler in self.handlers.items()
+                if enabled_actions is None or action_type.name in enabled_actions}
+
+    def get(self, action_type: ActionType, enabled_actions: tuple = None):
+        """The handler for action_type, or None if there is none or it is disabled"""
+        return self.enabled(enabled_actions).get(action_type)
+
+    def options(self, enabled_actions: tuple = None) -> dict:
+        """ActionType -> description, for AIModel.choose_action_type"""
+        return {action_type: handler.description for action_type, handler in self.enabled(enabled_actions).items()
+                if handler.description}
+
+    def loaded(self) -> list:
+        """Handler targets imported so far"""
+        return sorted({handler.target for handler in self.handlers.values()
+                       if handler.target.partition(":")[0] in sys.modules})
+
+
+CALENDAR_HANDLER = ActionHandler(
+    "handlers.google_calendar:create_events",
+    user_fields=("google_calendar_creds", "timezone"),
+    description="Put one or more events, meetings or reminders on their calendar",
+    # Unregistered senders get the Google sign-in link
+    needs_user=False
+)
+
+ACTION_HANDLERS = HandlerRegistry({
+    ActionType.NOTION: ActionHandler(
+        "handlers.notion:log_note",
+        user_fields=("notion_api_key", "timezone"),
+        description="Save a note, journal entry, idea or log of something they did"
+    ),
+    ActionType.NOTION_QUERY: ActionHandler(
+        "handlers.notion:answer_question",
+        user_fields=("notion_api_key",),
+        description="A question about their own notes or things they logged before"
+    ),
+    ActionType.CALENDAR: CALENDAR_HANDLER,
+    ActionType.GOOGLE_CALENDAR: dataclasses.replace(CALENDAR_HANDLER, description=None),
+})
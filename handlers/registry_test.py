@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+from constants.action_types import ActionType
+from handlers.registry import ACTION_HANDLERS, ActionHandler, HandlerRegistry
+
+
+class TestHandlerRegistry(unittest.TestCase):
+    """Test suite for HandlerRegistry"""
+
+    def setUp(self):
+        self.registry = HandlerRegistry({
+            ActionType.NOTION: ActionHandler("json:dumps", ("notion_api_key",), "Save a note"),
+            ActionType.CALENDAR: ActionHandler("json:loads", ("google_calendar_creds",), "Add an event"),
+            ActionType.GOOGLE_CALENDAR: ActionHandler("json:loads", ("google_calendar_creds",)),
+        })
+
+    def test_enabled_actions_limit_dispatch_and_options(self):
+        self.assertEqual(set(self.registry.options()), {ActionType.NOTION, ActionType.CALENDAR})
+        self.assertEqual(set(self.registry.options(("NOTION",))), {ActionType.NOTION})
+        self.assertIsNone(self.registry.get(ActionType.CALENDAR, ("NOTION",)))
+        self.assertIsNone(self.registry.get(ActionType.ERROR))
+        # Aliases dispatch but are not offered
+        self.assertEqual(self.registry.get(ActionType.GOOGLE_CALENDAR).user_fields, ("google_calendar_creds",))
+
+    def test_handlers_resolve_by_name(self):
+        import json
+        self.assertIs(self.registry.get(ActionType.NOTION).load(), json.dumps)
+
+    def test_only_calendar_runs_without_a_user(self):
+        """Unregistered senders asking for the calendar are sent the Google sign-in link"""
+        self.assertFalse(ACTION_HANDLERS.get(ActionType.CALENDAR).needs_user)
+        self.assertFalse(ACTION_HANDLERS.get(ActionType.GOOGLE_CALENDAR).needs_user)
+        self.assertTrue(ACTION_HANDLERS.get(ActionType.NOTION).needs_user)
+
+    def test_handlers_are_not_imported_until_used(self):
+        # Fresh interpreter, so other tests' imports don't count
+        check = ("import sys; from handlers.registry import ACTION_HANDLERS; "
+                 "print(ACTION_HANDLERS.loaded(), 'googleapiclient' in sys.modules)")
+        output = subprocess.run([sys.executable, "-c", check], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+        self.assertEqual(output.strip(), "[] False")
+
+    def test_importing_app_does_not_load_handlers(self):
+        """Starting the app leaves every integration to be imported on first use"""
+        check = textwrap.dedent("""
+            import sys
+            from unittest.mock import MagicMock, patch
+            import firebase_admin
+            from firebase_admin import credentials, firestore
+            with patch.object(firebase_admin, "initialize_app"), patch.object(credentials, "Certificate"), \\
+                    patch.object(firestore, "client", MagicMock()):
+                import app
+            print(app.ACTION_HANDLERS.loaded(), 'googleapiclient' in sys.modules)
+        """)
+        with tempfile.TemporaryDirectory() as tmp:
+            environ = {**os.environ, "FIREBASE_SERVICE_ACCOUNT": "{}", "OPENAI_API_KEY": "test-key",
+                       "PYTHONPATH": os.path.dirname(os.path.dirname(os.path.abspath(__file__)))}
+            result = subprocess.run([sys.executable, "-c", check], cwd=tmp, env=environ,
+                                    capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip().splitlines()[-1], "[] False")
+
+if __name__ == '__main__':
+    unittest.main()
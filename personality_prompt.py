@@ -19,4 +19,8 @@ class PersonalityPrompt:
         elif personality == "normal_person":
             return self.normal_person_prompt
         else:
-            return random.choice([self.rude_coach_prompt, self.uncle_iroh_prompt, self.schmidt_prompt, self.normal_person_prompt])
\ No newline at end of file
+            return random.choice([self.rude_coach_prompt, self.uncle_iroh_prompt, self.schmidt_prompt, self.normal_person_prompt])
+
+
+# Prompts never change at runtime; share one instance
+personality_prompts = PersonalityPrompt()
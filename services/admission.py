@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+
+from services.token_bucket import TokenBucket
+
+
+# What Does this module do?
+# Decides whether an inbound SMS gets processed, before any paid LLM or provider call
+#   - Each sender has a token bucket, so a looping auto-responder or spammer is cut off
+#     without affecting anyone else
+#   - A global cap on messages in progress (queued or running) sheds load once the
+#     backlog is deeper than the service can work off in reasonable time
+#   - Notices about being limited are themselves throttled per sender, so we never
+#     get into a reply loop with an auto-responder
+#   - Every decision is counted for the metrics endpoint
+
+ADMITTED = "admitted"
+RATE_LIMITED = "rate_limited"
+SHED = "shed"
+
+
+class AdmissionController:
+    def __init__(self, sender_rate: float = 10 / 60, sender_burst: float = 5, max_in_flight: int = 200,
+                 max_senders: int = 10000, notice_interval: float = 3600, clock=time.monotonic):
+        """
+        Args:
+            sender_rate: Messages per second a sender is allowed on average
+            sender_burst: Messages a sender may send back to back
+            max_in_flight: Messages admitted but not yet finished, across all senders
+            max_senders: Sender buckets kept; the least recently seen are dropped
+            notice_interval: Seconds between "slow down"/"busy" notices to one sender
+            clock: Monotonic time source, injectable for tests
+        """
+        self.sender_rate = sender_rate
+        self.sender_burst = sender_burst
+        self.max_in_flight = max_in_flight
+        self.max_senders = max_senders
+        self.notice_interval = notice_interval
+        self.clock = clock
+
+        self.buckets = OrderedDict()
+        self.last_notice = OrderedDict()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.counts = {ADMITTED: 0, RATE_LIMITED: 0, SHED: 0}
+        self.lock = threading.Lock()
+
+    def _bucket(self, sender: str) -> TokenBucket:
+        bucket = self.buckets.get(sender)
+        if bucket is None:
+            bucket = self.buckets[sender] = TokenBucket(self.sender_rate, self.sender_burst, clock=self.clock)
+            if len(self.buckets) > self.max_senders:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(sender)
+        return bucket
+
+    def admit(self, sender: str) -> str:
+        """
+        ADMITTED, RATE_LIMITED or SHED. Every ADMITTED must be followed by release()
+        """
+        with self.lock:
+            if self._bucket(sender).try_acquire() > 0:
+                decision = RATE_LIMITED
+            elif self.in_flight >= self.max_in_flight:
+                decision = SHED
+            else:
+                decision = ADMITTED
+                self.in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.counts[decision] += 1
+            return decision
+
+    def release(self):
+        """A previously admitted message has finished (or could not be queued)"""
+        with self.lock:
+            self.in_flight -= 1
+
+    def should_notify(self, sender: str) -> bool:
+        """Whether a limited sender may be told so now; at most once per notice_interval"""
+        with self.lock:
+            now = self.clock()
+            last = self.last_notice.get(sender)
+            if last is not None and now - last < self.notice_interval:
+                return False
+            self.last_notice[sender] = now
+            self.last_notice.move_to_end(sender)
+            if len(self.last_notice) > self.max_senders:
+                self.last_notice.popitem(last=False)
+            return True
+
+    def metrics(self) -> dict:
+        with self.lock:
+            return {
+                **self.counts,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "max_in_flight": self.max_in_flight,
+                "tracked_senders": len(self.buckets),
+            }
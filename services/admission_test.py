@@ -0,0 +1,53 @@
+import unittest
+from services.admission import AdmissionController, ADMITTED, RATE_LIMITED, SHED
+from testing.fake_clock import FakeClock
+
+
+class TestAdmissionController(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock(1000.0)
+        self.admission = AdmissionController(sender_rate=1 / 60, sender_burst=3, max_in_flight=5,
+                                             max_senders=100, notice_interval=3600, clock=self.clock)
+
+    def test_sender_is_limited_after_burst(self):
+        decisions = [self.admission.admit("+1") for _ in range(4)]
+        self.assertEqual(decisions, [ADMITTED, ADMITTED, ADMITTED, RATE_LIMITED])
+        # Another sender is unaffected
+        self.assertEqual(self.admission.admit("+2"), ADMITTED)
+
+        self.clock.now += 60
+        self.assertEqual(self.admission.admit("+1"), ADMITTED)
+
+    def test_sheds_when_too_much_in_flight(self):
+        for i in range(5):
+            self.assertEqual(self.admission.admit(f"+{i}"), ADMITTED)
+        self.assertEqual(self.admission.admit("+9"), SHED)
+
+        self.admission.release()
+        self.assertEqual(self.admission.admit("+9"), ADMITTED)
+
+        metrics = self.admission.metrics()
+        self.assertEqual(metrics[ADMITTED], 6)
+        self.assertEqual(metrics[SHED], 1)
+        self.assertEqual(metrics["in_flight"], 5)
+        self.assertEqual(metrics["peak_in_flight"], 5)
+
+    def test_notices_are_throttled(self):
+        self.assertTrue(self.admission.should_notify("+1"))
+        self.assertFalse(self.admission.should_notify("+1"))
+        self.assertTrue(self.admission.should_notify("+2"))
+
+        self.clock.now += 3600
+        self.assertTrue(self.admission.should_notify("+1"))
+
+    def test_sender_buckets_are_bounded(self):
+        admission = AdmissionController(max_senders=2, clock=self.clock)
+        for sender in ("+1", "+2", "+3"):
+            admission.admit(sender)
+            admission.release()
+        self.assertEqual(admission.metrics()["tracked_senders"], 2)
+        self.assertNotIn("+1", admission.buckets)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,259 @@
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from google.api_core import exceptions as google_exceptions
+
+from user import parse_interests
+
+
+# What Does this module do?
+# Bulk import/export of user documents as JSONL
+#   - Records are validated before anything is written; bad lines are reported, not written
+#   - Writes go through Firestore WriteBatch (up to 500 writes per commit), a few commits in parallel
+#   - Transient errors are retried with backoff; a checkpoint file lets an interrupted import resume
+#   - Existing users are matched by PhoneNumber and merged into, so re-running an import is safe
+#
+# Usage:
+#   python -m services.bulk_users import users.jsonl --checkpoint users.checkpoint
+#   python -m services.bulk_users export users.jsonl
+# Exports contain API keys and OAuth tokens; treat the file as a secret
+
+USER_FIELDS = {
+    "PhoneNumber": (str,),
+    "NotionAPI": (str,),
+    "UserInterests": (str, list),
+    "GoogleCalendarCreds": (dict,),
+    "Timezone": (str,),
+    "Personality": (str,),
+}
+PHONE_NUMBER_PATTERN = re.compile(r"^\+[1-9]\d{6,14}$")
+MAX_BATCH_WRITES = 500
+
+RETRYABLE_ERRORS = (
+    google_exceptions.Aborted,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+)
+
+
+def validate_user(record) -> dict:
+    """
+    Check one JSONL record and return the document data to write
+
+    An optional "id" picks the document ID; every other key must be a known user field.
+    UserInterests is written as a list of strings (see user.parse_interests), whichever
+    form the record uses. Raises ValueError describing the first problem found.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("record must be a JSON object")
+    data = {key: value for key, value in record.items() if key != "id"}
+    unknown = sorted(set(data) - set(USER_FIELDS))
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    for field, value in data.items():
+        if not isinstance(value, USER_FIELDS[field]):
+            raise ValueError(f"{field} has the wrong type")
+    if "UserInterests" in data:
+        if isinstance(data["UserInterests"], list) and not all(isinstance(item, str) for item in data["UserInterests"]):
+            raise ValueError("UserInterests must be strings")
+        data["UserInterests"] = list(parse_interests(data["UserInterests"]))
+    if not PHONE_NUMBER_PATTERN.match(data.get("PhoneNumber", "")):
+        raise ValueError("PhoneNumber must be in E.164 format, e.g. +15551234567")
+    if "id" in record and (not isinstance(record["id"], str) or not record["id"] or "/" in record["id"]):
+        raise ValueError("id must be a non-empty string without '/'")
+    return data
+
+
+class BulkUserImporter:
+    def __init__(self, db, collection: str = "users", batch_size: int = 400, max_workers: int = 4,
+                 max_attempts: int = 5, base_backoff: float = 1.0):
+        """
+        Args:
+            db: firestore.client()
+            collection: Users collection
+            batch_size: Writes per WriteBatch commit (Firestore allows up to 500)
+            max_workers: Commits in flight at once
+            max_attempts: Tries per batch before the import stops
+            base_backoff: First retry delay in seconds, doubled on each retry
+        """
+        self.db = db
+        self.collection = db.collection(collection)
+        self.batch_size = min(batch_size, MAX_BATCH_WRITES)
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+
+    def existing_ids(self) -> dict:
+        """PhoneNumber -> document ID for every current user, in one streamed query"""
+        ids = {}
+        for doc in self.collection.select(["PhoneNumber"]).stream():
+            phone_number = (doc.to_dict() or {}).get("PhoneNumber")
+            if phone_number:
+                ids.setdefault(phone_number, doc.id)
+        return ids
+
+    def _commit(self, writes: list):
+        for attempt in range(1, self.max_attempts + 1):
+            batch = self.db.batch()
+            for doc_id, data in writes:
+                batch.set(self.collection.document(doc_id), data, merge=True)
+            try:
+                batch.commit()
+                return
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_attempts:
+                    raise
+                delay = self.base_backoff * 2 ** (attempt - 1)
+                logging.warning(f"Batch of {len(writes)} users failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def import_file(self, path: str, checkpoint_path: str = None) -> dict:
+        """
+        Write every valid record of a JSONL file
+
+        With a checkpoint file, progress is saved after each committed batch
+        (as the last line up to which everything is written) and a re-run skips
+        those lines.
+
+        Returns:
+            dict: Counts of lines read, users written, lines skipped and a list of (line, error)
+        """
+        resume_after = 0
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                resume_after = json.load(f)["line"]
+            logging.info(f"Resuming {path} after line {resume_after}")
+
+        ids = self.existing_ids()
+        stats = {"read": 0, "written": 0, "skipped": resume_after, "invalid": []}
+
+        # Batches finish out of order; the checkpoint only advances past lines whose batches all finished
+        lock = threading.Lock()
+        in_flight = []
+        watermark = [resume_after]
+        slots = threading.BoundedSemaphore(self.max_workers * 2)
+
+        def finished(future, first_line, last_line, count):
+            slots.release()
+            with lock:
+                if future.exception() is None:
+                    stats["written"] += count
+                    in_flight.remove((first_line, last_line))
+                    done_through = in_flight[0][0] - 1 if in_flight else max(watermark[0], last_line)
+                    if checkpoint_path and done_through > watermark[0]:
+                        with open(checkpoint_path, "w") as f:
+                            json.dump({"input": path, "line": done_through}, f)
+                    watermark[0] = max(watermark[0], done_through)
+
+        def submit(executor, writes, first_line, last_line, futures):
+            slots.acquire()
+            with lock:
+                in_flight.append((first_line, last_line))
+            future = executor.submit(self._commit, writes)
+            future.add_done_callback(lambda f: finished(f, first_line, last_line, len(writes)))
+            futures.append(future)
+
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bulk-users") as executor, open(path) as f:
+            writes, first_line = [], None
+            line_number = 0
+            for line_number, line in enumerate(f, start=1):
+                if line_number <= resume_after or not line.strip():
+                    continue
+                stats["read"] += 1
+                try:
+                    record = json.loads(line)
+                    data = validate_user(record)
+                except ValueError as e:
+                    stats["invalid"].append((line_number, str(e)))
+                    continue
+
+                doc_id = record.get("id") or ids.get(data["PhoneNumber"]) or self.collection.document().id
+                ids.setdefault(data["PhoneNumber"], doc_id)
+                writes.append((doc_id, data))
+                first_line = first_line or line_number
+                if len(writes) >= self.batch_size:
+                    submit(executor, writes, first_line, line_number, futures)
+                    writes, first_line = [], None
+            if writes:
+                submit(executor, writes, first_line, line_number, futures)
+
+        # Surface the first failed batch; the checkpoint stops before it
+        for future in futures:
+            future.result()
+        if checkpoint_path and watermark[0] < line_number:
+            with open(checkpoint_path, "w") as f:
+                json.dump({"input": path, "line": line_number}, f)
+
+        logging.info(f"Imported {stats['written']} users from {path} ({len(stats['invalid'])} invalid lines)")
+        return stats
+
+
+def export_users(db, path: str, collection: str = "users", page_size: int = 500) -> int:
+    """
+    Stream every user document to a JSONL file, one {"id": ..., fields...} object per line
+
+    Returns:
+        int: Number of users written
+    """
+    query = db.collection(collection).order_by("__name__").limit(page_size)
+    count = 0
+    last = None
+    with open(path, "w") as f:
+        while True:
+            page = list((query.start_after(last) if last else query).stream())
+            for doc in page:
+                data = doc.to_dict() or {}
+                if "UserInterests" in data:
+                    data["UserInterests"] = list(parse_interests(data["UserInterests"]))
+                f.write(json.dumps({"id": doc.id, **data}, default=str) + "\n")
+            count += len(page)
+            if len(page) < page_size:
+                break
+            last = page[-1]
+    logging.info(f"Exported {count} users to {path}")
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import/export of users as JSONL")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    import_parser = subcommands.add_parser("import", help="Validate and write users from a JSONL file")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--checkpoint", help="File recording progress, for resuming")
+    import_parser.add_argument("--batch-size", type=int, default=400)
+    import_parser.add_argument("--workers", type=int, default=4)
+    export_parser = subcommands.add_parser("export", help="Write every user to a JSONL file")
+    export_parser.add_argument("path")
+    args = parser.parse_args(argv)
+
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    from dotenv import load_dotenv
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv()
+    firebase_admin.initialize_app(credentials.Certificate(json.loads(os.environ["FIREBASE_SERVICE_ACCOUNT"])))
+    db = firestore.client()
+
+    if args.command == "import":
+        stats = BulkUserImporter(db, batch_size=args.batch_size, max_workers=args.workers).import_file(
+            args.path, args.checkpoint
+        )
+        for line_number, error in stats["invalid"]:
+            print(f"line {line_number}: {error}")
+        print(f"read {stats['read']}, written {stats['written']}, skipped {stats['skipped']}, invalid {len(stats['invalid'])}")
+    else:
+        export_users(db, args.path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import itertools
+import json
+import os
+import tempfile
+import threading
+import unittest
+from google.api_core import exceptions as google_exceptions
+from services.bulk_users import BulkUserImporter, export_users, validate_user
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeDocument:
+    def __init__(self, collection, doc_id):
+        self.collection = collection
+        self.id = doc_id
+
+
+class FakeQuery:
+    def __init__(self, collection, after=None, limit=None):
+        self.collection = collection
+        self.after = after
+        self.limit_count = limit
+
+    def order_by(self, field):
+        return self
+
+    def limit(self, count):
+        return FakeQuery(self.collection, self.after, count)
+
+    def start_after(self, snapshot):
+        return FakeQuery(self.collection, snapshot.id, self.limit_count)
+
+    def stream(self):
+        docs = [FakeSnapshot(doc_id, data) for doc_id, data in sorted(self.collection.docs.items())
+                if self.after is None or doc_id > self.after]
+        return iter(docs[:self.limit_count] if self.limit_count else docs)
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self):
+        super().__init__(self)
+        self.docs = {}
+        self.auto_ids = (f"auto{i:04d}" for i in itertools.count())
+
+    def document(self, doc_id=None):
+        return FakeDocument(self, doc_id or next(self.auto_ids))
+
+    def select(self, fields):
+        return self
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.writes = []
+
+    def set(self, ref, data, merge=False):
+        self.writes.append((ref, data))
+
+    def commit(self):
+        with self.db.lock:
+            self.db.commits.append(len(self.writes))
+            failure = self.db.failures.pop(len(self.db.commits), None)
+            if failure:
+                raise failure
+            for ref, data in self.writes:
+                ref.collection.docs.setdefault(ref.id, {}).update(data)
+
+
+class FakeFirestore:
+    def __init__(self):
+        self.users = FakeCollection()
+        self.commits = []
+        # Commit number (1-based) -> exception to raise from it
+        self.failures = {}
+        self.lock = threading.Lock()
+
+    def collection(self, name):
+        return self.users
+
+    def batch(self):
+        return FakeBatch(self)
+
+
+class TestBulkUsers(unittest.TestCase):
+    """Test suite for the bulk user import/export tool"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = FakeFirestore()
+        self.importer = BulkUserImporter(self.db, batch_size=2, max_workers=2, base_backoff=0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_jsonl(self, lines):
+        path = os.path.join(self.tmp.name, "users.jsonl")
+        with open(path, "w") as f:
+            for line in lines:
+                f.write((line if isinstance(line, str) else json.dumps(line)) + "\n")
+        return path
+
+    def test_validate_user(self):
+        self.assertEqual(validate_user({"PhoneNumber": "+15551234567", "UserInterests": ["chess"]}),
+                         {"PhoneNumber": "+15551234567", "UserInterests": ["chess"]})
+        self.assertEqual(validate_user({"PhoneNumber": "+15551234567", "UserInterests": "chess, running"}),
+                         {"PhoneNumber": "+15551234567", "UserInterests": ["chess", "running"]})
+        for bad in [{"PhoneNumber": "5551234567"}, {"PhoneNumber": "+15551234567", "Password": "x"},
+                    {"PhoneNumber": "+15551234567", "NotionAPI": 3}, ["not", "an", "object"],
+                    {"PhoneNumber": "+15551234567", "UserInterests": [3]}]:
+            with self.assertRaises(ValueError):
+                validate_user(bad)
+
+    def test_imports_in_batches_and_merges_existing_users(self):
+        self.db.users.docs["existing"] = {"PhoneNumber": "+15550000001", "NotionAPI": "old"}
+        path = self.write_jsonl([
+            {"PhoneNumber": "+15550000001", "NotionAPI": "new"},
+            {"PhoneNumber": "+15550000002"},
+            "not json",
+            {"PhoneNumber": "+15550000003", "Personality": "schmidt"},
+            {"id": "chosen", "PhoneNumber": "+15550000004"},
+            {"PhoneNumber": "bad"},
+        ])
+
+        stats = self.importer.import_file(path)
+
+        self.assertEqual(stats["written"], 4)
+        self.assertEqual([line for line, _ in stats["invalid"]], [3, 6])
+        self.assertEqual(sorted(self.db.commits), [2, 2])
+        self.assertEqual(self.db.users.docs["existing"], {"PhoneNumber": "+15550000001", "NotionAPI": "new"})
+        self.assertIn("chosen", self.db.users.docs)
+        self.assertEqual(len(self.db.users.docs), 4)
+
+    def test_retries_transient_errors(self):
+        self.db.failures = {1: google_exceptions.ServiceUnavailable("try again")}
+        path = self.write_jsonl([{"PhoneNumber": "+15550000001"}])
+        self.assertEqual(self.importer.import_file(path)["written"], 1)
+        self.assertEqual(self.db.commits, [1, 1])
+
+    def test_resumes_from_checkpoint(self):
+        checkpoint = os.path.join(self.tmp.name, "users.checkpoint")
+        path = self.write_jsonl([{"PhoneNumber": f"+1555000000{i}"} for i in range(1, 6)])
+        importer = BulkUserImporter(self.db, batch_size=2, max_workers=1, max_attempts=1, base_backoff=0)
+
+        # The second batch fails for good; the first is checkpointed
+        self.db.failures = {2: google_exceptions.ServiceUnavailable("down")}
+        with self.assertRaises(google_exceptions.ServiceUnavailable):
+            importer.import_file(path, checkpoint)
+
+        with open(checkpoint) as f:
+            self.assertEqual(json.load(f)["line"], 2)
+
+        stats = importer.import_file(path, checkpoint)
+        self.assertEqual(stats["skipped"], 2)
+        self.assertEqual(stats["written"], 3)
+        self.assertEqual(len(self.db.users.docs), 5)
+        with open(checkpoint) as f:
+            self.assertEqual(json.load(f)["line"], 5)
+
+    def test_export_pages_through_every_user(self):
+        for i in range(5):
+            self.db.users.docs[f"user{i}"] = {"PhoneNumber": f"+1555000000{i}"}
+        path = os.path.join(self.tmp.name, "export.jsonl")
+
+        self.assertEqual(export_users(self.db, path, page_size=2), 5)
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([record["id"] for record in records], [f"user{i}" for i in range(5)])
+        self.assertEqual(records[0]["PhoneNumber"], "+15550000000")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import bisect
+import threading
+import time
+from collections import OrderedDict
+
+
+class IntervalIndex:
+    """
+    Sorted-interval index over one user's busy time
+
+    Events are kept sorted by start with a running maximum of end times, so an
+    overlap query is two binary searches plus a scan of the matches. Overlapping
+    events are also merged into disjoint busy blocks, which makes a first-fit
+    free-slot search a binary search followed by a walk over the gaps.
+    Times are epoch seconds.
+    """
+
+    def __init__(self, intervals=()):
+        """
+        Args:
+            intervals: Iterable of (start, end, event_id) tuples
+        """
+        self.intervals = sorted((start, end, event_id) for start, end, event_id in intervals if end > start)
+        self._rebuild()
+
+    def _rebuild(self):
+        self.starts = [start for start, _, _ in self.intervals]
+
+        self.max_ends = []
+        running = float('-inf')
+        for _, end, _ in self.intervals:
+            running = max(running, end)
+            self.max_ends.append(running)
+
+        self.busy_starts = []
+        self.busy_ends = []
+        for start, end, _ in self.intervals:
+            if self.busy_ends and start <= self.busy_ends[-1]:
+                self.busy_ends[-1] = max(self.busy_ends[-1], end)
+            else:
+                self.busy_starts.append(start)
+                self.busy_ends.append(end)
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def add(self, start: float, end: float, event_id: str = None):
+        """
+        Insert an interval, e.g. an event created before the next sync
+
+        Positions are found by binary search, but inserting into the sorted lists
+        still shifts their tails, so an insert costs O(n) memory moves. Running
+        max ends are only rewritten while they are smaller than `end`.
+        """
+        if end <= start:
+            return
+        interval = (start, end, event_id)
+        position = bisect.bisect_right(self.intervals, interval)
+        self.intervals.insert(position, interval)
+        self.starts.insert(position, start)
+
+        previous = self.max_ends[position - 1] if position else float('-inf')
+        self.max_ends.insert(position, max(previous, end))
+        for later in range(position + 1, len(self.max_ends)):
+            if self.max_ends[later] >= end:
+                break
+            self.max_ends[later] = end
+
+        # Merge with every busy block it overlaps or touches
+        first = bisect.bisect_right(self.busy_starts, start) - 1
+        if first < 0 or self.busy_ends[first] < start:
+            first += 1
+        stop = bisect.bisect_right(self.busy_starts, end)
+        if first < stop:
+            start = min(start, self.busy_starts[first])
+            end = max(end, self.busy_ends[stop - 1])
+        self.busy_starts[first:stop] = [start]
+        self.busy_ends[first:stop] = [end]
+
+    def overlapping(self, start: float, end: float) -> list:
+        """Intervals that overlap [start, end), ordered by start"""
+        # Only intervals starting before `end` can overlap...
+        stop = bisect.bisect_left(self.starts, end)
+        # ...and none before the first one whose running max end passes `start`
+        first = bisect.bisect_right(self.max_ends, start, 0, stop)
+        return [interval for interval in self.intervals[first:stop] if interval[1] > start]
+
+    def is_free(self, start: float, end: float) -> bool:
+        index = bisect.bisect_right(self.busy_starts, start) - 1
+        if index >= 0 and self.busy_ends[index] > start:
+            return False
+        next_index = index + 1
+        return next_index >= len(self.busy_starts) or self.busy_starts[next_index] >= end
+
+    def first_free_slot(self, duration: float, earliest: float, latest: float = None):
+        """
+        Earliest start time t >= `earliest` with [t, t + duration) free
+
+        Args:
+            duration: Length of the slot in seconds
+            earliest: Do not suggest anything starting before this
+            latest: Slot must end by this time (default: no limit)
+
+        Returns:
+            float: Start of the slot, or None if nothing fits
+        """
+        candidate = earliest
+        index = bisect.bisect_right(self.busy_starts, candidate) - 1
+        if index >= 0 and self.busy_ends[index] > candidate:
+            candidate = self.busy_ends[index]
+
+        for next_index in range(index + 1, len(self.busy_starts)):
+            if latest is not None and candidate + duration > latest:
+                return None
+            if self.busy_starts[next_index] >= candidate + duration:
+                return candidate
+            candidate = max(candidate, self.busy_ends[next_index])
+
+        if latest is not None and candidate + duration > latest:
+            return None
+        return candidate
+
+
+class CalendarIndexCache:
+    """
+    Per-user IntervalIndex built from the local calendar store
+
+    Indexes are built on first use from CalendarEventStore and dropped when a
+    sync reports changes, so conflict checks never call Google.
+    """
+
+    def __init__(self, store, horizon_days: int = 60, max_users: int = 10000):
+        """
+        Args:
+            store: CalendarEventStore with the synced events
+            horizon_days: How far ahead events are indexed
+            max_users: Number of user indexes kept in memory
+        """
+        self.store = store
+        self.horizon = horizon_days * 86400
+        self.max_users = max_users
+        self.indexes = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, phone_number: str) -> IntervalIndex:
+        with self.lock:
+            index = self.indexes.get(phone_number)
+            if index is not None:
+                self.indexes.move_to_end(phone_number)
+                return index
+
+        now = time.time()
+        events = self.store.events_between(phone_number, now - 86400, now + self.horizon)
+        # All-day events (holidays, birthdays) do not make someone busy
+        index = IntervalIndex((e['start'], e['end'], e['id']) for e in events if not e['all_day'])
+
+        with self.lock:
+            self.indexes[phone_number] = index
+            while len(self.indexes) > self.max_users:
+                self.indexes.popitem(last=False)
+        return index
+
+    def add(self, phone_number: str, start: float, end: float, event_id: str = None):
+        """Put a just-created event into the user's index, if it is loaded, ahead of the next sync"""
+        with self.lock:
+            index = self.indexes.get(phone_number)
+            if index is not None:
+                index.add(start, end, event_id)
+
+    def invalidate(self, phone_number: str):
+        with self.lock:
+            self.indexes.pop(phone_number, None)
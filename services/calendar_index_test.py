@@ -0,0 +1,97 @@
+import unittest
+from unittest.mock import Mock
+from services.calendar_index import IntervalIndex, CalendarIndexCache
+
+HOUR = 3600
+
+
+class TestIntervalIndex(unittest.TestCase):
+    """Test suite for IntervalIndex"""
+
+    def setUp(self):
+        # 9-10 and 9:30-11 merge into one busy block, 13-14 stands alone
+        self.index = IntervalIndex([
+            (9 * HOUR, 10 * HOUR, 'standup'),
+            (9.5 * HOUR, 11 * HOUR, 'review'),
+            (13 * HOUR, 14 * HOUR, 'lunch'),
+        ])
+
+    def test_overlapping(self):
+        """Only intervals that actually intersect the query are returned"""
+        ids = [event_id for _, _, event_id in self.index.overlapping(10.5 * HOUR, 13.5 * HOUR)]
+        self.assertEqual(ids, ['review', 'lunch'])
+        self.assertEqual(self.index.overlapping(11 * HOUR, 13 * HOUR), [])
+
+    def test_overlapping_with_long_early_interval(self):
+        """An early interval that spans the query is still found"""
+        self.index.add(1 * HOUR, 20 * HOUR, 'offsite')
+        ids = [event_id for _, _, event_id in self.index.overlapping(11 * HOUR, 12 * HOUR)]
+        self.assertEqual(ids, ['offsite'])
+
+    def test_first_free_slot(self):
+        """First fit skips merged busy blocks and gaps that are too short"""
+        self.assertEqual(self.index.first_free_slot(HOUR, 9 * HOUR), 11 * HOUR)
+        self.assertEqual(self.index.first_free_slot(2.5 * HOUR, 9 * HOUR), 14 * HOUR)
+        self.assertEqual(self.index.first_free_slot(HOUR, 7 * HOUR), 7 * HOUR)
+        self.assertIsNone(self.index.first_free_slot(3 * HOUR, 9 * HOUR, latest=15 * HOUR))
+
+    def test_is_free(self):
+        self.assertTrue(self.index.is_free(11 * HOUR, 13 * HOUR))
+        self.assertFalse(self.index.is_free(10.5 * HOUR, 11.5 * HOUR))
+        self.assertFalse(self.index.is_free(12 * HOUR, 13.5 * HOUR))
+
+    def test_add_matches_a_fresh_build(self):
+        """Incremental inserts leave the same arrays as building from scratch"""
+        added = [
+            (12 * HOUR, 13 * HOUR, 'touches lunch'),
+            (8 * HOUR, 8.5 * HOUR, 'early'),
+            (10.5 * HOUR, 15 * HOUR, 'bridges blocks'),
+            (16 * HOUR, 17 * HOUR, 'late'),
+            (7 * HOUR, 7.5 * HOUR, 'first'),
+        ]
+        for interval in added:
+            self.index.add(*interval)
+        fresh = IntervalIndex(self.index.intervals)
+        for name in ('intervals', 'starts', 'max_ends', 'busy_starts', 'busy_ends'):
+            self.assertEqual(getattr(self.index, name), getattr(fresh, name), name)
+
+
+class TestCalendarIndexCache(unittest.TestCase):
+    """Test suite for CalendarIndexCache"""
+
+    def test_builds_once_and_skips_all_day_events(self):
+        """Indexes come from the local store and ignore all-day events"""
+        store = Mock()
+        store.events_between.return_value = [
+            {'id': 'gym', 'start': 100.0, 'end': 200.0, 'all_day': False},
+            {'id': 'holiday', 'start': 0.0, 'end': 86400.0, 'all_day': True},
+        ]
+        cache = CalendarIndexCache(store)
+
+        index = cache.get('+1555')
+        self.assertIs(cache.get('+1555'), index)
+        self.assertEqual(len(index), 1)
+        store.events_between.assert_called_once()
+
+        cache.invalidate('+1555')
+        cache.get('+1555')
+        self.assertEqual(store.events_between.call_count, 2)
+
+    def test_add_updates_loaded_indexes_only(self):
+        """A created event lands in a loaded index; unloaded users are built from the store later"""
+        store = Mock()
+        store.events_between.return_value = []
+        cache = CalendarIndexCache(store)
+
+        cache.add('+1999', 100.0, 200.0, 'dentist')
+        self.assertEqual(len(cache.indexes), 0)
+
+        index = cache.get('+1555')
+        cache.add('+1555', 100.0, 200.0, 'dentist')
+        self.assertIs(cache.get('+1555'), index)
+        self.assertFalse(index.is_free(150.0, 160.0))
+        store.events_between.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,244 @@
+import datetime
+import hashlib
+import importlib
+import inspect
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import httpx
+from notion_client import Client, APIResponseError
+
+from ai_model import AIModel
+from api_interaction.google_cal_api import GoogleCalendarAPI
+from api_interaction.textbot import Textbot
+from services.priority_scheduler import llm_scheduler, sms_scheduler, calendar_scheduler
+
+
+# What Does this module do?
+# Records calls to the external providers (Grok/OpenAI, Notion, Google Calendar, Textbelt)
+# into a JSON "cassette" once, then replays them offline, so tests and benchmarks don't need
+# the network or secrets and give the same answers every run
+#   - Calls are matched on their arguments (bound to parameter names, so positional and
+#     keyword calls match); identical calls replay their recorded answers in order
+#   - An unrecorded call in replay mode raises UnrecordedCall rather than going to the network
+#   - Recorded errors (Notion APIResponseError, HTTP errors) are raised again on replay
+#   - Replays can sleep a fixed or the recorded latency and hold a priority_scheduler
+#     slot meanwhile, like the real calls
+#   - The current date and time in LLM prompts are masked, so recordings survive the day
+# Modes: "replay" (never call out), "record" (always call out, overwrite) and "once"
+# (replay what is recorded, record the rest). Recording needs the real credentials:
+#   CASSETTE_MODE=record python -m pytest api_interaction/notion_api_test.py
+
+MODES = ("replay", "record", "once")
+
+# Masks for volatile text in prompts (see AIModel.parse_calendar_events / choose_title)
+PROMPT_MASKS = [
+    (re.compile(r"Today is [^.]*? at \d{1,2}:\d{2} [AP]M"), "Today is <now>"),
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}\b"), "<date>"),
+]
+
+
+class UnrecordedCall(AssertionError):
+    pass
+
+
+# (class, method, mask prompts, scheduler held during replay latency). Credentials are never
+# part of a request, so a recording replays without them. Pooled Notion clients already hold
+# a notion_scheduler slot around Client.request
+TARGETS = [
+    (AIModel, "_call_grok_api", True, llm_scheduler),
+    (AIModel, "embed_texts", False, llm_scheduler),
+    (Textbot, "send_text", False, sms_scheduler),
+    (Client, "request", False, None),
+    (GoogleCalendarAPI, "create_event", False, calendar_scheduler),
+    (GoogleCalendarAPI, "create_events", False, calendar_scheduler),
+    (GoogleCalendarAPI, "get_event", False, calendar_scheduler),
+    (GoogleCalendarAPI, "list_events_page", False, calendar_scheduler),
+    (GoogleCalendarAPI, "delete_event", False, calendar_scheduler),
+]
+
+
+def _encode(value):
+    if isinstance(value, datetime.datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, (tuple, set)):
+        return list(value)
+    raise TypeError(f"Can't record a {type(value).__name__}")
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        if set(value) == {"__datetime__"}:
+            return datetime.datetime.fromisoformat(value["__datetime__"])
+        return {k: _decode(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    return value
+
+
+def _mask(value):
+    if isinstance(value, str):
+        for pattern, replacement in PROMPT_MASKS:
+            value = pattern.sub(replacement, value)
+        return value
+    if isinstance(value, dict):
+        return {k: _mask(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_mask(v) for v in value]
+    return value
+
+
+def _error_data(error: Exception) -> dict:
+    data = {"type": f"{type(error).__module__}.{type(error).__qualname__}", "message": str(error)}
+    if isinstance(error, APIResponseError):
+        data.update(code=str(error.code.value if hasattr(error.code, "value") else error.code), status=error.status)
+    return data
+
+
+def _rebuild_error(data: dict) -> Exception:
+    if "status" in data:
+        return APIResponseError(data["code"], data["status"], data["message"], httpx.Headers(), "")
+    module_name, _, class_name = data["type"].rpartition(".")
+    try:
+        return getattr(importlib.import_module(module_name), class_name)(data["message"])
+    except Exception:
+        return RuntimeError(f"{data['type']}: {data['message']}")
+
+
+class Cassette:
+    def __init__(self, path: str, mode: str = "replay", latency: float = 0.0, recorded_latency: bool = False,
+                 sleep=time.sleep, clock=time.monotonic):
+        """
+        Args:
+            path: JSON file holding the recording
+            mode: "replay", "record" or "once" (see above)
+            latency: Seconds each replayed call sleeps
+            recorded_latency: Sleep as long as the recorded call took instead
+            sleep: Sleep function, injectable for tests
+            clock: Time source for recorded durations
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.recorded_latency = recorded_latency
+        self.sleep = sleep
+        self.clock = clock
+
+        self.interactions = []
+        if mode != "record" and os.path.exists(path):
+            with open(path) as f:
+                self.interactions = json.load(f)["interactions"]
+        # key -> recorded interactions, and how many of them have been replayed
+        self.by_key = {}
+        for interaction in self.interactions:
+            self.by_key.setdefault(interaction["key"], []).append(interaction)
+        self.replayed = {}
+        self.originals = {}
+        self.dirty = False
+        self.lock = threading.Lock()
+
+    @property
+    def recorded(self) -> bool:
+        """Whether there is anything to replay"""
+        return bool(self.interactions)
+
+    def _request(self, target: str, original, mask: bool, args, kwargs) -> dict:
+        bound = inspect.signature(original).bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+        del arguments[next(iter(arguments))]  # self
+        arguments.pop("auth", None)
+        request = json.loads(json.dumps({"target": target, "arguments": arguments}, sort_keys=True, default=_encode))
+        return _mask(request) if mask else request
+
+    def _wrap(self, cls, name: str, mask: bool, scheduler):
+        original = cls.__dict__[name]
+        target = f"{cls.__name__}.{name}"
+        cassette = self
+
+        def call(*args, **kwargs):
+            request = cassette._request(target, original, mask, args, kwargs)
+            key = hashlib.sha256(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()
+            with cassette.lock:
+                recorded = cassette.by_key.get(key, [])
+                index = cassette.replayed.get(key, 0)
+                if recorded and cassette.mode != "record":
+                    # Identical calls replay in order; past the end, the last answer repeats
+                    cassette.replayed[key] = index + 1
+                    interaction = recorded[min(index, len(recorded) - 1)]
+                elif cassette.mode == "replay":
+                    raise UnrecordedCall(f"No recording of {target} in {cassette.path} for {json.dumps(request)[:500]}; "
+                                         "re-record with CASSETTE_MODE=record")
+                else:
+                    interaction = None
+
+            if interaction is not None:
+                return cassette._replay(interaction, scheduler)
+            return cassette._record(key, request, original, args, kwargs)
+
+        self.originals[(cls, name)] = original
+        setattr(cls, name, call)
+
+    def _replay(self, interaction: dict, scheduler):
+        delay = interaction["duration"] if self.recorded_latency else self.latency
+        if delay:
+            if scheduler is not None:
+                with scheduler.slot():
+                    self.sleep(delay)
+            else:
+                self.sleep(delay)
+        if "error" in interaction:
+            raise _rebuild_error(interaction["error"])
+        return _decode(interaction["response"])
+
+    def _record(self, key: str, request: dict, original, args, kwargs):
+        interaction = {"key": key, "request": request}
+        started = self.clock()
+        try:
+            response = original(*args, **kwargs)
+            interaction["response"] = json.loads(json.dumps(response, default=_encode))
+            return response
+        except Exception as e:
+            interaction["error"] = _error_data(e)
+            raise
+        finally:
+            interaction["duration"] = round(self.clock() - started, 4)
+            with self.lock:
+                self.interactions.append(interaction)
+                self.by_key.setdefault(key, []).append(interaction)
+                self.replayed[key] = len(self.by_key[key])
+                self.dirty = True
+
+    def install(self) -> "Cassette":
+        """Route provider calls through the cassette"""
+        for cls, name, mask, scheduler in TARGETS:
+            self._wrap(cls, name, mask, scheduler)
+        if self.mode == "replay":
+            # Nothing is called for real, so no Google service (or credentials) is needed
+            self.originals[(GoogleCalendarAPI, "_build_service")] = GoogleCalendarAPI.__dict__["_build_service"]
+            GoogleCalendarAPI._build_service = lambda api: None
+        logging.info(f"Provider calls {'replayed from' if self.mode == 'replay' else 'recorded to'} {self.path}")
+        return self
+
+    def eject(self):
+        """Put the real provider calls back and save anything newly recorded"""
+        for (cls, name), original in self.originals.items():
+            setattr(cls, name, original)
+        self.originals.clear()
+        if self.dirty:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "w") as f:
+                json.dump({"interactions": self.interactions}, f, indent=1, sort_keys=True)
+            self.dirty = False
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc_info):
+        self.eject()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import httpx
+from notion_client import Client, APIResponseError
+
+from ai_model import AIModel
+from api_interaction.textbot import Textbot
+from services.cassette import Cassette, UnrecordedCall
+
+
+class TestCassette(unittest.TestCase):
+    """Test suite for recording and replaying provider calls"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cassettes", "providers.json")
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            self.ai_model = AIModel()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_records_then_replays_without_calling_out(self):
+        sent = []
+        fake_send = lambda textbot, text, phone_number: sent.append(text) or {"success": True, "textId": str(len(sent))}
+        with patch.object(Textbot, "send_text", fake_send):
+            with Cassette(self.path, mode="record"):
+                Textbot("https://example.com").send_text("hi", "+15551234567")
+                Textbot("https://example.com").send_text("hi", "+15551234567")
+
+            with Cassette(self.path, mode="replay"):
+                # Keyword arguments match the positional recording; repeats replay in order
+                first = Textbot("https://example.com").send_text(text="hi", phone_number="+15551234567")
+                second = Textbot("https://example.com").send_text("hi", "+15551234567")
+                with self.assertRaises(UnrecordedCall):
+                    Textbot("https://example.com").send_text("bye", "+15551234567")
+
+        self.assertEqual(len(sent), 2)
+        self.assertEqual((first["textId"], second["textId"]), ("1", "2"))
+        self.assertEqual(Textbot.send_text.__qualname__, "Textbot.send_text")
+
+    def test_prompt_dates_are_masked(self):
+        with patch.object(AIModel, "_call_grok_api", lambda model, prompt, system_prompt="", history=None: "Gym"):
+            with Cassette(self.path, mode="record"):
+                self.ai_model._call_grok_api("Today is Monday, November 24, 2025 at 07:00 PM. Title for 2025-11-24")
+
+            with Cassette(self.path, mode="replay"):
+                answer = self.ai_model._call_grok_api("Today is Friday, May 01, 2026 at 09:15 AM. Title for 2026-05-01")
+        self.assertEqual(answer, "Gym")
+
+    def test_errors_replay_and_latency(self):
+        def fail(client, path, method, query=None, body=None, form_data=None, auth=None):
+            raise APIResponseError("object_not_found", 404, "Could not find database", httpx.Headers(), "")
+
+        client = Client(auth="secret_test")
+        with patch.object(Client, "request", fail):
+            with Cassette(self.path, mode="record"), self.assertRaises(APIResponseError):
+                client.databases.retrieve(database_id="missing")
+
+        sleeps = []
+        with Cassette(self.path, mode="replay", latency=0.25, sleep=sleeps.append):
+            with self.assertRaises(APIResponseError) as raised:
+                client.databases.retrieve(database_id="missing")
+            # The token is not part of the recording, so it replays under any integration
+            with self.assertRaises(APIResponseError):
+                Client(auth="secret_other").databases.retrieve(database_id="missing")
+            with self.assertRaises(UnrecordedCall):
+                client.databases.retrieve(database_id="other")
+        self.assertEqual(raised.exception.status, 404)
+        self.assertEqual(sleeps, [0.25, 0.25])
+        with open(self.path) as f:
+            self.assertNotIn("secret_test", f.read())
+
+    def test_once_mode_only_records_what_is_missing(self):
+        calls = []
+        fake = lambda model, texts: calls.append(texts) or [[0.5] * 2 for _ in texts]
+        with patch.object(AIModel, "embed_texts", fake):
+            with Cassette(self.path, mode="once"):
+                self.ai_model.embed_texts(["a"])
+            with Cassette(self.path, mode="once") as cassette:
+                self.assertTrue(cassette.recorded)
+                self.ai_model.embed_texts(["a"])
+                self.ai_model.embed_texts(["b"])
+        self.assertEqual(calls, [["a"], ["b"]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import json
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+# What Does this module do?
+# Bounded per-user conversation memory for the LLM
+#   - The last few turns are kept verbatim
+#   - Older turns are folded into a rolling summary by a background LLM call
+#   - Prompt size per call is bounded by max_turns, max_turn_chars and max_summary_chars
+#   - State is persisted as one small JSON document per user (SQLite or Firestore); the
+#     most recently used users' states stay in memory, and a miss is loaded without
+#     holding the lock, so one slow read doesn't stall other users' replies
+
+
+class SQLiteConversationStore:
+    def __init__(self, db_path: str = "conversations.db"):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS conversations (phone_number TEXT PRIMARY KEY, state TEXT NOT NULL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def load(self, phone_number: str):
+        with self._connect() as conn:
+            row = conn.execute("SELECT state FROM conversations WHERE phone_number = ?", (phone_number,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, phone_number: str, state: dict):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO conversations (phone_number, state) VALUES (?, ?)",
+                (phone_number, json.dumps(state, separators=(",", ":")))
+            )
+
+
+class FirestoreConversationStore:
+    def __init__(self, db, collection: str = "conversations"):
+        """
+        Args:
+            db: firestore.client()
+            collection: Collection holding one document per phone number
+        """
+        self.collection = db.collection(collection)
+
+    def load(self, phone_number: str):
+        snapshot = self.collection.document(phone_number).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def save(self, phone_number: str, state: dict):
+        self.collection.document(phone_number).set(state)
+
+
+class ConversationMemory:
+    def __init__(self, store, summarize, max_turns: int = 8, max_turn_chars: int = 500,
+                 max_summary_chars: int = 1000, max_users: int = 10000):
+        """
+        Args:
+            store: SQLiteConversationStore or FirestoreConversationStore
+            summarize: Callable (summary, turns) -> new summary, e.g. AIModel.summarize_conversation
+            max_turns: Turns kept verbatim before the oldest half is summarized
+            max_turn_chars: Longer messages are truncated when recorded
+            max_summary_chars: Longer summaries are truncated
+            max_users: Users whose state is kept in memory between messages
+        """
+        self.store = store
+        self.summarize = summarize
+        self.max_turns = max_turns
+        self.max_turn_chars = max_turn_chars
+        self.max_summary_chars = max_summary_chars
+        self.max_users = max_users
+        self.states = OrderedDict()
+        self.lock = threading.Lock()
+        self.summarizer = ThreadPoolExecutor(max_workers=2, thread_name_prefix="conversation-summary")
+
+    def _state(self, phone_number: str) -> dict:
+        """The user's state, loaded from the store on a miss; mutate it while holding self.lock"""
+        with self.lock:
+            state = self.states.get(phone_number)
+            if state is not None:
+                self.states.move_to_end(phone_number)
+                return state
+
+        try:
+            loaded = self.store.load(phone_number)
+        except Exception as e:
+            logging.error(f"Error loading conversation for {phone_number}: {e}")
+            loaded = None
+
+        with self.lock:
+            # Another thread may have loaded it meanwhile; keep the copy already in use
+            state = self.states.get(phone_number)
+            if state is None:
+                state = loaded or {"summary": "", "turns": [], "folding": []}
+                self.states[phone_number] = state
+                while len(self.states) > self.max_users:
+                    self.states.popitem(last=False)
+            return state
+
+    def record(self, phone_number: str, role: str, content: str):
+        """
+        Add a turn ("user" or "assistant") to a user's conversation
+
+        When the buffer fills, its oldest half moves to `folding` and is
+        summarized in the background; it stays in the context until then.
+        """
+        state = self._state(phone_number)
+        with self.lock:
+            state["turns"].append({"role": role, "content": content[:self.max_turn_chars]})
+
+            fold = None
+            if len(state["turns"]) >= self.max_turns and not state["folding"]:
+                half = self.max_turns // 2
+                fold = state["turns"][:half]
+                state["folding"] = fold
+                state["turns"] = state["turns"][half:]
+            elif len(state["turns"]) > self.max_turns:
+                # A summary is still running; keep the buffer bounded regardless
+                state["turns"] = state["turns"][-self.max_turns:]
+
+            snapshot = json.loads(json.dumps(state))
+
+        self._save(phone_number, snapshot)
+        if fold:
+            self.summarizer.submit(self._fold, phone_number, snapshot["summary"], fold)
+
+    def _fold(self, phone_number: str, summary: str, turns: list):
+        try:
+            new_summary = self.summarize(summary, turns)[:self.max_summary_chars]
+        except Exception as e:
+            logging.error(f"Error summarizing conversation for {phone_number}: {e}")
+            new_summary = summary
+
+        state = self._state(phone_number)
+        with self.lock:
+            state["summary"] = new_summary
+            state["folding"] = []
+            snapshot = json.loads(json.dumps(state))
+        self._save(phone_number, snapshot)
+
+    def _save(self, phone_number: str, snapshot: dict):
+        # Memory is best effort; a failed save must not break the reply
+        try:
+            self.store.save(phone_number, snapshot)
+        except Exception as e:
+            logging.error(f"Error saving conversation for {phone_number}: {e}")
+
+    def context(self, phone_number: str) -> list:
+        """Chat messages to send ahead of a new prompt: summary first, then recent turns"""
+        state = self._state(phone_number)
+        with self.lock:
+            messages = []
+            if state["summary"]:
+                messages.append({"role": "system", "content": f"Summary of the earlier conversation: {state['summary']}"})
+            messages.extend(dict(turn) for turn in state["folding"] + state["turns"])
+            return messages
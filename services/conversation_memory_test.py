@@ -0,0 +1,99 @@
+import os
+import tempfile
+import threading
+import unittest
+from services.conversation_memory import ConversationMemory, SQLiteConversationStore
+
+
+class TestConversationMemory(unittest.TestCase):
+    """Test suite for ConversationMemory"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SQLiteConversationStore(os.path.join(self.tmp.name, "conversations.db"))
+        self.summarized = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def summarize(self, summary, turns):
+        self.release.wait(5)
+        self.summarized.append(turns)
+        return (summary + " " if summary else "") + "/".join(turn["content"] for turn in turns)
+
+    def _memory(self, **kwargs):
+        return ConversationMemory(self.store, self.summarize, max_turns=4, **kwargs)
+
+    def test_context_stays_bounded(self):
+        """Old turns are folded into the summary instead of growing the prompt"""
+        memory = self._memory()
+        for i in range(10):
+            memory.record("+1555", "user", f"m{i}")
+            memory.summarizer.submit(lambda: None).result(5)
+
+        context = memory.context("+1555")
+        self.assertLessEqual(len(context), 1 + 4)
+        self.assertEqual(context[0]["role"], "system")
+        self.assertIn("m0/m1", context[0]["content"])
+        self.assertEqual(context[-1]["content"], "m9")
+
+    def test_turns_being_summarized_stay_in_context(self):
+        """Nothing drops out of the context while the summary is still running"""
+        self.release.clear()
+        memory = self._memory()
+        for i in range(4):
+            memory.record("+1555", "user", f"m{i}")
+
+        self.assertEqual([turn["content"] for turn in memory.context("+1555")], ["m0", "m1", "m2", "m3"])
+        self.release.set()
+        memory.summarizer.shutdown(wait=True)
+        self.assertEqual(memory.context("+1555")[0]["content"], "Summary of the earlier conversation: m0/m1")
+
+    def test_long_messages_are_truncated(self):
+        memory = self._memory(max_turn_chars=10)
+        memory.record("+1555", "user", "x" * 100)
+        self.assertEqual(len(memory.context("+1555")[0]["content"]), 10)
+
+    def test_state_is_persisted(self):
+        """A new process picks up the conversation from the store"""
+        memory = self._memory()
+        memory.record("+1555", "user", "remember the milk")
+
+        reloaded = self._memory()
+        self.assertEqual(reloaded.context("+1555"), [{"role": "user", "content": "remember the milk"}])
+
+    def test_slow_load_does_not_block_other_users(self):
+        """A user's state is read from the store without holding the shared lock"""
+        loading = threading.Event()
+        original_load = self.store.load
+
+        def load(phone_number):
+            if phone_number == "+1999":
+                loading.set()
+                self.release.wait(5)
+            return original_load(phone_number)
+
+        self.store.load = load
+        memory = self._memory()
+        self.release.clear()
+        slow = threading.Thread(target=memory.context, args=("+1999",))
+        slow.start()
+        try:
+            self.assertTrue(loading.wait(5))
+            memory.record("+1555", "user", "hi")
+            self.assertEqual(memory.context("+1555"), [{"role": "user", "content": "hi"}])
+        finally:
+            self.release.set()
+            slow.join(5)
+
+    def test_least_recently_used_state_is_evicted(self):
+        memory = self._memory(max_users=2)
+        for phone_number in ("+1", "+2", "+1", "+3"):
+            memory.context(phone_number)
+        self.assertEqual(list(memory.states), ["+1", "+3"])
+
+
+if __name__ == '__main__':
+    unittest.main()
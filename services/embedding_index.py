@@ -0,0 +1,231 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# What Does this module do?
+# Semantic recall over logged notes ("when did I last feel burnt out?")
+#   - Each user's embeddings live in one fixed-size memory-mapped matrix, used as
+#     a ring buffer, so memory and disk per user are bounded by `capacity`
+#   - Search is a single matrix-vector product over normalized rows (cosine similarity)
+#   - Optional int8 quantization stores 1 byte per dimension plus a per-row scale
+#   - Embeddings are cached by content hash, so re-indexing the same text is free
+#   - Only the most recently used users' matrices stay mapped (max_open_users); the rest
+#     are unmapped and reopened from disk when next needed
+#   - The directory (EMBEDDING_INDEX_DIR) must be on persistent storage shared by every
+#     instance, or recall only covers notes written through the instance that answers
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Embeddings keyed by (model, content hash), stored as float32 blobs in SQLite"""
+
+    def __init__(self, db_path: str = "embedding_cache.db"):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, content_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model, content_hash))"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get_many(self, model: str, hashes: list) -> dict:
+        found = {}
+        with self._connect() as conn:
+            for i in range(0, len(hashes), 500):
+                chunk = hashes[i:i + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                rows = conn.execute(
+                    f"SELECT content_hash, vector FROM embeddings WHERE model = ? AND content_hash IN ({placeholders})",
+                    (model, *chunk)
+                ).fetchall()
+                for digest, blob in rows:
+                    found[digest] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model: str, vectors: dict):
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, content_hash, vector) VALUES (?, ?, ?)",
+                [(model, digest, np.asarray(vector, dtype=np.float32).tobytes()) for digest, vector in vectors.items()]
+            )
+
+
+class EmbeddingIndex:
+    def __init__(self, root_dir: str, embed_texts, dim: int, model: str = "default",
+                 capacity: int = 2000, quantize: bool = False, cache: EmbeddingCache = None,
+                 batch_size: int = 64, max_open_users: int = 256):
+        """
+        Args:
+            root_dir: Directory for the per-user matrix files
+            embed_texts: Callable list[str] -> list of vectors, e.g. AIModel.embed_texts
+            dim: Embedding dimension
+            model: Name of the embedding model, part of the cache key
+            capacity: Rows kept per user; the oldest rows are overwritten when full
+            quantize: Store int8 rows with a float32 scale instead of float32 rows
+            cache: Content-hash cache (default: embedding_cache.db inside root_dir)
+            batch_size: Texts per embedding request
+            max_open_users: Users whose matrices are kept memory-mapped (each holds one or two file descriptors)
+        """
+        self.root_dir = root_dir
+        self.embed_texts = embed_texts
+        self.dim = dim
+        self.model = model
+        self.capacity = capacity
+        self.quantize = quantize
+        self.batch_size = batch_size
+        self.max_open_users = max_open_users
+        os.makedirs(root_dir, exist_ok=True)
+        self.cache = cache or EmbeddingCache(os.path.join(root_dir, "embedding_cache.db"))
+        self.users = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _paths(self, phone_number: str) -> dict:
+        key = hashlib.sha256(phone_number.encode("utf-8")).hexdigest()[:16]
+        base = os.path.join(self.root_dir, key)
+        return {
+            "matrix": base + (".i8" if self.quantize else ".f32"),
+            "scales": base + ".scale.f32",
+            "meta": base + ".json"
+        }
+
+    def _open(self, phone_number: str) -> dict:
+        """Memory-map a user's matrix, creating it on first use; call while holding self.lock"""
+        user = self.users.get(phone_number)
+        if user is not None:
+            self.users.move_to_end(phone_number)
+            return user
+
+        paths = self._paths(phone_number)
+        exists = os.path.exists(paths["meta"])
+        mode = "r+" if exists else "w+"
+        dtype = np.int8 if self.quantize else np.float32
+        user = {
+            "paths": paths,
+            "matrix": np.memmap(paths["matrix"], dtype=dtype, mode=mode, shape=(self.capacity, self.dim)),
+            "scales": np.memmap(paths["scales"], dtype=np.float32, mode=mode, shape=(self.capacity,)) if self.quantize else None,
+            "meta": {"ids": [], "next_row": 0},
+        }
+        if exists:
+            with open(paths["meta"]) as f:
+                user["meta"] = json.load(f)
+        self.users[phone_number] = user
+        while len(self.users) > self.max_open_users:
+            _, evicted = self.users.popitem(last=False)
+            self._close(evicted)
+        return user
+
+    @staticmethod
+    def _close(user: dict):
+        # Nothing outside the lock holds a view of the maps, so dropping the last reference
+        # unmaps them and closes their files
+        user["matrix"].flush()
+        if user["scales"] is not None:
+            user["scales"].flush()
+        user["matrix"] = user["scales"] = None
+
+    def _embed(self, texts: list) -> np.ndarray:
+        """Normalized embeddings for `texts`, from the cache where possible"""
+        hashes = [content_hash(text) for text in texts]
+        vectors = self.cache.get_many(self.model, list(dict.fromkeys(hashes)))
+
+        missing = list(dict.fromkeys(h for h in hashes if h not in vectors))
+        if missing:
+            text_by_hash = dict(zip(hashes, texts))
+            computed = {}
+            for i in range(0, len(missing), self.batch_size):
+                chunk = missing[i:i + self.batch_size]
+                for digest, vector in zip(chunk, self.embed_texts([text_by_hash[h] for h in chunk])):
+                    computed[digest] = np.asarray(vector, dtype=np.float32)
+            self.cache.put_many(self.model, computed)
+            vectors.update(computed)
+            logging.info(f"Computed {len(missing)} embeddings ({len(texts) - len(missing)} cached)")
+
+        matrix = np.stack([vectors[h] for h in hashes]).astype(np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+    def add(self, phone_number: str, items: list):
+        """
+        Index texts for a user
+
+        Args:
+            phone_number: Owner of the notes
+            items: (note_id, text) pairs; a note may have several entries
+        """
+        if not items:
+            return
+        vectors = self._embed([text for _, text in items])
+
+        with self.lock:
+            user = self._open(phone_number)
+            meta = user["meta"]
+            for (note_id, _), vector in zip(items, vectors):
+                row = meta["next_row"] % self.capacity
+                if self.quantize:
+                    scale = max(float(np.abs(vector).max()) / 127.0, 1e-12)
+                    user["matrix"][row] = np.round(vector / scale).astype(np.int8)
+                    user["scales"][row] = scale
+                else:
+                    user["matrix"][row] = vector
+                if row < len(meta["ids"]):
+                    meta["ids"][row] = note_id
+                else:
+                    meta["ids"].append(note_id)
+                meta["next_row"] += 1
+
+            user["matrix"].flush()
+            if self.quantize:
+                user["scales"].flush()
+            with open(user["paths"]["meta"], "w") as f:
+                json.dump(meta, f)
+
+    def search(self, phone_number: str, query: str, k: int = 5) -> list:
+        """
+        Notes most similar to `query`
+
+        Returns:
+            list: (note_id, cosine similarity) pairs, best first, one per note
+        """
+        query_vector = self._embed([query])[0]
+
+        with self.lock:
+            user = self._open(phone_number)
+            count = len(user["meta"]["ids"])
+            if count == 0:
+                return []
+            if self.quantize:
+                scores = (user["matrix"][:count].astype(np.float32) @ query_vector) * user["scales"][:count]
+            else:
+                scores = np.asarray(user["matrix"][:count]) @ query_vector
+            ids = list(user["meta"]["ids"])
+
+        # Over-fetch so notes with several entries still yield k distinct notes
+        top = min(count, k * 4)
+        candidates = np.argpartition(-scores, top - 1)[:top]
+        results = []
+        seen = set()
+        for row in candidates[np.argsort(-scores[candidates])]:
+            if ids[row] in seen:
+                continue
+            seen.add(ids[row])
+            results.append((ids[row], float(scores[row])))
+            if len(results) == k:
+                break
+        return results
+
+    def record_write(self, phone_number: str, operation: str, written: dict):
+        """NotionWriteQueue on_written hook: embed the entries that were just written"""
+        self.add(phone_number, [(written["page_id"], content) for content in written["contents"] if content.strip()])
@@ -0,0 +1,95 @@
+import tempfile
+import unittest
+from unittest.mock import Mock
+import numpy as np
+from services.embedding_index import EmbeddingIndex
+
+# Tiny fake embedding space: one axis per topic word
+VOCABULARY = ["burnout", "tired", "run", "gym", "food"]
+
+
+def fake_embed(texts):
+    vectors = []
+    for text in texts:
+        words = text.lower().split()
+        vectors.append([float(sum(word.startswith(topic[:4]) for word in words)) + 0.01 for topic in VOCABULARY])
+    return vectors
+
+
+class TestEmbeddingIndex(unittest.TestCase):
+    """Test suite for EmbeddingIndex"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.embed = Mock(side_effect=fake_embed)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _index(self, **kwargs):
+        return EmbeddingIndex(self.tmp.name, self.embed, dim=len(VOCABULARY), **kwargs)
+
+    def test_search_ranks_by_cosine_similarity(self):
+        """The closest note comes first and each note appears once"""
+        index = self._index()
+        index.add("+1555", [("p1", "burnout tired"), ("p2", "run gym"), ("p2", "gym gym"), ("p3", "food")])
+
+        results = index.search("+1555", "burnout and tired after the gym", k=2)
+
+        self.assertEqual([note_id for note_id, _ in results], ["p1", "p2"])
+        self.assertGreater(results[0][1], results[1][1])
+        self.assertEqual(index.search("+1999", "anything"), [])
+
+    def test_embeddings_are_cached_by_content(self):
+        """Re-indexing the same text does not call the embedding model again"""
+        index = self._index()
+        index.add("+1555", [("p1", "run gym")])
+        index.add("+1777", [("p9", "run gym")])
+
+        self.assertEqual(self.embed.call_count, 1)
+
+    def test_capacity_bounds_rows_per_user(self):
+        """Once full, the oldest rows are overwritten"""
+        index = self._index(capacity=2)
+        index.add("+1555", [("p1", "burnout"), ("p2", "run"), ("p3", "food")])
+
+        note_ids = [note_id for note_id, _ in index.search("+1555", "burnout run food", k=5)]
+        self.assertEqual(sorted(note_ids), ["p2", "p3"])
+
+    def test_persists_across_instances(self):
+        """Matrices are memory-mapped files, so a new process sees earlier rows"""
+        self._index().add("+1555", [("p1", "burnout")])
+
+        reopened = self._index()
+        self.assertEqual(reopened.search("+1555", "burnout", k=1)[0][0], "p1")
+
+    def test_open_matrices_are_bounded(self):
+        """Least recently used users are unmapped and reopened from disk on their next search"""
+        index = self._index(max_open_users=2, quantize=True)
+        index.add("+1555", [("p1", "burnout")])
+        index.add("+1777", [("p2", "run")])
+        index.search("+1555", "burnout")
+        first = index.users["+1555"]
+        index.add("+1999", [("p3", "food")])
+
+        self.assertEqual(list(index.users), ["+1555", "+1999"])
+        self.assertIs(index.users["+1555"], first)
+        self.assertEqual(index.search("+1777", "run", k=1)[0][0], "p2")
+        self.assertEqual(list(index.users), ["+1999", "+1777"])
+
+    def test_quantized_scores_match_float(self):
+        """int8 rows give nearly the same similarities as float32 rows"""
+        items = [("p1", "burnout tired"), ("p2", "run gym"), ("p3", "food run")]
+        exact = EmbeddingIndex(self.tmp.name + "/f", self.embed, dim=len(VOCABULARY))
+        quantized = EmbeddingIndex(self.tmp.name + "/q", self.embed, dim=len(VOCABULARY), quantize=True)
+        exact.add("+1555", items)
+        quantized.add("+1555", items)
+
+        exact_scores = dict(exact.search("+1555", "run", k=3))
+        quantized_scores = dict(quantized.search("+1555", "run", k=3))
+        for note_id, score in exact_scores.items():
+            self.assertTrue(np.isclose(score, quantized_scores[note_id], atol=0.02))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+import hashlib
+import logging
+import re
+import sqlite3
+import time
+
+
+# What Does this module do?
+# Precomputed conversation starters, so broadcasts don't wait on the LLM per user
+#   - Users are grouped by normalized interests and personality; identical groups share a pool
+#   - precompute() (run off-peak) tops each group's pool up to pool_size fresh messages,
+#     so LLM calls scale with the number of distinct groups, not users
+#   - pick() hands a user the pooled message they have not seen, or saw longest ago;
+#     messages expire after max_age so pools keep changing
+#   - pick() returns None when a group has no usable message; callers fall back to a live call
+#   - The pool file (MESSAGE_POOL_PATH) should be on storage shared by every instance, so one
+#     off-peak precompute serves them all and users aren't sent a message they already saw
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pool_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    group_key TEXT NOT NULL,
+    message TEXT NOT NULL,
+    created_ts REAL NOT NULL,
+    uses INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (group_key, message)
+);
+CREATE TABLE IF NOT EXISTS pool_deliveries (
+    phone_number TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    sent_ts REAL NOT NULL,
+    PRIMARY KEY (phone_number, message_id)
+);
+"""
+
+
+def normalize_interests(interests) -> tuple:
+    """Interests as a sorted tuple of lowercase terms, whether given as a string or a list"""
+    if not interests:
+        return ()
+    if isinstance(interests, str):
+        interests = [interests]
+    terms = {re.sub(r"\s+", " ", term).strip().lower()
+             for entry in interests for term in re.split(r",|;|\n|\band\b", str(entry))}
+    return tuple(sorted(term for term in terms if term))
+
+
+def group_key(interests, personality: str) -> str:
+    terms = normalize_interests(interests)
+    return hashlib.sha256(f"{personality}|{','.join(terms)}".encode("utf-8")).hexdigest()[:32]
+
+
+class MessagePool:
+    def __init__(self, db_path: str, generate, pool_size: int = 5, max_age: float = 7 * 86400,
+                 repeat_window: float = 14 * 86400, clock=time.time, generate_batch=None):
+        """
+        Args:
+            db_path: SQLite file holding the pool
+            generate: Callable (interests, personality) -> message, e.g. wrapping AIModel.first_message
+            pool_size: Fresh messages kept per group
+            max_age: Seconds a pooled message stays usable
+            repeat_window: A user is not sent the same message twice within this many seconds
+            clock: Time source, injectable for tests
+            generate_batch: Optional callable (interests list, personality) -> messages, e.g.
+                wrapping AIModel.first_messages; used first so most of the pool comes from few requests
+        """
+        self.db_path = db_path
+        self.generate = generate
+        self.generate_batch = generate_batch
+        self.pool_size = pool_size
+        self.max_age = max_age
+        self.repeat_window = repeat_window
+        self.clock = clock
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def precompute(self, users) -> dict:
+        """
+        Top up the pool of every group that `users` fall into
+
+        Args:
+            users: Iterable of (interests, personality) pairs, one per user
+
+        Returns:
+            dict: Counts of groups seen, messages generated and messages expired
+        """
+        groups = {}
+        for interests, personality in users:
+            groups.setdefault(group_key(interests, personality), (interests, personality))
+
+        now = self.clock()
+        with self._connect() as conn:
+            expired = conn.execute("DELETE FROM pool_messages WHERE created_ts < ?", (now - self.max_age,)).rowcount
+            conn.execute(
+                "DELETE FROM pool_deliveries WHERE sent_ts < ? OR message_id NOT IN (SELECT id FROM pool_messages)",
+                (now - self.repeat_window,)
+            )
+
+        generated = self._precompute_batched(groups) if self.generate_batch else 0
+        for key, (interests, personality) in groups.items():
+            have = self._pool_count(key)
+            # A few extra attempts cover the LLM repeating itself
+            attempts = (self.pool_size - have) * 2
+            while have < self.pool_size and attempts > 0:
+                attempts -= 1
+                try:
+                    message = self.generate(interests, personality)
+                except Exception as e:
+                    logging.error(f"Error generating pooled message: {e}")
+                    break
+                inserted = self._store(key, message)
+                have += inserted
+                generated += inserted
+
+        logging.info(f"Message pool: {len(groups)} groups, {generated} generated, {expired} expired")
+        return {"groups": len(groups), "generated": generated, "expired": expired}
+
+    def _pool_count(self, key: str) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM pool_messages WHERE group_key = ?", (key,)).fetchone()[0]
+
+    def _store(self, key: str, message: str) -> int:
+        message = (message or "").strip()
+        if not message:
+            return 0
+        with self._connect() as conn:
+            return conn.execute(
+                "INSERT OR IGNORE INTO pool_messages (group_key, message, created_ts) VALUES (?, ?, ?)",
+                (key, message, self.clock())
+            ).rowcount
+
+    def _precompute_batched(self, groups: dict) -> int:
+        """Request every group's missing messages in batches, one call per personality"""
+        by_personality = {}
+        for key, (interests, personality) in groups.items():
+            missing = self.pool_size - self._pool_count(key)
+            by_personality.setdefault(personality, []).extend([(key, interests)] * max(0, missing))
+
+        generated = 0
+        for personality, wanted in by_personality.items():
+            if not wanted:
+                continue
+            try:
+                messages = self.generate_batch([interests for _, interests in wanted], personality)
+            except Exception as e:
+                logging.error(f"Error generating pooled messages in batch: {e}")
+                continue
+            for (key, _), message in zip(wanted, messages):
+                generated += self._store(key, message)
+        return generated
+
+    def pick(self, phone_number: str, interests, personality: str):
+        """
+        A pooled message for this user, recorded as sent
+
+        Unseen messages come first, then the one the user saw longest ago;
+        ties go to the least used message so a group's pool rotates evenly.
+
+        Returns:
+            str or None: None when the group has nothing the user may receive
+        """
+        now = self.clock()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT m.id, m.message FROM pool_messages m "
+                "LEFT JOIN pool_deliveries d ON d.message_id = m.id AND d.phone_number = ? "
+                "WHERE m.group_key = ? AND m.created_ts >= ? AND (d.sent_ts IS NULL OR d.sent_ts < ?) "
+                "ORDER BY d.sent_ts IS NOT NULL, d.sent_ts, m.uses, m.id LIMIT 1",
+                (phone_number, group_key(interests, personality), now - self.max_age, now - self.repeat_window)
+            ).fetchone()
+            if row is None:
+                return None
+            message_id, message = row
+            conn.execute("UPDATE pool_messages SET uses = uses + 1 WHERE id = ?", (message_id,))
+            conn.execute(
+                "INSERT OR REPLACE INTO pool_deliveries (phone_number, message_id, sent_ts) VALUES (?, ?, ?)",
+                (phone_number, message_id, now)
+            )
+        return message
@@ -0,0 +1,84 @@
+import itertools
+import os
+import tempfile
+import unittest
+from services.message_pool import MessagePool, group_key, normalize_interests
+from testing.fake_clock import FakeClock
+
+
+class TestMessagePool(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.clock = FakeClock(1_000_000.0)
+        self.counter = itertools.count()
+        self.calls = []
+
+        def generate(interests, personality):
+            self.calls.append((interests, personality))
+            return f"message {next(self.counter)}"
+
+        self.pool = MessagePool(os.path.join(self.tmp.name, "pool.db"), generate, pool_size=2,
+                                max_age=7 * 86400, repeat_window=86400, clock=self.clock)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_normalizes_interests(self):
+        self.assertEqual(normalize_interests("Running, guitar and  Reading"), ("guitar", "reading", "running"))
+        self.assertEqual(normalize_interests(["Reading", "running", "guitar"]), ("guitar", "reading", "running"))
+        self.assertEqual(group_key("running, reading", "schmidt"), group_key("Reading and running", "schmidt"))
+        self.assertNotEqual(group_key("running", "schmidt"), group_key("running", "uncle_iroh"))
+
+    def test_generates_once_per_group(self):
+        """Users with equivalent interests share one pool"""
+        users = [("running, reading", "schmidt"), ("Reading and running", "schmidt"), ("chess", "schmidt")]
+        stats = self.pool.precompute(users)
+        self.assertEqual(stats["groups"], 2)
+        self.assertEqual(len(self.calls), 4)
+
+        self.assertEqual(self.pool.precompute(users)["generated"], 0)
+
+    def test_rotates_without_repeats(self):
+        self.pool.precompute([("chess", "schmidt")])
+        first = self.pool.pick("+1", "chess", "schmidt")
+        self.clock.now += 60
+        second = self.pool.pick("+1", "chess", "schmidt")
+        self.assertNotEqual(first, second)
+        # Both seen within the repeat window
+        self.assertIsNone(self.pool.pick("+1", "chess", "schmidt"))
+        # Another user starts with the least used message
+        self.assertIsNotNone(self.pool.pick("+2", "chess", "schmidt"))
+
+        self.clock.now += 86400 + 1
+        self.assertEqual(self.pool.pick("+1", "chess", "schmidt"), first)
+
+    def test_expired_messages_are_replaced(self):
+        self.pool.precompute([("chess", "schmidt")])
+        self.clock.now += 8 * 86400
+        self.assertIsNone(self.pool.pick("+1", "chess", "schmidt"))
+
+        stats = self.pool.precompute([("chess", "schmidt")])
+        self.assertEqual(stats["expired"], 2)
+        self.assertEqual(stats["generated"], 2)
+        self.assertEqual(self.pool.pick("+1", "chess", "schmidt"), "message 2")
+
+    def test_unknown_group_returns_none(self):
+        self.assertIsNone(self.pool.pick("+1", "knitting", "schmidt"))
+
+    def test_batch_generation_fills_pools_first(self):
+        batches = []
+
+        def generate_batch(interests, personality):
+            batches.append((list(interests), personality))
+            return [f"batched {i} {x}" for i, x in enumerate(interests)]
+
+        pool = MessagePool(os.path.join(self.tmp.name, "batched.db"), lambda interests, personality: "single",
+                           pool_size=2, clock=self.clock, generate_batch=generate_batch)
+        stats = pool.precompute([("chess", "schmidt"), ("running", "schmidt")])
+
+        self.assertEqual(stats["generated"], 4)
+        self.assertEqual(batches, [(["chess", "chess", "running", "running"], "schmidt")])
+
+
+if __name__ == '__main__':
+    unittest.main()
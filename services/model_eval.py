@@ -0,0 +1,255 @@
+import argparse
+import datetime
+import json
+import os
+import re
+import time
+
+from constants.action_types import ActionType
+from services.stats import percentile
+
+
+# What Does this module do?
+# Scores AIModel's tasks against a labeled fixture set, so a faster model, prompt or local
+# shortcut can be compared with the current setup before it ships
+#   - Reports accuracy, JSON validity (tasks that answer in JSON), fallback rate (answers the
+#     app can't use and replaces with a default), error rate and latency percentiles per task
+#   - Runners: "grok" (the production path), "openai" (choose_tag/choose_title through OpenAI)
+#     and "local" (no network; cheap heuristics, the bar any LLM path has to beat)
+#   - Several runners, and a saved baseline report, are printed side by side:
+#     python -m services.model_eval --runner grok --runner local --output grok.json
+#     python -m services.model_eval --runner grok --model grok-3-mini --baseline grok.json
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(__file__), "model_eval_fixtures.jsonl")
+TASKS = ("choose_tag", "choose_title", "choose_action_type", "parse_calendar_events")
+RUNNERS = ("grok", "openai", "local")
+
+
+def load_fixtures(path: str = DEFAULT_FIXTURES, tasks: tuple = None) -> list:
+    """Fixture cases: {"task", "input", "expected"}, optionally only for some tasks"""
+    with open(path) as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+    unknown = sorted({case["task"] for case in cases} - set(TASKS))
+    if unknown:
+        raise ValueError(f"Unknown tasks in {path}: {', '.join(unknown)}")
+    return [case for case in cases if tasks is None or case["task"] in tasks]
+
+
+class LocalModel:
+    """
+    Keyword heuristics with AIModel's task methods; answers instantly, never calls out.
+    There is no local calendar parser, so parse_calendar_events cases are skipped
+    """
+
+    QUESTION = re.compile(r"^(what|when|how|did|do|have|which|who|where|why)\b|\?\s*$", re.I)
+    SCHEDULE = re.compile(
+        r"\b(\d{1,2}(:\d\d)?\s*(am|pm)|noon|tonight|tomorrow|monday|tuesday|wednesday|thursday|friday|"
+        r"saturday|sunday|weekday|remind me|calendar|appointment)\b", re.I)
+
+    def choose_tag(self, user_input: str, tags: list[str]):
+        words = {word[:4] for word in re.findall(r"[a-z]+", user_input.lower()) if len(word) >= 4}
+        for tag in tags:
+            if tag.lower()[:4] in words:
+                return tag
+        return None
+
+    def choose_title(self, user_input: str):
+        return " ".join(user_input.split()[:3])[:20]
+
+    def choose_action_type(self, user_input: str, options: dict = None) -> ActionType:
+        if self.QUESTION.search(user_input):
+            action_type = ActionType.NOTION_QUERY
+        elif self.SCHEDULE.search(user_input):
+            action_type = ActionType.CALENDAR
+        else:
+            action_type = ActionType.NOTION
+        return action_type if options is None or action_type in options else ActionType.ERROR
+
+
+def build_runner(name: str, model: str = None):
+    """The object whose task methods are scored; `model` overrides the configured model name"""
+    if name == "local":
+        return LocalModel()
+    from ai_model import AIModel
+    runner = AIModel()
+    if name == "openai":
+        runner.use_grok = False
+        runner.model = model or runner.model
+    elif name == "grok":
+        runner.grok_model = model or runner.grok_model
+    else:
+        raise ValueError(f"Unknown runner: {name}")
+    return runner
+
+
+def _clean(answer) -> str:
+    return str(answer or "").strip().strip('"\'.` ').lower()
+
+
+def _calendar_matches(events: list, expected: list) -> bool:
+    if len(events) != len(expected):
+        return False
+    for want in expected:
+        if not any(
+            want["summary_contains"].lower() in event["summary"].lower()
+            and event["start_datetime"].strftime("%H:%M") == want["start"]
+            and ("end" not in want or event["end_datetime"].strftime("%H:%M") == want["end"])
+            and ("weekly_days" not in want
+                 or [re.sub(r";(UNTIL|COUNT)=[^;]*", "", rule) for rule in event.get("recurrence", [])]
+                 == [f"RRULE:FREQ=WEEKLY;BYDAY={','.join(want['weekly_days'])}"])
+            for event in events
+        ):
+            return False
+    return True
+
+
+def score_case(runner, case: dict, raw_responses: list, action_options: dict) -> dict:
+    """
+    Run one case: {"correct", "json_valid", "fallback"}; json_valid/fallback are None where
+    they don't apply. Exceptions from the runner propagate
+    """
+    task, given, expected = case["task"], case["input"], case["expected"]
+    if task == "choose_tag":
+        answer = _clean(runner.choose_tag(given["text"], given["tags"]))
+        return {"correct": answer == expected.lower(), "json_valid": None,
+                "fallback": answer not in {tag.lower() for tag in given["tags"]}}
+
+    if task == "choose_title":
+        answer = _clean(runner.choose_title(given["text"]))
+        today = datetime.date.today().isoformat()
+        keywords = [keyword.replace("{today}", today).lower() for keyword in expected]
+        return {"correct": any(keyword in answer for keyword in keywords), "json_valid": None, "fallback": not answer}
+
+    if task == "choose_action_type":
+        action_type = runner.choose_action_type(given["text"], action_options)
+        return {"correct": action_type.name == expected, "json_valid": None,
+                "fallback": action_type == ActionType.ERROR}
+
+    events = runner.parse_calendar_events(given["text"])
+    json_valid = None
+    if raw_responses and hasattr(runner, "_parse_calendar_response"):
+        try:
+            runner._parse_calendar_response(raw_responses[-1])
+            json_valid = True
+        except (json.JSONDecodeError, ValueError, KeyError, TypeError):
+            json_valid = False
+    return {"correct": _calendar_matches(events, expected), "json_valid": json_valid,
+            "fallback": None if json_valid is None else not json_valid}
+
+
+def _rate(values: list):
+    values = [value for value in values if value is not None]
+    return sum(values) / len(values) if values else None
+
+
+def summarize_task(results: list) -> dict:
+    latencies = sorted(result["latency"] for result in results)
+    return {
+        "cases": len(results),
+        "accuracy": _rate([result.get("correct", False) for result in results]),
+        "json_valid_rate": _rate([result.get("json_valid") for result in results]),
+        "fallback_rate": _rate([result.get("fallback") for result in results]),
+        "error_rate": _rate([result.get("error") is not None for result in results]),
+        "p50": percentile(latencies, 0.50),
+        "p90": percentile(latencies, 0.90),
+        "p99": percentile(latencies, 0.99),
+    }
+
+
+def evaluate(runner, cases: list, action_options: dict = None, clock=time.perf_counter) -> dict:
+    """
+    Score `runner` on every case
+
+    Args:
+        runner: An AIModel, LocalModel or anything with the same task methods
+        cases: From load_fixtures
+        action_options: Passed to choose_action_type (default: the registered handlers')
+        clock: Time source for latencies
+
+    Returns:
+        dict: task -> summarize_task() output; tasks the runner has no method for are left out
+    """
+    if action_options is None:
+        from handlers.registry import ACTION_HANDLERS
+        action_options = ACTION_HANDLERS.options()
+
+    # Keep the raw LLM answers, for JSON validity
+    raw_responses = []
+    call_llm = getattr(runner, "_call_grok_api", None)
+    patched_instance = "_call_grok_api" in vars(runner)
+    if call_llm is not None:
+        def recording_call(*args, **kwargs):
+            raw_responses.append(call_llm(*args, **kwargs))
+            return raw_responses[-1]
+        runner._call_grok_api = recording_call
+
+    results = {}
+    try:
+        for case in cases:
+            if not hasattr(runner, case["task"]):
+                continue
+            raw_responses.clear()
+            started = clock()
+            try:
+                result = score_case(runner, case, raw_responses, action_options)
+            except Exception as e:
+                result = {"error": str(e)}
+            result["latency"] = clock() - started
+            results.setdefault(case["task"], []).append(result)
+    finally:
+        if patched_instance:
+            runner._call_grok_api = call_llm
+        elif call_llm is not None:
+            del runner._call_grok_api
+    return {task: summarize_task(task_results) for task, task_results in results.items()}
+
+
+def format_report(reports: dict) -> str:
+    """Side-by-side table of {label: evaluate() output}"""
+    def cell(value, fmt):
+        return "-" if value is None else format(value, fmt)
+
+    labels = list(reports)
+    lines = [f"{'task':<24}{'metric':<12}" + "".join(f"{label:>16}" for label in labels)]
+    metrics = [("accuracy", ".1%"), ("json_valid_rate", ".1%"), ("fallback_rate", ".1%"),
+               ("error_rate", ".1%"), ("p50", ".3f"), ("p90", ".3f"), ("p99", ".3f")]
+    for task in TASKS:
+        if not any(task in report for report in reports.values()):
+            continue
+        for metric, fmt in metrics:
+            values = [reports[label].get(task, {}).get(metric) for label in labels]
+            if all(value is None for value in values):
+                continue
+            name = metric.replace("_rate", "") + (" (s)" if metric.startswith("p") else "")
+            lines.append(f"{task:<24}{name:<12}" + "".join(f"{cell(value, fmt):>16}" for value in values))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score AIModel tasks against labeled fixtures")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    parser.add_argument("--runner", action="append", choices=RUNNERS, help="Repeat to compare runners (default: grok)")
+    parser.add_argument("--model", help="Model name for the grok/openai runners, instead of the configured one")
+    parser.add_argument("--task", action="append", choices=TASKS, help="Only these tasks (default: all)")
+    parser.add_argument("--baseline", help="A report saved with --output, shown alongside")
+    parser.add_argument("--output", help="Save the report (the first runner's) as JSON")
+    args = parser.parse_args(argv)
+
+    cases = load_fixtures(args.fixtures, tuple(args.task) if args.task else None)
+    reports = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            reports["baseline"] = json.load(f)
+    for name in args.runner or ["grok"]:
+        label = f"{name}:{args.model}" if args.model and name != "local" else name
+        reports[label] = evaluate(build_runner(name, args.model), cases)
+
+    print(format_report(reports))
+    if args.output:
+        first = next(label for label in reports if label != "baseline")
+        with open(args.output, "w") as f:
+            json.dump(reports[first], f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
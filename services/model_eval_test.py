@@ -0,0 +1,70 @@
+import json
+import os
+import unittest
+from unittest.mock import patch
+from ai_model import AIModel
+from constants.action_types import ActionType
+from services.model_eval import LocalModel, evaluate, format_report, load_fixtures
+from testing.fake_clock import FakeClock
+
+
+class TestModelEval(unittest.TestCase):
+    def setUp(self):
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
+            self.ai_model = AIModel()
+        self.options = {ActionType.NOTION: "Save a note", ActionType.CALENDAR: "Add an event"}
+
+    def test_fixtures_load(self):
+        cases = load_fixtures()
+        self.assertEqual({case["task"] for case in cases},
+                         {"choose_tag", "choose_title", "choose_action_type", "parse_calendar_events"})
+        self.assertTrue(all(case["task"] == "choose_tag" for case in load_fixtures(tasks=("choose_tag",))))
+
+    def test_scores_answers_and_fallbacks(self):
+        cases = [
+            {"task": "choose_tag", "input": {"text": "ran", "tags": ["Health", "Work"]}, "expected": "Health"},
+            {"task": "choose_tag", "input": {"text": "met", "tags": ["Health", "Work"]}, "expected": "Work"},
+            {"task": "choose_action_type", "input": {"text": "dentist at 2"}, "expected": "CALENDAR"},
+        ]
+        answers = iter(["Health", "I'd say Work", "CALENDAR"])
+        with patch.object(self.ai_model, "_call_grok_api", side_effect=lambda *args, **kwargs: next(answers)):
+            report = evaluate(self.ai_model, cases, self.options, clock=FakeClock(0.0, step=0.5))
+            # The harness puts the model's own call back afterwards
+            self.assertEqual(self.ai_model._call_grok_api.call_count, 3)
+
+        self.assertEqual(report["choose_tag"]["accuracy"], 0.5)
+        self.assertEqual(report["choose_tag"]["fallback_rate"], 0.5)
+        self.assertIsNone(report["choose_tag"]["json_valid_rate"])
+        self.assertEqual(report["choose_tag"]["p50"], 0.5)
+        self.assertEqual(report["choose_action_type"]["accuracy"], 1.0)
+
+    def test_calendar_json_validity(self):
+        cases = [{"task": "parse_calendar_events", "input": {"text": "gym mon wed 7am"},
+                  "expected": [{"summary_contains": "gym", "start": "07:00", "weekly_days": ["MO", "WE"]}]}] * 2
+        valid = json.dumps([{"summary": "Gym", "start_datetime": "2025-11-24T07:00:00",
+                             "end_datetime": "2025-11-24T08:00:00", "weekly_days": ["WE", "MO"]}])
+        answers = iter([valid, "Sure! Gym is at 7."])
+        with patch.object(self.ai_model, "_call_grok_api", side_effect=lambda *args, **kwargs: next(answers)):
+            report = evaluate(self.ai_model, cases, self.options)["parse_calendar_events"]
+
+        self.assertEqual(report["accuracy"], 0.5)
+        self.assertEqual(report["json_valid_rate"], 0.5)
+        self.assertEqual(report["fallback_rate"], 0.5)
+
+    def test_errors_are_counted_and_unsupported_tasks_skipped(self):
+        cases = [
+            {"task": "choose_action_type", "input": {"text": "hi"}, "expected": "NOTION"},
+            {"task": "parse_calendar_events", "input": {"text": "gym at 7"}, "expected": []},
+        ]
+        with patch.object(self.ai_model, "_call_grok_api", side_effect=RuntimeError("timeout")):
+            report = evaluate(self.ai_model, cases[:1], self.options)
+        self.assertEqual(report["choose_action_type"]["error_rate"], 1.0)
+        self.assertEqual(report["choose_action_type"]["accuracy"], 0.0)
+
+        report = evaluate(LocalModel(), cases, self.options)
+        self.assertEqual(list(report), ["choose_action_type"])
+        self.assertIn("choose_action_type", format_report({"local": report, "baseline": {}}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,347 @@
+import datetime
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from api_interaction.notion_api import page_owner
+from services.priority_scheduler import prioritized, BULK
+
+
+# What Does this module do?
+# Local full-text index over each user's Notion notes (SQLite FTS5, BM25 ranking)
+#   - Notes we write are indexed as soon as the write queue finishes them
+#   - sync_from_notion catches up on edits made in Notion, by last_edited_time. The database
+#     is shared, so only pages whose owner property is the user's phone number are indexed
+#     for them, and a page never changes owner in the index
+#   - NoteSyncer runs those syncs in the background, at most once per user per few minutes,
+#     within the Notion write queue's per-integration rate limit
+#   - search() answers "query my notes" with top-k snippets, filtered by tags and dates
+#   - tag_counts() tells how often a user has used each tag, for the tag shortlist
+#   - The index file (NOTE_INDEX_PATH) must be on storage shared by every instance, or notes
+#     written through one instance can't be found from another and a redeploy starts empty
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    page_id TEXT NOT NULL UNIQUE,
+    phone_number TEXT NOT NULL,
+    title TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS notes_by_user ON notes (phone_number, created_ts);
+CREATE TABLE IF NOT EXISTS note_tags (
+    note_id INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (note_id, tag)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+    title, content, tags, tokenize = 'porter unicode61'
+);
+CREATE TABLE IF NOT EXISTS note_sync_state (
+    phone_number TEXT PRIMARY KEY,
+    last_edited_time TEXT,
+    synced_at REAL NOT NULL
+);
+"""
+
+# Column weights for bm25(): title, content, tags
+BM25_WEIGHTS = (3.0, 1.0, 2.0)
+
+STOPWORDS = {
+    "a", "an", "and", "are", "did", "do", "does", "for", "from", "how", "i", "in", "is", "it",
+    "me", "my", "of", "on", "or", "the", "to", "was", "what", "when", "where", "which", "who", "why",
+}
+
+
+def _match_expression(query: str):
+    """Turn free text into an FTS5 expression that matches any of its terms"""
+    terms = [term for term in re.findall(r"\w+", query.lower()) if term not in STOPWORDS]
+    if not terms:
+        return None
+    return " OR ".join(f'"{term}"' for term in dict.fromkeys(terms))
+
+
+def _iso_to_timestamp(value: str) -> float:
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+class NoteIndex:
+    def __init__(self, db_path: str = "note_index.db", clock=time.time):
+        """
+        Args:
+            db_path: SQLite file holding the index
+            clock: Time source for sync times, injectable for tests
+        """
+        self.db_path = db_path
+        self.clock = clock
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def upsert_note(self, phone_number: str, page_id: str, title: str, content: str,
+                    tags: list = (), created_ts: float = None):
+        """Add a note, or replace the indexed copy of an existing one"""
+        created_ts = time.time() if created_ts is None else created_ts
+        with self._connect() as conn:
+            self._write(conn, phone_number, page_id, title, content, list(tags), created_ts)
+
+    def append_to_note(self, phone_number: str, page_id: str, title: str, contents: list,
+                       tags: list = (), created_ts: float = None):
+        """Add lines to an indexed note, creating it if needed (daily-log pages)"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT content, created_ts FROM notes WHERE page_id = ?", (page_id,)).fetchone()
+            if row:
+                content = "\n".join([row[0], *contents]) if row[0] else "\n".join(contents)
+                created_ts = row[1]
+            else:
+                content = "\n".join(contents)
+                created_ts = time.time() if created_ts is None else created_ts
+            self._write(conn, phone_number, page_id, title, content, list(tags), created_ts)
+
+    def _write(self, conn, phone_number, page_id, title, content, tags, created_ts):
+        row = conn.execute("SELECT id, phone_number FROM notes WHERE page_id = ?", (page_id,)).fetchone()
+        if row and row[1] != phone_number:
+            logging.warning(f"Not indexing page {page_id} for {phone_number}: it belongs to {row[1]}")
+            return
+        if row:
+            note_id = row[0]
+            conn.execute(
+                "UPDATE notes SET title = ?, tags = ?, content = ?, created_ts = ? WHERE id = ?",
+                (title, json.dumps(tags), content, created_ts, note_id)
+            )
+            conn.execute("DELETE FROM notes_fts WHERE rowid = ?", (note_id,))
+            conn.execute("DELETE FROM note_tags WHERE note_id = ?", (note_id,))
+        else:
+            note_id = conn.execute(
+                "INSERT INTO notes (page_id, phone_number, title, tags, content, created_ts) VALUES (?, ?, ?, ?, ?, ?)",
+                (page_id, phone_number, title, json.dumps(tags), content, created_ts)
+            ).lastrowid
+
+        conn.execute(
+            "INSERT INTO notes_fts (rowid, title, content, tags) VALUES (?, ?, ?, ?)",
+            (note_id, title, content, " ".join(tags))
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO note_tags (note_id, tag) VALUES (?, ?)",
+            [(note_id, tag) for tag in tags]
+        )
+
+    def delete_note(self, page_id: str, phone_number: str = None):
+        """Drop a note from the index; with `phone_number`, only if it is theirs"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT id FROM notes WHERE page_id = ? AND phone_number = COALESCE(?, phone_number)",
+                               (page_id, phone_number)).fetchone()
+            if row:
+                conn.execute("DELETE FROM notes_fts WHERE rowid = ?", (row[0],))
+                conn.execute("DELETE FROM note_tags WHERE note_id = ?", (row[0],))
+                conn.execute("DELETE FROM notes WHERE id = ?", (row[0],))
+
+    def tag_counts(self, phone_number: str) -> dict:
+        """Tag -> number of the user's indexed notes carrying it"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT t.tag, COUNT(*) FROM note_tags t JOIN notes n ON n.id = t.note_id "
+                "WHERE n.phone_number = ? GROUP BY t.tag",
+                (phone_number,),
+            ).fetchall()
+        return dict(rows)
+
+    def search(self, phone_number: str, query: str, k: int = 5, tags: list = None,
+               since: float = None, until: float = None) -> list:
+        """
+        Top-k notes for a question, best match first
+
+        Args:
+            phone_number: Whose notes to search
+            query: Free text; punctuation and common words are ignored
+            k: Number of results
+            tags: Only notes with at least one of these tags
+            since: Only notes created at or after this timestamp
+            until: Only notes created before this timestamp
+
+        Returns:
+            list: Dicts with page_id, title, tags, created_ts, snippet and score
+        """
+        expression = _match_expression(query)
+        if expression is None:
+            return []
+
+        sql = (
+            "SELECT n.page_id, n.title, n.tags, n.created_ts, "
+            "snippet(notes_fts, 1, '', '', '…', 32), bm25(notes_fts, ?, ?, ?) AS score "
+            "FROM notes_fts JOIN notes AS n ON n.id = notes_fts.rowid "
+            "WHERE notes_fts MATCH ? AND n.phone_number = ?"
+        )
+        args = [*BM25_WEIGHTS, expression, phone_number]
+        if tags:
+            placeholders = ", ".join("?" for _ in tags)
+            sql += f" AND EXISTS (SELECT 1 FROM note_tags t WHERE t.note_id = n.id AND t.tag IN ({placeholders}))"
+            args.extend(tags)
+        if since is not None:
+            sql += " AND n.created_ts >= ?"
+            args.append(since)
+        if until is not None:
+            sql += " AND n.created_ts < ?"
+            args.append(until)
+        sql += " ORDER BY score LIMIT ?"
+        args.append(k)
+
+        with self._connect() as conn:
+            rows = conn.execute(sql, args).fetchall()
+
+        return [
+            {
+                "page_id": page_id,
+                "title": title,
+                "tags": json.loads(tags_json),
+                "created_ts": created_ts,
+                "snippet": snippet,
+                # bm25() is lower-is-better; flip it so callers can treat it as a score
+                "score": -score
+            }
+            for page_id, title, tags_json, created_ts, snippet, score in rows
+        ]
+
+    def get_notes(self, page_ids: list, snippet_length: int = 200) -> list:
+        """Indexed notes by page ID, in the order given, with the start of their content as snippet"""
+        if not page_ids:
+            return []
+        placeholders = ", ".join("?" for _ in page_ids)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT page_id, title, tags, created_ts, content FROM notes WHERE page_id IN ({placeholders})",
+                page_ids
+            ).fetchall()
+
+        by_id = {
+            page_id: {
+                "page_id": page_id,
+                "title": title,
+                "tags": json.loads(tags_json),
+                "created_ts": created_ts,
+                "snippet": content[:snippet_length]
+            }
+            for page_id, title, tags_json, created_ts, content in rows
+        }
+        return [by_id[page_id] for page_id in page_ids if page_id in by_id]
+
+    def synced_at(self, phone_number: str):
+        """When the user's last sync_from_notion finished, or None if it never ran"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT synced_at FROM note_sync_state WHERE phone_number = ?", (phone_number,)).fetchone()
+        return row[0] if row else None
+
+    def sync_from_notion(self, phone_number: str, notion_api, acquire=None) -> int:
+        """
+        Index pages edited in Notion since the last sync
+
+        Args:
+            phone_number: Whose pages to sync
+            notion_api: NotionAPI for the user's integration
+            acquire: Optional callable (requests) that blocks until that many Notion requests may be sent
+
+        Returns:
+            int: Number of pages (re)indexed
+        """
+        acquire = acquire or (lambda requests: None)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT last_edited_time FROM note_sync_state WHERE phone_number = ?", (phone_number,)
+            ).fetchone()
+        since = row[0] if row else None
+
+        acquire(2)  # databases.retrieve + data_sources.query
+        pages = notion_api.query_pages_edited_since(since, owner=phone_number)
+        latest = since
+        for page in pages:
+            latest = page["last_edited_time"] if latest is None else max(latest, page["last_edited_time"])
+            if page_owner(page) != phone_number:
+                continue
+            if page.get("archived") or page.get("in_trash"):
+                self.delete_note(page["id"], phone_number)
+            else:
+                properties = page.get("properties", {})
+                title = "".join(part.get("plain_text", "") for part in properties.get("Name", {}).get("title", []))
+                tags = [option["name"] for option in properties.get("Tags", {}).get("multi_select", [])]
+                acquire(1)
+                self.upsert_note(
+                    phone_number, page["id"], title, notion_api.get_page_text(page["id"]),
+                    tags, _iso_to_timestamp(page["created_time"])
+                )
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO note_sync_state (phone_number, last_edited_time, synced_at) VALUES (?, ?, ?)",
+                (phone_number, latest, self.clock())
+            )
+
+        logging.info(f"Indexed {len(pages)} Notion pages for {phone_number}")
+        return len(pages)
+
+    def record_write(self, phone_number: str, operation: str, written: dict):
+        """NotionWriteQueue on_written hook: index what was just written"""
+        if operation == "append_daily_log":
+            self.append_to_note(phone_number, written["page_id"], written["title"], written["contents"], written["tags"])
+        else:
+            self.upsert_note(phone_number, written["page_id"], written["title"],
+                             "\n".join(written["contents"]), written["tags"])
+
+
+class NoteSyncer:
+    """
+    Keeps users' note indexes caught up with Notion off the request path
+
+    Questions are answered from the local index straight away; request() starts
+    a background sync_from_notion for the user unless one is already running or
+    the last one finished less than `max_age` seconds ago.
+    """
+
+    def __init__(self, note_index: NoteIndex, notion_api_factory, acquire=None, max_age: float = 300.0,
+                 workers: int = 2):
+        """
+        Args:
+            note_index: Index to sync into
+            notion_api_factory: Callable (notion_api_key, database_id) -> NotionAPI
+            acquire: Optional callable (notion_api_key, requests) that blocks until the integration
+                     may send that many requests, e.g. NotionWriteQueue.acquire
+            max_age: Seconds a user's index is considered fresh after a sync
+            workers: Syncs run at once
+        """
+        self.note_index = note_index
+        self.notion_api_factory = notion_api_factory
+        self.acquire = acquire
+        self.max_age = max_age
+        self.running = set()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="note-sync")
+
+    def request(self, phone_number: str, notion_api_key: str, database_id: str) -> bool:
+        """Start a background sync if the user's index is stale. Returns whether one was started"""
+        synced_at = self.note_index.synced_at(phone_number)
+        if synced_at is not None and self.note_index.clock() - synced_at < self.max_age:
+            return False
+        with self.lock:
+            if phone_number in self.running:
+                return False
+            self.running.add(phone_number)
+        self.executor.submit(self._sync, phone_number, notion_api_key, database_id)
+        return True
+
+    @prioritized(BULK)
+    def _sync(self, phone_number, notion_api_key, database_id):
+        try:
+            acquire = (lambda requests: self.acquire(notion_api_key, requests)) if self.acquire else None
+            self.note_index.sync_from_notion(phone_number, self.notion_api_factory(notion_api_key, database_id), acquire)
+        except Exception as e:
+            logging.error(f"Error syncing notes for {phone_number}: {e}")
+        finally:
+            with self.lock:
+                self.running.discard(phone_number)
@@ -0,0 +1,145 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+from services.note_index import NoteIndex, NoteSyncer
+from testing.fake_clock import FakeClock
+
+
+class TestNoteIndex(unittest.TestCase):
+    """Test suite for NoteIndex"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index = NoteIndex(os.path.join(self.tmp.name, "notes.db"))
+        self.index.upsert_note("+1555", "p1", "Morning run", "Ran 5k along the river, knees felt sore", ["Fitness"], 1000)
+        self.index.upsert_note("+1555", "p2", "Burnout", "Felt burnt out after the deadline, skipped the gym", ["Mood"], 2000)
+        self.index.upsert_note("+1555", "p3", "Groceries", "Bought oats and bananas", ["Errands"], 3000)
+        self.index.upsert_note("+1999", "p4", "Other user", "Ran a marathon", ["Fitness"], 1500)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_ranks_matches_and_scopes_to_user(self):
+        """Only the asking user's notes come back, best match first"""
+        results = self.index.search("+1555", "When did I last run?")
+        self.assertEqual([r["page_id"] for r in results], ["p1"])
+
+        results = self.index.search("+1555", "when did I feel burnt out?")
+        self.assertEqual(results[0]["page_id"], "p2")
+        self.assertIn("burnt", results[0]["snippet"])
+
+    def test_tag_and_date_filters(self):
+        """Tag and creation-time filters narrow the results"""
+        self.assertEqual(self.index.search("+1555", "gym run", tags=["Mood"])[0]["page_id"], "p2")
+        self.assertEqual([r["page_id"] for r in self.index.search("+1555", "gym run", since=1500)], ["p2"])
+        self.assertEqual(self.index.search("+1555", "gym run", until=1500)[0]["page_id"], "p1")
+
+    def test_upsert_replaces_and_append_extends(self):
+        """Re-indexing replaces the old text; appends add lines to a daily page"""
+        self.index.upsert_note("+1555", "p3", "Groceries", "Bought rice", ["Errands"], 3000)
+        self.assertEqual(self.index.search("+1555", "oats"), [])
+
+        self.index.append_to_note("+1555", "day", "2025-11-24", ["meditated 10 min"], ["Daily Log"])
+        self.index.append_to_note("+1555", "day", "2025-11-24", ["journaled"], ["Daily Log"])
+        self.assertEqual(self.index.search("+1555", "meditated journaled")[0]["page_id"], "day")
+
+    def test_tag_counts_are_per_user(self):
+        self.index.upsert_note("+1555", "p5", "Swim", "Swam 20 laps", ["Fitness", "Mood"], 4000)
+        self.assertEqual(self.index.tag_counts("+1555"), {"Fitness": 2, "Mood": 2, "Errands": 1})
+        self.assertEqual(self.index.tag_counts("+1000"), {})
+
+    def test_punctuation_only_query(self):
+        self.assertEqual(self.index.search("+1555", "???"), [])
+
+    def page(self, page_id, owner, title="Sleep", edited="2025-11-24T11:00:00.000Z"):
+        return {
+            "id": page_id,
+            "created_time": "2025-11-24T10:00:00.000Z",
+            "last_edited_time": edited,
+            "properties": {
+                "Name": {"title": [{"plain_text": title}]},
+                "Tags": {"multi_select": [{"name": "Health"}]},
+                "Phone": {"phone_number": owner}
+            }
+        }
+
+    def test_sync_from_notion_uses_watermark(self):
+        """Pages edited in Notion are indexed and the last edit time is remembered"""
+        notion_api = Mock()
+        notion_api.query_pages_edited_since.return_value = [self.page("p9", "+1555")]
+        notion_api.get_page_text.return_value = "Slept nine hours"
+
+        self.assertEqual(self.index.sync_from_notion("+1555", notion_api), 1)
+        self.assertEqual(self.index.search("+1555", "slept")[0]["tags"], ["Health"])
+        notion_api.query_pages_edited_since.assert_called_with(None, owner="+1555")
+
+        notion_api.query_pages_edited_since.return_value = []
+        self.index.sync_from_notion("+1555", notion_api)
+        notion_api.query_pages_edited_since.assert_called_with("2025-11-24T11:00:00.000Z", owner="+1555")
+
+    def test_sync_only_indexes_the_askers_pages(self):
+        """Pages of other users in the shared database are neither indexed nor taken over"""
+        notion_api = Mock()
+        notion_api.query_pages_edited_since.return_value = [
+            self.page("p8", "+1999", title="Their diary"),
+            self.page("p4", "+1555", title="Marathon"),
+            self.page("p10", None, title="Nobody's"),
+        ]
+        notion_api.get_page_text.return_value = "Ran a marathon, wrote in the diary"
+
+        self.index.sync_from_notion("+1555", notion_api)
+
+        self.assertEqual(self.index.search("+1555", "diary marathon"), [])
+        self.assertEqual([r["page_id"] for r in self.index.search("+1999", "marathon")], ["p4"])
+        self.assertEqual(self.index.search("+1999", "marathon")[0]["title"], "Other user")
+
+
+class TestNoteSyncer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.clock = FakeClock()
+        self.index = NoteIndex(os.path.join(self.tmp.name, "notes.db"), clock=self.clock)
+        self.notion_api = Mock()
+        self.notion_api.query_pages_edited_since.return_value = [{
+            "id": "p1",
+            "created_time": "2025-11-24T10:00:00.000Z",
+            "last_edited_time": "2025-11-24T11:00:00.000Z",
+            "properties": {"Name": {"title": [{"plain_text": "Sleep"}]}, "Phone": {"phone_number": "+1555"}}
+        }]
+        self.notion_api.get_page_text.return_value = "Slept nine hours"
+        self.factory = Mock(return_value=self.notion_api)
+        self.acquire = Mock(return_value=True)
+        self.syncer = NoteSyncer(self.index, self.factory, acquire=self.acquire, max_age=300, workers=1)
+
+    def tearDown(self):
+        self.syncer.executor.shutdown(wait=True)
+        self.tmp.cleanup()
+
+    def wait(self):
+        self.syncer.executor.submit(lambda: None).result()
+
+    def test_syncs_in_background_within_the_rate_limit(self):
+        """A stale index is synced off the caller's thread, charging the integration's bucket"""
+        self.assertTrue(self.syncer.request("+1555", "key-a", "db"))
+        self.wait()
+        self.factory.assert_called_once_with("key-a", "db")
+        self.assertEqual(self.index.search("+1555", "slept")[0]["page_id"], "p1")
+        self.assertEqual(sum(call.args[1] for call in self.acquire.call_args_list), 3)
+        self.assertTrue(all(call.args[0] == "key-a" for call in self.acquire.call_args_list))
+
+    def test_fresh_index_is_not_synced_again(self):
+        """Questions within max_age of a sync answer from the index without calling Notion"""
+        self.syncer.request("+1555", "key-a", "db")
+        self.wait()
+        self.clock.now += 60
+        self.assertFalse(self.syncer.request("+1555", "key-a", "db"))
+        self.clock.now += 300
+        self.assertTrue(self.syncer.request("+1555", "key-a", "db"))
+        self.wait()
+        self.assertEqual(self.factory.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
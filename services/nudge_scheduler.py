@@ -0,0 +1,324 @@
+import datetime
+import heapq
+import itertools
+import logging
+import threading
+import time
+import uuid
+from zoneinfo import ZoneInfo
+
+
+# What Does this module do?
+# Repeats messages until the user responds ("nudges")
+#   - One pending nudge per user, kept in a min-heap ordered by fire time
+#   - schedule() is O(log n); cancel() is O(1) and leaves a stale heap entry
+#     that is skipped when popped (the heap is compacted when stale entries pile up)
+#   - Quiet hours push a fire time to the end of the user's quiet window
+#   - Due nudges are handed to the sender in batches
+#   - Pending nudges are also kept in a store shared by every instance (Firestore in
+#     production), so a reply handled anywhere cancels the nudge and restarts lose nothing;
+#     before sending, an instance claims the nudge so only one of them sends it
+
+
+class Nudge:
+    __slots__ = ("phone_number", "fire_at", "sent", "max_nudges", "interval", "quiet_hours", "timezone", "payload", "generation")
+
+    def __init__(self, phone_number, fire_at, max_nudges, interval, quiet_hours, timezone, payload, generation):
+        self.phone_number = phone_number
+        self.fire_at = fire_at
+        self.sent = 0
+        self.max_nudges = max_nudges
+        self.interval = interval
+        self.quiet_hours = quiet_hours
+        self.timezone = timezone
+        self.payload = payload
+        self.generation = generation
+
+    def to_record(self) -> dict:
+        """Plain fields for the nudge store"""
+        record = {name: getattr(self, name) for name in self.__slots__}
+        record["quiet_hours"] = list(self.quiet_hours) if self.quiet_hours else None
+        return record
+
+    @classmethod
+    def from_record(cls, record: dict):
+        quiet_hours = record.get("quiet_hours")
+        nudge = cls(record["phone_number"], record["fire_at"], record["max_nudges"], record["interval"],
+                    tuple(quiet_hours) if quiet_hours else None, record["timezone"],
+                    record.get("payload") or {}, record["generation"])
+        nudge.sent = record.get("sent", 0)
+        return nudge
+
+
+class MemoryNudgeStore:
+    """Pending nudges for a single instance / tests"""
+
+    def __init__(self):
+        self.records = {}
+        self.lock = threading.Lock()
+
+    def put(self, record: dict):
+        with self.lock:
+            self.records[record["phone_number"]] = dict(record)
+
+    def delete(self, phone_number: str) -> bool:
+        with self.lock:
+            return self.records.pop(phone_number, None) is not None
+
+    def replace(self, phone_number: str, generation: str, record) -> bool:
+        """Swap in `record` (or delete when None) only if the stored nudge is still `generation`"""
+        with self.lock:
+            current = self.records.get(phone_number)
+            if current is None or current["generation"] != generation:
+                return False
+            if record is None:
+                del self.records[phone_number]
+            else:
+                self.records[phone_number] = dict(record)
+            return True
+
+    def all(self) -> list:
+        with self.lock:
+            return [dict(record) for record in self.records.values()]
+
+
+class FirestoreNudgeStore:
+    """Pending nudges shared by every instance, one document per phone number"""
+
+    def __init__(self, db, collection: str = "nudges"):
+        self.db = db
+        self.collection_ref = db.collection(collection)
+
+    def put(self, record: dict):
+        self.collection_ref.document(record["phone_number"]).set(record)
+
+    def delete(self, phone_number: str) -> bool:
+        doc_ref = self.collection_ref.document(phone_number)
+        if not doc_ref.get().exists:
+            return False
+        doc_ref.delete()
+        return True
+
+    def replace(self, phone_number: str, generation: str, record) -> bool:
+        from firebase_admin import firestore
+
+        doc_ref = self.collection_ref.document(phone_number)
+
+        @firestore.transactional
+        def claim(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            if not snapshot.exists or snapshot.to_dict().get("generation") != generation:
+                return False
+            if record is None:
+                transaction.delete(doc_ref)
+            else:
+                transaction.set(doc_ref, record)
+            return True
+
+        return claim(self.db.transaction())
+
+    def all(self) -> list:
+        return [doc.to_dict() for doc in self.collection_ref.stream()]
+
+
+def outside_quiet_hours(fire_at: float, quiet_hours, timezone: str) -> float:
+    """
+    Move `fire_at` to the end of the quiet window if it falls inside it
+
+    Args:
+        fire_at: Epoch seconds
+        quiet_hours: (start_hour, end_hour) in local time, may wrap midnight, e.g. (22, 8)
+        timezone: User's timezone name
+    """
+    if not quiet_hours:
+        return fire_at
+    start_hour, end_hour = quiet_hours
+    local = datetime.datetime.fromtimestamp(fire_at, ZoneInfo(timezone))
+
+    if start_hour <= end_hour:
+        quiet = start_hour <= local.hour < end_hour
+    else:
+        quiet = local.hour >= start_hour or local.hour < end_hour
+    if not quiet:
+        return fire_at
+
+    wake = local.replace(hour=end_hour, minute=0, second=0, microsecond=0)
+    if wake <= local:
+        wake += datetime.timedelta(days=1)
+    return wake.timestamp()
+
+
+class NudgeScheduler:
+    def __init__(self, send_batch, interval: float = 4 * 3600, max_nudges: int = 3,
+                 batch_size: int = 100, store=None, clock=time.time):
+        """
+        Args:
+            send_batch: Callable taking a list of due Nudge objects
+            interval: Seconds between nudges to the same user
+            max_nudges: Nudges sent before giving up on a user
+            batch_size: Most nudges handed to send_batch at once
+            store: Where pending nudges are shared with other instances (default: this process only)
+            clock: Time source, injectable for tests
+        """
+        self.send_batch = send_batch
+        self.interval = interval
+        self.max_nudges = max_nudges
+        self.batch_size = batch_size
+        self.store = store or MemoryNudgeStore()
+        self.clock = clock
+
+        self.heap = []
+        # Breaks fire-time ties in scheduling order
+        self.sequence = itertools.count()
+        self.pending = {}
+        self.condition = threading.Condition()
+        self.thread = None
+        self.stopping = False
+
+    def __len__(self):
+        return len(self.pending)
+
+    def schedule(self, phone_number: str, delay: float = None, quiet_hours=None,
+                 timezone: str = 'America/Los_Angeles', max_nudges: int = None, payload: dict = None):
+        """
+        Start (or restart) nudging a user until they reply
+
+        Args:
+            phone_number: Who to nudge
+            delay: Seconds until the first nudge (default: the scheduler's interval)
+            quiet_hours: (start_hour, end_hour) local hours when nothing is sent
+            timezone: User's timezone, for quiet hours
+            max_nudges: Override the scheduler's max_nudges for this user
+            payload: Anything the sender needs; must be storable (plain dicts, strings, numbers)
+        """
+        interval = self.interval
+        fire_at = outside_quiet_hours(self.clock() + (interval if delay is None else delay), quiet_hours, timezone)
+        nudge = Nudge(phone_number, fire_at, max_nudges or self.max_nudges, interval,
+                      quiet_hours, timezone, payload or {}, uuid.uuid4().hex)
+        self.store.put(nudge.to_record())
+
+        with self.condition:
+            self.pending[phone_number] = nudge
+            self._push(nudge)
+            self.condition.notify()
+
+    def cancel(self, phone_number: str) -> bool:
+        """Stop nudging a user, e.g. because they replied. Returns True if something was pending"""
+        # The nudge may have been scheduled by (or reloaded on) another instance
+        stored = self.store.delete(phone_number)
+        with self.condition:
+            return self.pending.pop(phone_number, None) is not None or stored
+
+    def load(self) -> int:
+        """Pick up the nudges pending in the store, e.g. after a restart. Returns how many"""
+        nudges = [Nudge.from_record(record) for record in self.store.all()]
+        with self.condition:
+            for nudge in nudges:
+                self.pending[nudge.phone_number] = nudge
+                self._push(nudge)
+            self.condition.notify()
+        return len(nudges)
+
+    def _push(self, nudge: Nudge):
+        heapq.heappush(self.heap, (nudge.fire_at, next(self.sequence), nudge.generation, nudge.phone_number))
+        # Cancelled and rescheduled nudges leave stale entries behind; rebuild once they dominate
+        if len(self.heap) > 64 and len(self.heap) > 2 * len(self.pending):
+            self.heap = [entry for entry in self.heap if self._is_live(entry[2], entry[3])]
+            heapq.heapify(self.heap)
+
+    def _is_live(self, generation: str, phone_number: str) -> bool:
+        nudge = self.pending.get(phone_number)
+        return nudge is not None and nudge.generation == generation
+
+    def next_fire_time(self):
+        """When the earliest pending nudge is due, or None"""
+        with self.condition:
+            while self.heap and not self._is_live(self.heap[0][2], self.heap[0][3]):
+                heapq.heappop(self.heap)
+            return self.heap[0][0] if self.heap else None
+
+    def fire_due(self) -> int:
+        """
+        Send every nudge that is due, in batches
+
+        Returns:
+            int: Number of nudges handed to the sender
+        """
+        fired = 0
+        while True:
+            now = self.clock()
+            batch = []
+            due = []
+            with self.condition:
+                while self.heap and len(due) < self.batch_size and self.heap[0][0] <= now:
+                    _, _, generation, phone_number = heapq.heappop(self.heap)
+                    if self._is_live(generation, phone_number):
+                        due.append(self.pending[phone_number])
+
+            if not due:
+                return fired
+            batch = [nudge for nudge in due if self._claim(nudge, now)]
+            if not batch:
+                continue
+            try:
+                self.send_batch(batch)
+            except Exception as e:
+                logging.error(f"Error sending {len(batch)} nudges: {e}")
+            fired += len(batch)
+
+    def _claim(self, nudge: Nudge, now: float) -> bool:
+        """
+        Move a due nudge on to its next send in the store, or drop it after the last one
+
+        Returns False if another instance cancelled, rescheduled or already sent it
+        """
+        following = None
+        if nudge.sent + 1 < nudge.max_nudges:
+            following = Nudge(nudge.phone_number, outside_quiet_hours(now + nudge.interval, nudge.quiet_hours, nudge.timezone),
+                              nudge.max_nudges, nudge.interval, nudge.quiet_hours, nudge.timezone, nudge.payload,
+                              uuid.uuid4().hex)
+            following.sent = nudge.sent + 1
+        claimed = self.store.replace(nudge.phone_number, nudge.generation,
+                                     following.to_record() if following else None)
+
+        with self.condition:
+            # Leave it alone if it was rescheduled locally while we were claiming
+            if self._is_live(nudge.generation, nudge.phone_number):
+                if claimed and following:
+                    self.pending[nudge.phone_number] = following
+                    self._push(following)
+                else:
+                    del self.pending[nudge.phone_number]
+        if claimed:
+            nudge.sent += 1
+        return claimed
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if self.stopping:
+                    return
+                next_fire = self.next_fire_time()
+                timeout = None if next_fire is None else max(0.0, next_fire - self.clock())
+                if timeout is None or timeout > 0:
+                    # Woken early by schedule() in case the new nudge is sooner
+                    self.condition.wait(timeout)
+                    continue
+            self.fire_due()
+
+    def start(self):
+        """Load pending nudges from the store and fire them from a background thread"""
+        if self.thread:
+            return
+        self.load()
+        self.stopping = False
+        self.thread = threading.Thread(target=self._run, name="nudge-scheduler", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        if self.thread:
+            self.thread.join(timeout)
+            self.thread = None
@@ -0,0 +1,110 @@
+import datetime
+import unittest
+from zoneinfo import ZoneInfo
+from services.nudge_scheduler import MemoryNudgeStore, NudgeScheduler, outside_quiet_hours
+from testing.fake_clock import FakeClock
+
+
+def local_timestamp(hour, day=24):
+    return datetime.datetime(2025, 11, day, hour, tzinfo=ZoneInfo('America/Los_Angeles')).timestamp()
+
+
+class TestNudgeScheduler(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock(local_timestamp(12))
+        self.batches = []
+        self.scheduler = NudgeScheduler(
+            lambda nudges: self.batches.append([n.phone_number for n in nudges]),
+            interval=3600, max_nudges=2, batch_size=2, clock=self.clock
+        )
+
+    def test_fires_in_batches_and_repeats_until_max(self):
+        """Due nudges go out in batches and repeat every interval, up to max_nudges"""
+        for phone_number in ["+1", "+2", "+3"]:
+            self.scheduler.schedule(phone_number, delay=60)
+
+        self.assertEqual(self.scheduler.fire_due(), 0)
+        self.clock.now += 60
+        self.assertEqual(self.scheduler.fire_due(), 3)
+        self.assertEqual(self.batches, [["+1", "+2"], ["+3"]])
+
+        self.clock.now += 3600
+        self.scheduler.fire_due()
+        self.assertEqual(len(self.scheduler), 0)
+        self.assertIsNone(self.scheduler.next_fire_time())
+
+    def test_cancel_on_reply(self):
+        """A cancelled nudge never fires"""
+        self.scheduler.schedule("+1", delay=60)
+        self.scheduler.schedule("+2", delay=120)
+
+        self.assertTrue(self.scheduler.cancel("+1"))
+        self.assertFalse(self.scheduler.cancel("+1"))
+        self.assertEqual(self.scheduler.next_fire_time(), self.clock.now + 120)
+
+        self.clock.now += 120
+        self.scheduler.fire_due()
+        self.assertEqual(self.batches, [["+2"]])
+
+    def test_reschedule_replaces_pending_nudge(self):
+        """Scheduling again moves a user's nudge instead of adding a second one"""
+        self.scheduler.schedule("+1", delay=60)
+        self.scheduler.schedule("+1", delay=600)
+
+        self.clock.now += 60
+        self.assertEqual(self.scheduler.fire_due(), 0)
+        self.clock.now += 540
+        self.assertEqual(self.scheduler.fire_due(), 1)
+
+    def test_many_cancellations_keep_heap_small(self):
+        """Stale heap entries from cancellations are compacted away"""
+        for i in range(1000):
+            self.scheduler.schedule(f"+{i}", delay=60)
+            self.scheduler.cancel(f"+{i}")
+        self.assertLess(len(self.scheduler.heap), 130)
+
+    def test_reply_on_another_instance_cancels(self):
+        """Instances sharing a store: a cancel anywhere stops the nudge, and only one instance sends it"""
+        store = MemoryNudgeStore()
+        other_batches = []
+        first = NudgeScheduler(lambda nudges: self.batches.append([n.phone_number for n in nudges]),
+                               interval=3600, max_nudges=2, store=store, clock=self.clock)
+        second = NudgeScheduler(lambda nudges: other_batches.append([n.phone_number for n in nudges]),
+                                interval=3600, max_nudges=2, store=store, clock=self.clock)
+        first.schedule("+1", delay=60)
+        first.schedule("+2", delay=60)
+        second.load()
+
+        self.assertTrue(second.cancel("+1"))
+        self.clock.now += 60
+        self.assertEqual(second.fire_due(), 1)
+        self.assertEqual(first.fire_due(), 0)
+        self.assertEqual((self.batches, other_batches), ([], [["+2"]]))
+        self.assertEqual(len(first), 0)
+
+    def test_pending_nudges_survive_restart(self):
+        """A new scheduler on the same store picks up where the old one left off"""
+        store = MemoryNudgeStore()
+        old = NudgeScheduler(lambda nudges: None, interval=3600, max_nudges=2, store=store, clock=self.clock)
+        old.schedule("+1", delay=60, quiet_hours=(22, 8), payload={"topic": "running"})
+        self.clock.now += 60
+        old.fire_due()
+
+        sent = []
+        restarted = NudgeScheduler(sent.extend, interval=3600, max_nudges=2, store=store, clock=self.clock)
+        self.assertEqual(restarted.load(), 1)
+        self.clock.now += 3600
+        self.assertEqual(restarted.fire_due(), 1)
+        self.assertEqual((sent[0].sent, sent[0].quiet_hours, sent[0].payload), (2, (22, 8), {"topic": "running"}))
+        self.assertEqual(store.all(), [])
+
+    def test_quiet_hours(self):
+        """Nudges inside the quiet window wait for it to end, including across midnight"""
+        self.assertEqual(outside_quiet_hours(local_timestamp(23), (22, 8), 'America/Los_Angeles'), local_timestamp(8, day=25))
+        self.assertEqual(outside_quiet_hours(local_timestamp(3), (22, 8), 'America/Los_Angeles'), local_timestamp(8))
+        self.assertEqual(outside_quiet_hours(local_timestamp(12), (22, 8), 'America/Los_Angeles'), local_timestamp(12))
+        self.assertEqual(outside_quiet_hours(local_timestamp(13), (12, 14), 'America/Los_Angeles'), local_timestamp(14))
+
+
+if __name__ == '__main__':
+    unittest.main()
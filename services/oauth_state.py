@@ -0,0 +1,105 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+# What Does this module do?
+# Server-side storage for in-progress OAuth flows, keyed by the OAuth `state` parameter
+#   - The start route saves who is authorizing (and the PKCE code verifier) under the state
+#   - The callback pops it: each state can be used once, and only until it expires
+#   - Works across instances and browsers, since nothing lives in the Flask session cookie
+# Stores: in-memory (single instance / tests), SQLite (one host), Firestore (Cloud Run)
+
+
+class MemoryOAuthStateStore:
+    def __init__(self, ttl: float = 600, clock=time.time):
+        """
+        Args:
+            ttl: Seconds a state stays redeemable
+            clock: Time source, injectable for tests
+        """
+        self.ttl = ttl
+        self.clock = clock
+        self.states = {}
+        self.lock = threading.Lock()
+
+    def put(self, state: str, data: dict):
+        with self.lock:
+            now = self.clock()
+            # Drop abandoned flows so the dict stays bounded
+            for expired in [key for key, (expires_at, _) in self.states.items() if expires_at <= now]:
+                del self.states[expired]
+            self.states[state] = (now + self.ttl, dict(data))
+
+    def pop(self, state: str):
+        """The data saved for `state`, or None if unknown, expired or already used"""
+        with self.lock:
+            entry = self.states.pop(state, None)
+        if entry is None or entry[0] <= self.clock():
+            return None
+        return entry[1]
+
+
+class SQLiteOAuthStateStore:
+    def __init__(self, db_path: str = "oauth_states.db", ttl: float = 600, clock=time.time):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.clock = clock
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS oauth_states (state TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def put(self, state: str, data: dict):
+        now = self.clock()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM oauth_states WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "INSERT OR REPLACE INTO oauth_states (state, data, expires_at) VALUES (?, ?, ?)",
+                (state, json.dumps(data), now + self.ttl)
+            )
+
+    def pop(self, state: str):
+        with self._connect() as conn:
+            # The DELETE decides who redeems the state when two callbacks race
+            row = conn.execute("DELETE FROM oauth_states WHERE state = ? RETURNING data, expires_at", (state,)).fetchone()
+        if row is None or row[1] <= self.clock():
+            return None
+        return json.loads(row[0])
+
+
+class FirestoreOAuthStateStore:
+    def __init__(self, db, collection: str = "oauth_states", ttl: float = 600, clock=time.time):
+        """
+        Args:
+            db: firestore.client()
+            collection: One document per pending flow. A Firestore TTL policy on
+                `expires_at` can clean up abandoned ones
+        """
+        self.db = db
+        self.collection = db.collection(collection)
+        self.ttl = ttl
+        self.clock = clock
+
+    def put(self, state: str, data: dict):
+        self.collection.document(state).set({"data": data, "expires_at": self.clock() + self.ttl})
+
+    def pop(self, state: str):
+        from firebase_admin import firestore
+
+        doc_ref = self.collection.document(state)
+
+        @firestore.transactional
+        def redeem(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return None
+            transaction.delete(doc_ref)
+            return snapshot.to_dict()
+
+        entry = redeem(self.db.transaction())
+        if entry is None or entry["expires_at"] <= self.clock():
+            return None
+        return entry["data"]
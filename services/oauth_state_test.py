@@ -0,0 +1,53 @@
+import os
+import tempfile
+import threading
+import unittest
+from services.oauth_state import MemoryOAuthStateStore, SQLiteOAuthStateStore
+from testing.fake_clock import FakeClock
+
+
+class OAuthStateStoreTests:
+    """Shared checks; subclasses provide make_store(ttl, clock)"""
+
+    def setUp(self):
+        self.clock = FakeClock(1000.0)
+        self.store = self.make_store(60, self.clock)
+
+    def test_state_is_redeemed_once(self):
+        self.store.put("abc", {"phone_number": "+15551234567", "code_verifier": "v"})
+        self.assertEqual(self.store.pop("abc"), {"phone_number": "+15551234567", "code_verifier": "v"})
+        self.assertIsNone(self.store.pop("abc"))
+
+    def test_unknown_state(self):
+        self.assertIsNone(self.store.pop("never-issued"))
+
+    def test_expired_state(self):
+        self.store.put("abc", {"phone_number": "+15551234567"})
+        self.clock.now += 61
+        self.assertIsNone(self.store.pop("abc"))
+
+    def test_concurrent_callbacks_redeem_once(self):
+        self.store.put("abc", {"phone_number": "+15551234567"})
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.store.pop("abc"))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(result is not None for result in results), 1)
+
+
+class TestMemoryOAuthStateStore(OAuthStateStoreTests, unittest.TestCase):
+    def make_store(self, ttl, clock):
+        return MemoryOAuthStateStore(ttl=ttl, clock=clock)
+
+
+class TestSQLiteOAuthStateStore(OAuthStateStoreTests, unittest.TestCase):
+    def make_store(self, ttl, clock):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        return SQLiteOAuthStateStore(os.path.join(self.tmp.name, "states.db"), ttl=ttl, clock=clock)
+
+
+if __name__ == '__main__':
+    unittest.main()
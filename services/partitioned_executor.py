@@ -0,0 +1,76 @@
+import logging
+import queue
+import threading
+import zlib
+from concurrent.futures import Future
+
+
+# What Does this module do?
+# Runs work in parallel across keys but in order within a key (e.g. per phone number)
+#   - Each key hashes to one of N lanes; a lane is a FIFO queue drained by one thread
+#   - Two messages from the same sender therefore never run concurrently or out of order,
+#     while different senders spread over all lanes
+#   - Lanes have a bounded depth; submit() raises LaneFull instead of queueing without limit
+
+
+class LaneFull(RuntimeError):
+    pass
+
+
+class PartitionedExecutor:
+    def __init__(self, lanes: int = 16, max_queue_depth: int = 50, name: str = "lane"):
+        """
+        Args:
+            lanes: Number of lanes (and threads) running in parallel
+            max_queue_depth: Most tasks waiting in one lane
+            name: Thread name prefix, for logs
+        """
+        self.lanes = [queue.Queue(maxsize=max_queue_depth) for _ in range(lanes)]
+        self.threads = []
+        for index, lane in enumerate(self.lanes):
+            thread = threading.Thread(target=self._drain, args=(lane,), name=f"{name}-{index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def lane_for(self, key: str) -> int:
+        return zlib.crc32(key.encode("utf-8")) % len(self.lanes)
+
+    def submit(self, key: str, fn, *args, **kwargs) -> Future:
+        """
+        Queue fn(*args, **kwargs) behind earlier work for the same key
+
+        Raises:
+            LaneFull: The key's lane already has max_queue_depth tasks waiting
+        """
+        future = Future()
+        try:
+            self.lanes[self.lane_for(key)].put_nowait((future, fn, args, kwargs))
+        except queue.Full:
+            raise LaneFull(f"Lane for {key} is full")
+        return future
+
+    def depths(self) -> list:
+        """Tasks waiting in each lane"""
+        return [lane.qsize() for lane in self.lanes]
+
+    def _drain(self, lane: queue.Queue):
+        while True:
+            task = lane.get()
+            if task is None:
+                return
+            future, fn, args, kwargs = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                logging.error(f"Error in {threading.current_thread().name}: {e}")
+                future.set_exception(e)
+
+    def shutdown(self, wait: bool = True):
+        """Stop the lanes after the work already queued"""
+        for lane in self.lanes:
+            lane.put(None)
+        if wait:
+            for thread in self.threads:
+                thread.join()
@@ -0,0 +1,69 @@
+import threading
+import time
+import unittest
+from services.partitioned_executor import PartitionedExecutor, LaneFull
+
+
+class TestPartitionedExecutor(unittest.TestCase):
+    """Test suite for PartitionedExecutor"""
+
+    def setUp(self):
+        self.executor = PartitionedExecutor(lanes=4, max_queue_depth=100)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_same_key_runs_in_order(self):
+        seen = {}
+        futures = []
+        for i in range(50):
+            for key in ("+1", "+2", "+3"):
+                futures.append(self.executor.submit(key, lambda k=key, n=i: seen.setdefault(k, []).append(n)))
+        for future in futures:
+            future.result(timeout=5)
+        for key in ("+1", "+2", "+3"):
+            self.assertEqual(seen[key], list(range(50)))
+
+    def test_different_lanes_run_in_parallel(self):
+        keys = []
+        lanes = set()
+        i = 0
+        while len(lanes) < 2:
+            key = f"+1555{i}"
+            if self.executor.lane_for(key) not in lanes:
+                lanes.add(self.executor.lane_for(key))
+                keys.append(key)
+            i += 1
+
+        barrier = threading.Barrier(2, timeout=5)
+        futures = [self.executor.submit(key, barrier.wait) for key in keys]
+        for future in futures:
+            future.result(timeout=5)
+
+    def test_results_and_errors_reach_the_future(self):
+        self.assertEqual(self.executor.submit("+1", lambda: 42).result(timeout=5), 42)
+        with self.assertRaises(ValueError):
+            self.executor.submit("+1", self._fail).result(timeout=5)
+        # The lane keeps running after an error
+        self.assertEqual(self.executor.submit("+1", lambda: 7).result(timeout=5), 7)
+
+    def _fail(self):
+        raise ValueError("boom")
+
+    def test_full_lane_is_rejected(self):
+        executor = PartitionedExecutor(lanes=1, max_queue_depth=2)
+        release = threading.Event()
+        started = threading.Event()
+        executor.submit("+1", lambda: (started.set(), release.wait(5)))
+        started.wait(5)
+        executor.submit("+1", time.time)
+        executor.submit("+1", time.time)
+        with self.assertRaises(LaneFull):
+            executor.submit("+1", time.time)
+        self.assertEqual(executor.depths(), [2])
+        release.set()
+        executor.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+import contextlib
+import contextvars
+import functools
+import threading
+from collections import deque
+
+
+# What Does this module do?
+# Shares a provider's concurrency (LLM calls, SMS sends, Notion and Calendar requests) between classes of work, so a user
+# waiting on a reply isn't stuck behind a broadcast or a re-index
+#   - Work is interactive (a user is waiting), scheduled (nudges) or bulk (broadcasts,
+#     precompute, re-indexing, summaries). The class travels in a contextvar, set with
+#     priority()/prioritized() where the work starts, so provider wrappers don't need a parameter
+#   - When a slot frees up, waiting classes are served in proportion to their weights
+#     (stride scheduling), so bulk work still progresses under interactive load
+#   - Each class has a quota of slots it may hold at once; scheduled and bulk quotas are below
+#     capacity, which keeps slots free for interactive work even while a bulk job is saturating
+
+INTERACTIVE = "interactive"
+SCHEDULED = "scheduled"
+BULK = "bulk"
+CLASSES = (INTERACTIVE, SCHEDULED, BULK)
+
+DEFAULT_WEIGHTS = {INTERACTIVE: 8, SCHEDULED: 3, BULK: 1}
+
+# Work that never says otherwise is treated as scheduled: below users, above bulk jobs
+_current_class = contextvars.ContextVar("priority_class", default=SCHEDULED)
+
+
+def current_priority() -> str:
+    return _current_class.get()
+
+
+@contextlib.contextmanager
+def priority(priority_class: str):
+    """Run the enclosed block (and the provider calls it makes) as `priority_class`"""
+    if priority_class not in CLASSES:
+        raise ValueError(f"Unknown priority class: {priority_class}")
+    token = _current_class.set(priority_class)
+    try:
+        yield
+    finally:
+        _current_class.reset(token)
+
+
+def prioritized(priority_class: str):
+    """Decorator form of priority(), also handy for callables handed to other threads"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with priority(priority_class):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class PriorityScheduler:
+    def __init__(self, capacity: int = 8, weights: dict = None, quotas: dict = None, name: str = "provider"):
+        """
+        Args:
+            capacity: Calls allowed in flight at once, across all classes
+            weights: Share of freed slots each class gets while several are waiting
+            quotas: Most slots each class may hold at once (default: interactive may use
+                    all of them, scheduled half, bulk a quarter)
+            name: For logs and metrics
+        """
+        self.capacity = capacity
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.quota_overrides = dict(quotas or {})
+        self.quotas = self._quotas(capacity)
+        self.name = name
+
+        self.waiting = {c: deque() for c in CLASSES}
+        self.running = {c: 0 for c in CLASSES}
+        self.granted = {c: 0 for c in CLASSES}
+        # Stride scheduling: the eligible class with the lowest pass is served next
+        self.passes = {c: 0.0 for c in CLASSES}
+        self.virtual_time = 0.0
+        self.lock = threading.Lock()
+
+    def _quotas(self, capacity: int) -> dict:
+        return {
+            INTERACTIVE: capacity,
+            SCHEDULED: max(1, capacity // 2),
+            BULK: max(1, capacity // 4),
+            **self.quota_overrides,
+        }
+
+    def resize(self, capacity: int):
+        """Change how many calls may be in flight, e.g. from settings at startup"""
+        with self.lock:
+            self.capacity = capacity
+            self.quotas = self._quotas(capacity)
+            self._dispatch()
+
+    def _dispatch(self):
+        """Hand free slots to waiters; caller holds the lock"""
+        while sum(self.running.values()) < self.capacity:
+            eligible = [c for c in CLASSES if self.waiting[c] and self.running[c] < self.quotas[c]]
+            if not eligible:
+                return
+            chosen = min(eligible, key=lambda c: (self.passes[c], CLASSES.index(c)))
+            self.virtual_time = self.passes[chosen]
+            self.passes[chosen] += 1.0 / self.weights[chosen]
+            self.running[chosen] += 1
+            self.granted[chosen] += 1
+            self.waiting[chosen].popleft().set()
+
+    def acquire(self, priority_class: str = None, timeout: float = None) -> bool:
+        """
+        Wait for a slot. Returns False if `timeout` runs out first
+
+        Args:
+            priority_class: Defaults to the class set by priority() in this context
+        """
+        priority_class = priority_class or current_priority()
+        ticket = threading.Event()
+        with self.lock:
+            if not self.waiting[priority_class]:
+                # A class that was idle doesn't get to bank credit for the time it wasn't asking
+                self.passes[priority_class] = max(self.passes[priority_class], self.virtual_time)
+            self.waiting[priority_class].append(ticket)
+            self._dispatch()
+
+        if ticket.wait(timeout):
+            return True
+        with self.lock:
+            if ticket.is_set():
+                return True
+            self.waiting[priority_class].remove(ticket)
+            return False
+
+    def release(self, priority_class: str = None):
+        priority_class = priority_class or current_priority()
+        with self.lock:
+            self.running[priority_class] -= 1
+            self._dispatch()
+
+    @contextlib.contextmanager
+    def slot(self, priority_class: str = None):
+        """Hold one slot for the enclosed provider call"""
+        priority_class = priority_class or current_priority()
+        self.acquire(priority_class)
+        try:
+            yield
+        finally:
+            self.release(priority_class)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "capacity": self.capacity,
+                **{c: {
+                    "running": self.running[c],
+                    "waiting": len(self.waiting[c]),
+                    "granted": self.granted[c],
+                    "quota": self.quotas[c],
+                } for c in CLASSES},
+            }
+
+
+# Shared by every AIModel, Textbot, pooled Notion client and GoogleCalendarAPI in the process;
+# app.py sizes them from settings at startup
+llm_scheduler = PriorityScheduler(8, name="llm")
+sms_scheduler = PriorityScheduler(4, name="sms")
+notion_scheduler = PriorityScheduler(4, name="notion")
+calendar_scheduler = PriorityScheduler(4, name="calendar")
@@ -0,0 +1,92 @@
+import threading
+import unittest
+from services.priority_scheduler import (
+    PriorityScheduler, priority, prioritized, current_priority, INTERACTIVE, SCHEDULED, BULK
+)
+
+
+class TestPriorityScheduler(unittest.TestCase):
+    """Test suite for PriorityScheduler"""
+
+    def _queue(self, scheduler, priority_class, order):
+        """Start a thread that waits for a slot and records when it got one"""
+        def run():
+            scheduler.acquire(priority_class)
+            order.append(priority_class)
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def _wait_for_waiters(self, scheduler, count):
+        for _ in range(500):
+            if sum(stats["waiting"] for c, stats in scheduler.stats().items() if c != "capacity") == count:
+                return
+            threading.Event().wait(0.01)
+        self.fail("waiters never queued")
+
+    def test_context_sets_class(self):
+        self.assertEqual(current_priority(), SCHEDULED)
+        with priority(BULK):
+            self.assertEqual(current_priority(), BULK)
+            self.assertEqual(prioritized(INTERACTIVE)(current_priority)(), INTERACTIVE)
+        self.assertEqual(current_priority(), SCHEDULED)
+        with self.assertRaises(ValueError):
+            with priority("urgent"):
+                pass
+
+    def test_bulk_quota_leaves_room_for_interactive(self):
+        scheduler = PriorityScheduler(capacity=4)
+        self.assertTrue(scheduler.acquire(BULK))
+        self.assertFalse(scheduler.acquire(BULK, timeout=0.05))
+        for _ in range(3):
+            self.assertTrue(scheduler.acquire(INTERACTIVE, timeout=1))
+        self.assertEqual(scheduler.stats()[BULK]["waiting"], 0)
+
+    def test_freed_slots_are_shared_by_weight(self):
+        scheduler = PriorityScheduler(capacity=1, weights={INTERACTIVE: 3, BULK: 1}, quotas={BULK: 1})
+        scheduler.acquire(INTERACTIVE)
+        order = []
+        threads = []
+        for _ in range(4):
+            threads.append(self._queue(scheduler, BULK, order))
+        self._wait_for_waiters(scheduler, 4)
+        for _ in range(4):
+            threads.append(self._queue(scheduler, INTERACTIVE, order))
+        self._wait_for_waiters(scheduler, 8)
+
+        for _ in range(8):
+            count = len(order)
+            scheduler.release(order[-1] if order else INTERACTIVE)
+            for _ in range(500):
+                if len(order) > count:
+                    break
+                threading.Event().wait(0.01)
+        for thread in threads:
+            thread.join(timeout=5)
+
+        # Interactive gets three slots for every bulk one, but bulk isn't starved
+        self.assertEqual(order[:4].count(INTERACTIVE), 3)
+        self.assertIn(BULK, order[:4])
+        self.assertEqual(sorted(order), sorted([INTERACTIVE] * 4 + [BULK] * 4))
+
+    def test_resize_hands_out_new_slots(self):
+        """Growing the capacity lets waiting work start, and default quotas follow the capacity"""
+        scheduler = PriorityScheduler(capacity=1)
+        self.assertTrue(scheduler.acquire(INTERACTIVE, timeout=0))
+        self.assertFalse(scheduler.acquire(INTERACTIVE, timeout=0))
+
+        scheduler.resize(8)
+        self.assertTrue(scheduler.acquire(INTERACTIVE, timeout=0))
+        self.assertEqual(scheduler.stats()[BULK]["quota"], 2)
+
+    def test_slot_releases_on_error(self):
+        scheduler = PriorityScheduler(capacity=1)
+        with self.assertRaises(ValueError):
+            with scheduler.slot(INTERACTIVE):
+                raise ValueError("boom")
+        self.assertEqual(scheduler.stats()[INTERACTIVE]["running"], 0)
+        self.assertTrue(scheduler.acquire(INTERACTIVE, timeout=0.1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import hashlib
+import logging
+import re
+import time
+import uuid
+
+from ai_model import AIModel
+from constants.action_types import ActionType
+from api_interaction.google_cal_api import GoogleCalendarAPI
+from api_interaction.notion_api import NotionAPI
+from api_interaction.textbot import Textbot
+from services.priority_scheduler import llm_scheduler, sms_scheduler, notion_scheduler, calendar_scheduler
+
+
+# What Does this module do?
+# Swaps the external providers (Grok/OpenAI, Notion, Google Calendar, Textbelt) for
+# canned responses with a fixed delay, for load tests and traffic replays
+#   - Enabled by STUB_PROVIDERS=1; never on in production
+#   - The delay stands in for provider latency, so the app's own concurrency is exercised;
+#     stubbed calls still take priority_scheduler slots like the real ones
+#   - Replies are classified from their text (LocalModel's keyword rules) so they reach the
+#     Notion and Calendar handlers; STUB_ACTION sends every reply to one action instead
+#   - Firestore is not stubbed: point FIRESTORE_EMULATOR_HOST at an emulator seeded with
+#     `python -m services.bulk_users import` to give replayed numbers real users
+
+_originals = {}
+
+# AIModel.choose_action_type's prompt, its option lines and the classified text
+ACTION_PROMPT = "Decide what the user wants done"
+_OPTION = re.compile(r"^\s*- ([A-Z_]+):", re.M)
+_TEXT = re.compile(r'Text: "(.*)"', re.S)
+
+
+def _stub(cls, name, replacement):
+    _originals.setdefault((cls, name), cls.__dict__[name])
+    setattr(cls, name, replacement)
+
+
+def _choose_action(prompt: str, action: str = None) -> str:
+    """The option name a stubbed LLM answers a choose_action_type prompt with"""
+    # Imported here: the evaluation harness is only needed once a reply is classified
+    from services.model_eval import LocalModel
+
+    names = _OPTION.findall(prompt)
+    if not names or action in names:
+        return action or ""
+    text = _TEXT.search(prompt)
+    action_type = LocalModel().choose_action_type(text.group(1) if text else "",
+                                                  {ActionType[name]: "" for name in names if name in ActionType.__members__})
+    return action_type.name if action_type != ActionType.ERROR else names[0]
+
+
+def install(latency: float = 0.05, action: str = None):
+    """
+    Replace provider calls
+
+    Args:
+        latency: Seconds slept per call
+        action: ActionType name every offered reply is classified as (default: guessed from its text)
+    """
+
+    def call_grok_api(self, user_message, system_prompt="", history=None):
+        with llm_scheduler.slot():
+            time.sleep(latency)
+        if ACTION_PROMPT in user_message:
+            return _choose_action(user_message, action)
+        return "[]" if "JSON" in user_message else "Stubbed reply"
+
+    def embed_texts(self, texts):
+        with llm_scheduler.slot():
+            time.sleep(latency)
+        return [[byte / 255.0 for byte in hashlib.sha256(text.encode("utf-8")).digest()][:8] * (self.embedding_dim // 8)
+                for text in texts]
+
+    def send_text(self, text, phone_number):
+        with sms_scheduler.slot():
+            time.sleep(latency)
+        return {"success": True, "textId": f"stub-{uuid.uuid4().hex[:12]}", "quotaRemaining": 1000}
+
+    def write_note(self, content, tag_counts=None, owner=None):
+        with notion_scheduler.slot():
+            time.sleep(latency)
+        return {"page_id": str(uuid.uuid4()), "title": "Stubbed note", "tags": []}
+
+    def write_daily_log(self, contents, date_title, page_id=None, owner=None):
+        with notion_scheduler.slot():
+            time.sleep(latency)
+        return page_id or str(uuid.uuid4())
+
+    def find_page_by_title(self, title, owner=None):
+        with notion_scheduler.slot():
+            time.sleep(latency)
+        return None
+
+    def query_pages_edited_since(self, since=None, owner=None):
+        with notion_scheduler.slot():
+            time.sleep(latency)
+        return []
+
+    def get_page_text(self, page_id):
+        with notion_scheduler.slot():
+            time.sleep(latency)
+        return ""
+
+    def create_events(self, events, calendar_id='primary', timezone='America/Los_Angeles'):
+        with calendar_scheduler.slot():
+            time.sleep(latency)
+        return [{'status': 'success', 'event_id': uuid.uuid4().hex, 'link': '', 'summary': event['summary']}
+                for event in events]
+
+    def list_events_page(self, calendar_id='primary', sync_token=None, page_token=None, time_min=None, time_max=None):
+        with calendar_scheduler.slot():
+            time.sleep(latency)
+        return {'status': 'success', 'items': [], 'next_page_token': None, 'next_sync_token': 'stub-sync-token'}
+
+    _stub(AIModel, "_call_grok_api", call_grok_api)
+    _stub(AIModel, "embed_texts", embed_texts)
+    _stub(Textbot, "send_text", send_text)
+    _stub(NotionAPI, "write_note", write_note)
+    _stub(NotionAPI, "write_daily_log", write_daily_log)
+    _stub(NotionAPI, "find_page_by_title", find_page_by_title)
+    _stub(NotionAPI, "query_pages_edited_since", query_pages_edited_since)
+    _stub(NotionAPI, "get_page_text", get_page_text)
+    _stub(GoogleCalendarAPI, "_build_service", lambda self: None)
+    _stub(GoogleCalendarAPI, "create_events", create_events)
+    _stub(GoogleCalendarAPI, "list_events_page", list_events_page)
+    logging.warning(f"External providers are stubbed ({latency * 1000:.0f}ms per call)")
+
+
+def uninstall():
+    for (cls, name), original in _originals.items():
+        setattr(cls, name, original)
+    _originals.clear()
@@ -0,0 +1,296 @@
+import hashlib
+import logging
+import math
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+
+
+# What Does this module do?
+# Splits the user keyspace into shards so periodic work runs on exactly one instance
+#   - Each instance heartbeats, counts the live instances and aims for its fair share
+#   - Shards are claimed with expiring leases; an owner renews its leases on every
+#     heartbeat, and shards of a dead instance become claimable once their lease expires
+#   - Instances above their fair share release shards so newcomers can claim them
+# Leases live in Firestore in production and in SQLite for tests / single-host setups
+
+
+def shard_for(key: str, num_shards: int) -> int:
+    return zlib.crc32(key.encode("utf-8")) % num_shards
+
+
+class SQLiteLeaseStore:
+    def __init__(self, db_path: str = "shard_leases.db"):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS shard_instances (instance_id TEXT PRIMARY KEY, expires_at REAL NOT NULL);
+                CREATE TABLE IF NOT EXISTS shard_leases (shard INTEGER PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL);
+            """)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def heartbeat(self, instance_id: str, expires_at: float):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO shard_instances (instance_id, expires_at) VALUES (?, ?)",
+                         (instance_id, expires_at))
+
+    def live_instances(self, now: float) -> list:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM shard_instances WHERE expires_at < ?", (now,))
+            return [row[0] for row in conn.execute("SELECT instance_id FROM shard_instances ORDER BY instance_id")]
+
+    def leases(self) -> dict:
+        with self._connect() as conn:
+            return {shard: (owner, expires_at)
+                    for shard, owner, expires_at in conn.execute("SELECT shard, owner, expires_at FROM shard_leases")}
+
+    def try_acquire(self, shard: int, instance_id: str, now: float, expires_at: float) -> bool:
+        """Take or renew a lease if it is free, expired or already ours"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO shard_leases (shard, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(shard) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE shard_leases.owner = excluded.owner OR shard_leases.expires_at < ?",
+                (shard, instance_id, expires_at, now)
+            )
+            return cursor.rowcount == 1
+
+    def release(self, shard: int, instance_id: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM shard_leases WHERE shard = ? AND owner = ?", (shard, instance_id))
+
+    def leave(self, instance_id: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM shard_instances WHERE instance_id = ?", (instance_id,))
+
+
+class FirestoreLeaseStore:
+    def __init__(self, db, collection_prefix: str = "shard"):
+        """
+        Args:
+            db: firestore.client()
+            collection_prefix: Leases go to <prefix>_leases, heartbeats to <prefix>_instances
+        """
+        self.db = db
+        self.leases_ref = db.collection(f"{collection_prefix}_leases")
+        self.instances_ref = db.collection(f"{collection_prefix}_instances")
+
+    def heartbeat(self, instance_id: str, expires_at: float):
+        self.instances_ref.document(instance_id).set({"expires_at": expires_at})
+
+    def live_instances(self, now: float) -> list:
+        live = []
+        for doc in self.instances_ref.stream():
+            if doc.to_dict().get("expires_at", 0) >= now:
+                live.append(doc.id)
+            else:
+                doc.reference.delete()
+        return sorted(live)
+
+    def leases(self) -> dict:
+        return {int(doc.id): (doc.to_dict()["owner"], doc.to_dict()["expires_at"]) for doc in self.leases_ref.stream()}
+
+    def try_acquire(self, shard: int, instance_id: str, now: float, expires_at: float) -> bool:
+        from firebase_admin import firestore
+
+        doc_ref = self.leases_ref.document(str(shard))
+
+        @firestore.transactional
+        def acquire(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            if snapshot.exists:
+                lease = snapshot.to_dict()
+                if lease["owner"] != instance_id and lease["expires_at"] >= now:
+                    return False
+            transaction.set(doc_ref, {"owner": instance_id, "expires_at": expires_at})
+            return True
+
+        return acquire(self.db.transaction())
+
+    def release(self, shard: int, instance_id: str):
+        from firebase_admin import firestore
+
+        doc_ref = self.leases_ref.document(str(shard))
+
+        @firestore.transactional
+        def release(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            if snapshot.exists and snapshot.to_dict()["owner"] == instance_id:
+                transaction.delete(doc_ref)
+
+        release(self.db.transaction())
+
+    def leave(self, instance_id: str):
+        self.instances_ref.document(instance_id).delete()
+
+
+class ShardCoordinator:
+    def __init__(self, store, num_shards: int = 64, instance_id: str = None,
+                 lease_ttl: float = 30.0, heartbeat_interval: float = 10.0, clock=time.time):
+        """
+        Args:
+            store: SQLiteLeaseStore or FirestoreLeaseStore
+            num_shards: Number of shards the keyspace is split into; must match on every instance
+            instance_id: Unique name of this instance (default: hostname plus a random suffix)
+            lease_ttl: Seconds a lease or heartbeat stays valid without renewal
+            heartbeat_interval: Seconds between rebalances; well under lease_ttl
+            clock: Time source, injectable for tests
+        """
+        self.store = store
+        self.num_shards = num_shards
+        self.instance_id = instance_id or f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        self.lease_ttl = lease_ttl
+        self.heartbeat_interval = heartbeat_interval
+        self.clock = clock
+
+        # shard -> when our lease on it expires, as far as we know
+        self.owned = {}
+        # Running ShardedJobs; the coordinator only heartbeats while there is one
+        self.jobs = 0
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def _preference(self, shard: int) -> str:
+        # Rendezvous hashing: instances prefer different shards, which keeps claims from colliding
+        return hashlib.sha256(f"{self.instance_id}:{shard}".encode("utf-8")).hexdigest()
+
+    def rebalance(self):
+        """Heartbeat, renew our leases, and claim or release shards toward a fair share"""
+        now = self.clock()
+        expires_at = now + self.lease_ttl
+        self.store.heartbeat(self.instance_id, expires_at)
+        instances = self.store.live_instances(now)
+        target = math.ceil(self.num_shards / max(1, len(instances)))
+
+        leases = self.store.leases()
+        mine = sorted((shard for shard, (owner, lease_expiry) in leases.items()
+                       if owner == self.instance_id and lease_expiry >= now), key=self._preference)
+
+        owned = {}
+        for shard in mine[:target]:
+            if self.store.try_acquire(shard, self.instance_id, now, expires_at):
+                owned[shard] = expires_at
+        for shard in mine[target:]:
+            self.store.release(shard, self.instance_id)
+
+        if len(owned) < target:
+            claimable = [shard for shard in range(self.num_shards)
+                         if shard not in leases or leases[shard][1] < now]
+            for shard in sorted(claimable, key=self._preference):
+                if len(owned) >= target:
+                    break
+                if self.store.try_acquire(shard, self.instance_id, now, expires_at):
+                    owned[shard] = expires_at
+
+        with self.lock:
+            self.owned = owned
+        logging.info(f"Instance {self.instance_id} owns {len(owned)}/{self.num_shards} shards ({len(instances)} live instances)")
+
+    def owned_shards(self) -> set:
+        """Shards whose lease is still valid, minus a heartbeat of safety margin"""
+        cutoff = self.clock() + self.heartbeat_interval
+        with self.lock:
+            return {shard for shard, expires_at in self.owned.items() if expires_at > cutoff}
+
+    def owns(self, key: str) -> bool:
+        """Whether this instance should do periodic work for `key` (e.g. a phone number)"""
+        return shard_for(key, self.num_shards) in self.owned_shards()
+
+    def _run(self):
+        while not self.stopping.is_set():
+            try:
+                self.rebalance()
+            except Exception as e:
+                logging.error(f"Error rebalancing shards: {e}")
+            self.stopping.wait(self.heartbeat_interval)
+
+    def start(self):
+        if self.thread:
+            return
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._run, name="shard-coordinator", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Give up all shards so other instances can take them over immediately"""
+        self.stopping.set()
+        if self.thread:
+            self.thread.join(self.heartbeat_interval)
+            self.thread = None
+        with self.lock:
+            shards = list(self.owned)
+            self.owned = {}
+        for shard in shards:
+            self.store.release(shard, self.instance_id)
+        self.store.leave(self.instance_id)
+
+    def attach(self):
+        """A job needs shards; the first one starts the coordinator"""
+        with self.lock:
+            self.jobs += 1
+            first = self.jobs == 1
+        if first:
+            self.start()
+
+    def detach(self):
+        """A job is done with its shards; after the last one the coordinator stops and releases them"""
+        with self.lock:
+            self.jobs = max(0, self.jobs - 1)
+            last = self.jobs == 0
+        if last:
+            self.stop()
+
+
+class ShardedJob:
+    """
+    Periodic work that each instance runs only for the keys in its shards; the coordinator
+    runs (and costs Firestore reads and writes) only while some job is started
+    """
+
+    def __init__(self, coordinator: ShardCoordinator, interval: float, job, name: str = "sharded-job"):
+        """
+        Args:
+            coordinator: Decides which keys this instance owns
+            interval: Seconds between runs
+            job: Callable taking an `owns(key) -> bool` filter
+            name: Thread name, for logs
+        """
+        self.coordinator = coordinator
+        self.interval = interval
+        self.job = job
+        self.name = name
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def run_once(self):
+        if not self.coordinator.owned_shards():
+            return
+        self.job(self.coordinator.owns)
+
+    def _run(self):
+        while not self.stopping.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logging.error(f"Error running {self.name}: {e}")
+
+    def start(self):
+        if self.thread:
+            return
+        self.coordinator.attach()
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread:
+            self.thread.join(self.interval)
+            self.thread = None
+            self.coordinator.detach()
@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+from services.shard_leases import SQLiteLeaseStore, ShardCoordinator, ShardedJob, shard_for
+from testing.fake_clock import FakeClock
+
+
+class TestShardCoordinator(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SQLiteLeaseStore(os.path.join(self.tmp.name, "leases.db"))
+        self.clock = FakeClock(1000.0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def coordinator(self, name):
+        return ShardCoordinator(self.store, num_shards=8, instance_id=name,
+                                lease_ttl=30, heartbeat_interval=10, clock=self.clock)
+
+    def assert_partitioned(self, *coordinators):
+        owned = [c.owned_shards() for c in coordinators]
+        for i, shards in enumerate(owned):
+            for other in owned[i + 1:]:
+                self.assertFalse(shards & other)
+        self.assertEqual(set().union(*owned), set(range(8)))
+
+    def test_single_instance_owns_everything(self):
+        a = self.coordinator("a")
+        a.rebalance()
+        self.assertEqual(a.owned_shards(), set(range(8)))
+        self.assertTrue(a.owns("+15551234567"))
+
+    def test_rebalances_when_an_instance_joins(self):
+        """The first instance gives up its surplus and the newcomer picks it up"""
+        a, b = self.coordinator("a"), self.coordinator("b")
+        a.rebalance()
+        b.rebalance()  # b sees two instances but every shard is still leased to a
+        self.assertEqual(b.owned_shards(), set())
+
+        a.rebalance()  # a releases down to its fair share
+        b.rebalance()
+        self.assertEqual(len(a.owned_shards()), 4)
+        self.assertEqual(len(b.owned_shards()), 4)
+        self.assert_partitioned(a, b)
+
+    def test_dead_instance_shards_are_taken_over_after_expiry(self):
+        a, b = self.coordinator("a"), self.coordinator("b")
+        a.rebalance()
+        b.rebalance()
+        a.rebalance()
+        b.rebalance()
+
+        # a stops heartbeating; its leases stay valid until they expire
+        self.clock.now += 20
+        b.rebalance()
+        self.assertEqual(len(b.owned_shards()), 4)
+
+        self.clock.now += 15
+        b.rebalance()
+        self.assertEqual(b.owned_shards(), set(range(8)))
+
+    def test_stale_owner_stops_claiming_before_its_lease_expires(self):
+        """owned_shards() leaves a heartbeat of margin so two owners never overlap"""
+        a = self.coordinator("a")
+        a.rebalance()
+        self.clock.now += 25
+        self.assertEqual(a.owned_shards(), set())
+
+    def test_stop_releases_shards_immediately(self):
+        a, b = self.coordinator("a"), self.coordinator("b")
+        a.rebalance()
+        a.stop()
+        b.rebalance()
+        self.assertEqual(b.owned_shards(), set(range(8)))
+
+    def test_lease_cannot_be_stolen_while_valid(self):
+        self.assertTrue(self.store.try_acquire(3, "a", 1000.0, 1030.0))
+        self.assertFalse(self.store.try_acquire(3, "b", 1010.0, 1040.0))
+        self.assertTrue(self.store.try_acquire(3, "a", 1010.0, 1040.0))
+        self.assertTrue(self.store.try_acquire(3, "b", 1041.0, 1071.0))
+
+    def test_sharded_job_only_sees_owned_keys(self):
+        a, b = self.coordinator("a"), self.coordinator("b")
+        for coordinator in (a, b, a, b):
+            coordinator.rebalance()
+
+        phones = [f"+1555000{i:04d}" for i in range(50)]
+        handled = []
+        for coordinator in (a, b):
+            ShardedJob(coordinator, 60, lambda owns: handled.extend(p for p in phones if owns(p))).run_once()
+        self.assertEqual(sorted(handled), sorted(phones))
+
+    def test_coordinator_runs_only_while_a_job_does(self):
+        a = self.coordinator("a")
+        first, second = ShardedJob(a, 60, lambda owns: None), ShardedJob(a, 60, lambda owns: None)
+        self.assertIsNone(a.thread)
+
+        first.start()
+        second.start()
+        self.assertIsNotNone(a.thread)
+        first.stop()
+        self.assertIsNotNone(a.thread)
+        second.stop()
+        self.assertIsNone(a.thread)
+        self.assertEqual(self.store.live_instances(1000.0), [])
+
+    def test_shard_for_is_stable(self):
+        self.assertEqual(shard_for("+15551234567", 64), shard_for("+15551234567", 64))
+        self.assertTrue(0 <= shard_for("+15551234567", 64) < 64)
+
+
+if __name__ == '__main__':
+    unittest.main()
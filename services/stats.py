@@ -0,0 +1,10 @@
+# What Does this module do?
+# Small statistics helpers shared by the load-test and evaluation reports
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of already sorted values (0.0 when there are none)"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
@@ -0,0 +1,98 @@
+import functools
+import math
+import re
+
+
+# What Does this module do?
+# Narrows a Notion database's tag options down to a few likely ones before the LLM picks one
+#   - Tags are scored on word overlap with the note (with light stemming, and character
+#     trigrams so "prayed" still meets "Prayer"), plus how often the user has used each tag
+#   - Only the top k go into the choose_tag prompt, so its size stays the same however many
+#     options the database collects
+#   - A tag whose words all appear in the note, well ahead of the runner-up, is picked
+#     outright and the LLM is not called
+#   - With k or fewer tags, the list is passed through unchanged (in its original order)
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("a an and are as at be by for from i in is it my of on or the to was with".split())
+_SUFFIXES = ("ing", "ed", "es", "s")
+
+
+def _stem(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+@functools.lru_cache(maxsize=4096)
+def _tokens(text: str) -> frozenset:
+    return frozenset(_stem(word) for word in _WORD.findall(text.lower()) if word not in _STOPWORDS)
+
+
+@functools.lru_cache(maxsize=16384)
+def _trigrams(word: str) -> frozenset:
+    padded = f" {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _word_similarity(tag_word: str, note_words: frozenset) -> float:
+    if tag_word in note_words:
+        return 1.0
+    grams = _trigrams(tag_word)
+    best = 0.0
+    for word in note_words:
+        other = _trigrams(word)
+        best = max(best, 2 * len(grams & other) / (len(grams) + len(other)))
+    # Weak overlaps are noise ("run" and "rung"); only close spellings count, and never fully
+    return best * 0.8 if best >= 0.5 else 0.0
+
+
+class TagRanker:
+    def __init__(self, k: int = 8, clear_margin: float = 0.6, history_weight: float = 0.3):
+        """
+        Args:
+            k: Most tags offered to the LLM
+            clear_margin: How far ahead of the runner-up a full match must be to skip the LLM
+            history_weight: Weight of the user's past tag use next to word overlap (0 to 1)
+        """
+        self.k = k
+        self.clear_margin = clear_margin
+        self.history_weight = history_weight
+
+    def rank(self, text: str, tags: list, tag_counts: dict = None) -> list:
+        """
+        (tag, score, lexical) for every tag, best first; ties keep the original order
+
+        Args:
+            tag_counts: Optional tag -> times this user has used it
+        """
+        note_words = _tokens(text)
+        top_count = max((tag_counts or {}).values(), default=0)
+        ranked = []
+        for tag in tags:
+            tag_words = _tokens(tag)
+            lexical = (sum(_word_similarity(word, note_words) for word in tag_words) / len(tag_words)
+                       if tag_words and note_words else 0.0)
+            history = math.log1p(tag_counts.get(tag, 0)) / math.log1p(top_count) if top_count else 0.0
+            ranked.append((tag, lexical + self.history_weight * history, lexical))
+        ranked.sort(key=lambda entry: -entry[1])
+        return ranked
+
+    def shortlist(self, text: str, tags: list, tag_counts: dict = None) -> tuple:
+        """
+        Tags to offer the LLM, and the tag to use without asking it (or None)
+
+        Returns:
+            tuple: (candidates, winner)
+        """
+        if not tags:
+            return [], None
+        ranked = self.rank(text, tags, tag_counts)
+        best = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if best[2] >= 1.0 and best[1] - runner_up >= self.clear_margin:
+            return [best[0]], best[0]
+        if len(tags) <= self.k:
+            return list(tags), None
+        return [tag for tag, _, _ in ranked[:self.k]], None
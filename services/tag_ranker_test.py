@@ -0,0 +1,48 @@
+import unittest
+from services.tag_ranker import TagRanker
+
+
+TAGS = ["Health", "Work", "Faith", "Finance", "Journal", "Prayer", "Reading", "Fitness",
+        "Nutrition", "Career", "Family", "Travel"]
+
+
+class TestTagRanker(unittest.TestCase):
+    """Test suite for TagRanker"""
+
+    def setUp(self):
+        self.ranker = TagRanker(k=4)
+
+    def test_clear_match_skips_the_llm(self):
+        """A tag named in the note, well ahead of the rest, is the winner"""
+        candidates, winner = self.ranker.shortlist("Read 30 pages before bed", TAGS)
+        self.assertEqual((candidates, winner), (["Reading"], "Reading"))
+
+    def test_shortlist_is_capped_at_k(self):
+        """Without a clear winner, the k best tags go to the LLM"""
+        candidates, winner = self.ranker.shortlist("Prayed, then ran 5k and read a chapter", TAGS)
+        self.assertIsNone(winner)
+        self.assertEqual(len(candidates), 4)
+        self.assertIn("Prayer", candidates)
+        self.assertIn("Reading", candidates)
+
+    def test_history_breaks_ties(self):
+        """With no word overlap, the user's most used tags come first"""
+        candidates, winner = self.ranker.shortlist("Meal prepped chicken and rice", TAGS,
+                                                   {"Nutrition": 30, "Family": 2})
+        self.assertIsNone(winner)
+        self.assertEqual(candidates[:2], ["Nutrition", "Family"])
+
+    def test_history_alone_never_wins(self):
+        """Past use makes a tag likely, never certain"""
+        _, winner = self.ranker.shortlist("Meal prepped chicken and rice", TAGS, {"Nutrition": 30})
+        self.assertIsNone(winner)
+
+    def test_short_list_passes_through(self):
+        """k or fewer tags go to the LLM unchanged"""
+        tags = ["Work", "Personal", "Ideas"]
+        self.assertEqual(self.ranker.shortlist("Meeting notes from team sync", tags), (tags, None))
+        self.assertEqual(self.ranker.shortlist("anything", []), ([], None))
+
+
+if __name__ == '__main__':
+    unittest.main()
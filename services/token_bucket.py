@@ -0,0 +1,76 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter
+
+    Tokens refill continuously at `rate` per second up to `capacity`.
+    Callers either poll with try_acquire() or block with acquire().
+    """
+
+    def __init__(self, rate: float, capacity: float = None, clock=time.monotonic):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum burst size (default: one second worth of tokens)
+            clock: Monotonic time source, injectable for tests
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated_at = clock()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = max(0.0, now - self.updated_at)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """
+        Take `tokens` if they are available
+
+        Returns:
+            float: 0.0 if the tokens were taken, otherwise seconds until they will be
+        """
+        with self.lock:
+            now = self.clock()
+            if now < self.paused_until:
+                return self.paused_until - now
+
+            self._refill(now)
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return (tokens - self.tokens) / self.rate
+
+    def acquire(self, tokens: float = 1, timeout: float = None) -> bool:
+        """Block until `tokens` are taken. Returns False if `timeout` runs out first"""
+        deadline = None if timeout is None else self.clock() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                return True
+            if deadline is not None:
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+    def refund(self, tokens: float = 1):
+        """Return tokens taken for work that did not happen"""
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + tokens)
+
+    def pause(self, seconds: float):
+        """Withhold all tokens for `seconds`, e.g. after the server sends Retry-After"""
+        with self.lock:
+            now = self.clock()
+            self.paused_until = max(self.paused_until, now + seconds)
+            self.tokens = 0.0
+            self.updated_at = self.paused_until
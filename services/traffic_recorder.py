@@ -0,0 +1,69 @@
+import hashlib
+import hmac
+import json
+import os
+import re
+import threading
+import time
+
+
+# What Does this module do?
+# Records incoming SMS webhooks to JSONL so real traffic can be replayed in load tests
+#   - One line per request: {"ts": arrival time, "payload": sanitized webhook body}
+#   - Phone numbers and text IDs are replaced with stable pseudonyms (same input, same
+#     pseudonym), so per-user ordering and fan-out survive but real numbers don't
+#   - Emails, links and long digit runs in message text are masked
+# Replay a recording with services/traffic_replay.py
+
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+URL_PATTERN = re.compile(r"https?://\S+|www\.\S+")
+DIGITS_PATTERN = re.compile(r"\d{5,}")
+
+
+def sanitize_text(text: str) -> str:
+    text = EMAIL_PATTERN.sub("user@example.com", text)
+    text = URL_PATTERN.sub("https://example.com", text)
+    return DIGITS_PATTERN.sub(lambda match: "0" * len(match.group()), text)
+
+
+class TrafficRecorder:
+    def __init__(self, salt: str = None):
+        """
+        Args:
+            salt: Key for pseudonyms; the same salt gives the same pseudonyms across
+                recordings (default: random per process)
+        """
+        self.salt = (salt or os.urandom(16).hex()).encode("utf-8")
+        self.lock = threading.Lock()
+        self.files = {}
+
+    def pseudonym(self, value: str, digits: int = 7) -> str:
+        digest = hmac.new(self.salt, value.encode("utf-8"), hashlib.sha256).hexdigest()
+        return str(int(digest, 16) % 10 ** digits).zfill(digits)
+
+    def sanitize(self, payload: dict) -> dict:
+        sanitized = dict(payload)
+        if sanitized.get("fromNumber"):
+            # Keeps the E.164 shape, in the 555 range
+            sanitized["fromNumber"] = "+1555" + self.pseudonym(sanitized["fromNumber"])
+        if sanitized.get("textId"):
+            sanitized["textId"] = "rec-" + self.pseudonym(str(sanitized["textId"]), 12)
+        if isinstance(sanitized.get("text"), str):
+            sanitized["text"] = sanitize_text(sanitized["text"])
+        return sanitized
+
+    def record(self, path: str, payload: dict, received_at: float = None):
+        """Append one sanitized request to the recording at `path`"""
+        line = json.dumps({"ts": time.time() if received_at is None else received_at,
+                           "payload": self.sanitize(payload or {})}) + "\n"
+        with self.lock:
+            f = self.files.get(path)
+            if f is None:
+                f = self.files[path] = open(path, "a", buffering=1)
+            f.write(line)
+
+    def close(self):
+        with self.lock:
+            for f in self.files.values():
+                f.close()
+            self.files = {}
@@ -0,0 +1,105 @@
+import json
+import os
+import tempfile
+import types
+import unittest
+from unittest.mock import Mock
+from ai_model import AIModel
+from constants.action_types import ActionType
+from handlers.registry import ACTION_HANDLERS, ReplyContext
+from services import provider_stubs
+from settings import Settings
+from services.traffic_recorder import TrafficRecorder, sanitize_text
+from services.traffic_replay import load_recording, replay
+from api_interaction.textbot import Textbot
+
+
+class TestTrafficRecorder(unittest.TestCase):
+    """Test suite for recording and replaying webhook traffic"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "traffic.jsonl")
+        self.recorder = TrafficRecorder(salt="test")
+
+    def tearDown(self):
+        self.recorder.close()
+        self.tmp.cleanup()
+
+    def test_sanitizes_payloads(self):
+        self.recorder.record(self.path, {"fromNumber": "+19165550123", "textId": "123456", "text": "email me at a.b@c.com"}, 10.0)
+        self.recorder.record(self.path, {"fromNumber": "+19165550123", "textId": "123457", "text": "gym at 7am"}, 11.5)
+        self.recorder.close()
+
+        with open(self.path) as f:
+            lines = [json.loads(line) for line in f]
+        first, second = lines[0]["payload"], lines[1]["payload"]
+        self.assertEqual(lines[0]["ts"], 10.0)
+        self.assertRegex(first["fromNumber"], r"^\+1555\d{7}$")
+        self.assertEqual(first["fromNumber"], second["fromNumber"])
+        self.assertNotEqual(first["textId"], second["textId"])
+        self.assertEqual(first["text"], "email me at user@example.com")
+        self.assertEqual(second["text"], "gym at 7am")
+
+    def test_sanitize_text(self):
+        self.assertEqual(sanitize_text("call 9165550123 or see https://x.io/a?b=1"), "call 0000000000 or see https://example.com")
+
+    def test_replay_keeps_spacing_and_reports(self):
+        for i, ts in enumerate([100.0, 101.0, 103.0]):
+            self.recorder.record(self.path, {"fromNumber": f"+1916555012{i}", "text": "hi"}, ts)
+        self.recorder.close()
+        entries = load_recording(self.path)
+        self.assertEqual([offset for offset, _ in entries], [0.0, 1.0, 3.0])
+
+        sleeps = []
+        statuses = iter([200, 503, 200])
+        report = replay(entries, lambda payload: next(statuses), speed=2, concurrency=1,
+                        clock=lambda: sum(sleeps), sleep=sleeps.append)
+
+        self.assertEqual(sleeps, [0.5, 1.0])
+        self.assertEqual(report["requests"], 3)
+        self.assertEqual(report["errors"], 1)
+        self.assertEqual(report["shed"], 1)
+        self.assertAlmostEqual(report["error_rate"], 1 / 3)
+
+    def test_provider_stubs_install_and_uninstall(self):
+        original = Textbot.send_text
+        provider_stubs.install(latency=0)
+        try:
+            self.assertTrue(Textbot("https://example.com").send_text("hi", "+15551234567")["success"])
+        finally:
+            provider_stubs.uninstall()
+        self.assertIs(Textbot.send_text, original)
+
+    def test_stubbed_replies_reach_handlers(self):
+        """Stubbed classification sends replies to the Notion and Calendar handlers, not ERROR"""
+        options = ACTION_HANDLERS.options()
+        provider_stubs.install(latency=0)
+        try:
+            ai_model = AIModel()
+            self.assertEqual(ai_model.choose_action_type("Ran 5k this morning", options), ActionType.NOTION)
+            self.assertEqual(ai_model.choose_action_type("When did I last run?", options), ActionType.NOTION_QUERY)
+            self.assertEqual(ai_model.choose_action_type("Dentist tomorrow at 3pm", options), ActionType.CALENDAR)
+
+            send_sms = Mock()
+            services = types.SimpleNamespace(notion_write_queue=Mock())
+            action_type = ai_model.choose_action_type("Ran 5k this morning", options)
+            user = types.SimpleNamespace(notion_api_key="key", timezone="America/Los_Angeles")
+            ACTION_HANDLERS.get(action_type).load()(
+                ReplyContext("+15551234567", "Ran 5k this morning", user, [], Settings(), ai_model, send_sms, services))
+        finally:
+            provider_stubs.uninstall()
+        services.notion_write_queue.enqueue.assert_called_once()
+        send_sms.assert_called_once_with("+15551234567", "Logged to Notion")
+
+    def test_stubbed_action_is_configurable(self):
+        provider_stubs.install(latency=0, action="CALENDAR")
+        try:
+            action_type = AIModel().choose_action_type("Ran 5k this morning", ACTION_HANDLERS.options())
+        finally:
+            provider_stubs.uninstall()
+        self.assertEqual(action_type, ActionType.CALENDAR)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from services.stats import percentile
+
+WAIT_HEADER = "X-Replay-Wait"
+
+# Statuses a stubbed instance uses for replies it rate-limited or shed
+SHED_STATUSES = (429, 503)
+
+
+# What Does this module do?
+# Replays a webhook recording (services/traffic_recorder.py) against a running instance
+#   - Requests keep their recorded spacing at 1x, are compressed at Nx, or go as fast
+#     as the worker pool allows with --speed max
+#   - Reports latency percentiles, throughput and error rate
+#   - Each request carries WAIT_HEADER, so a stubbed instance answers only once the reply has
+#     been processed on its lane, and answers shed replies with 429/503 instead of the 200
+#     Textbelt gets. Latency is then end-to-end processing time and shed replies are errors
+# Point it at an instance started with STUB_PROVIDERS=1 so Grok, Notion, Google and
+# Textbelt are not called for real (the header is ignored otherwise):
+#   python -m services.traffic_replay recording.jsonl --target http://localhost:3000 --speed 10
+
+
+def load_recording(path: str) -> list:
+    """(offset seconds from the first request, payload) pairs, in arrival order"""
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    entries.sort(key=lambda entry: entry["ts"])
+    start = entries[0]["ts"] if entries else 0
+    return [(entry["ts"] - start, entry["payload"]) for entry in entries]
+
+
+def summarize(latencies: list, errors: int, elapsed: float, shed: int = 0) -> dict:
+    latencies = sorted(latencies)
+    total = len(latencies)
+    return {
+        "requests": total,
+        "errors": errors,
+        "shed": shed,
+        "error_rate": errors / total if total else 0.0,
+        "throughput": total / elapsed if elapsed > 0 else 0.0,
+        "p50": percentile(latencies, 0.50),
+        "p90": percentile(latencies, 0.90),
+        "p99": percentile(latencies, 0.99),
+        "max": latencies[-1] if latencies else 0.0,
+    }
+
+
+def replay(entries: list, send, speed: float = 1.0, concurrency: int = 32, clock=time.monotonic, sleep=time.sleep) -> dict:
+    """
+    Send every entry and measure how long each takes
+
+    Args:
+        entries: (offset, payload) pairs from load_recording
+        send: Callable payload -> HTTP status code; exceptions and shed replies count as errors
+        speed: Time compression (2 = twice as fast); None or 0 sends without waiting
+        concurrency: Requests in flight at once
+
+    Returns:
+        dict: requests, errors (shed included), shed, error_rate, throughput (req/s) and
+              p50/p90/p99/max latency in seconds
+    """
+    latencies = []
+    errors = [0]
+    shed = [0]
+    lock = threading.Lock()
+
+    def run(payload):
+        started = clock()
+        try:
+            status = send(payload)
+        except Exception:
+            status = None
+        latency = clock() - started
+        with lock:
+            latencies.append(latency)
+            if status is None or not 200 <= status < 300:
+                errors[0] += 1
+            if status in SHED_STATUSES:
+                shed[0] += 1
+
+    started = clock()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="replay") as executor:
+        for offset, payload in entries:
+            if speed:
+                delay = offset / speed - (clock() - started)
+                if delay > 0:
+                    sleep(delay)
+            executor.submit(run, payload)
+    return summarize(latencies, errors[0], clock() - started, shed[0])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded SMS webhooks against an instance")
+    parser.add_argument("recording")
+    parser.add_argument("--target", default="http://localhost:3000")
+    parser.add_argument("--speed", default="1", help="Multiplier such as 1 or 10, or 'max'")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args(argv)
+
+    url = args.target.rstrip("/") + "/api/handleSmsReply"
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    speed = None if args.speed == "max" else float(args.speed)
+    report = replay(
+        load_recording(args.recording),
+        lambda payload: session.post(url, json=payload, headers={WAIT_HEADER: "1"}, timeout=args.timeout).status_code,
+        speed=speed,
+        concurrency=args.concurrency
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import dataclasses
+import threading
+import time
+from collections import OrderedDict
+
+from user import UserRecord, FIRESTORE_FIELDS
+
+
+# What Does this module do?
+# Keeps recently seen users in memory so each SMS does not re-query Firestore
+#   - Entries are UserRecords, looked up by phone number
+#   - Callers may ask for only the fields they need (e.g. an action handler's declared
+#     fields); only those are read from Firestore, and a later call needing more fields
+#     fetches the union
+#   - Least recently used entries are evicted past max_size; entries expire after ttl
+#     so edits made elsewhere (another instance, the console) are picked up
+#   - Writers call put(), update() or invalidate() after changing a user
+
+
+class UserCache:
+    def __init__(self, db, collection: str = "users", ttl: float = 300, max_size: int = 10000, clock=time.monotonic):
+        """
+        Args:
+            db: firestore.client()
+            collection: Users collection
+            ttl: Seconds an entry is trusted
+            max_size: Most users kept
+            clock: Time source, injectable for tests
+        """
+        self.collection = db.collection(collection)
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, phone_number: str, fields: tuple = None):
+        """
+        The user with this phone number, or None if there is none
+
+        Args:
+            fields: UserRecord fields the caller needs (default: all). Fields that were
+                    not read keep their defaults on the returned record
+        """
+        needed = None if fields is None else frozenset(fields) | {'phone_number'}
+        with self.lock:
+            entry = self.entries.get(phone_number)
+            if entry and entry[0] > self.clock():
+                loaded = entry[2]
+                if loaded is None or (needed is not None and needed <= loaded):
+                    self.entries.move_to_end(phone_number)
+                    return entry[1]
+                if needed is not None:
+                    needed |= loaded
+
+        query = self.collection.where('PhoneNumber', '==', phone_number).limit(1)
+        if needed is not None:
+            query = query.select([FIRESTORE_FIELDS[field] for field in sorted(needed)])
+        for doc in query.stream():
+            user = UserRecord.from_firestore(doc.id, doc.to_dict())
+            self._store(user, needed)
+            return user
+        return None
+
+    def put(self, user: UserRecord):
+        """Cache a complete user"""
+        self._store(user, None)
+
+    def update(self, phone_number: str, **changes):
+        """Apply changes already written to Firestore to the cached user, if any"""
+        with self.lock:
+            entry = self.entries.get(phone_number)
+            if entry:
+                self.entries[phone_number] = (entry[0], dataclasses.replace(entry[1], **changes), entry[2])
+
+    def _store(self, user: UserRecord, loaded: frozenset):
+        with self.lock:
+            self.entries[user.phone_number] = (self.clock() + self.ttl, user, loaded)
+            self.entries.move_to_end(user.phone_number)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, phone_number: str):
+        with self.lock:
+            self.entries.pop(phone_number, None)
@@ -0,0 +1,109 @@
+import unittest
+from services.user_cache import UserCache
+from user import UserRecord
+from testing.fake_clock import FakeClock
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeUsers:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = 0
+        self.phone_number = None
+        self.selected = None
+
+    def collection(self, name):
+        return self
+
+    def where(self, field, op, value):
+        self.phone_number = value
+        return self
+
+    def limit(self, count):
+        self.selected = None
+        return self
+
+    def select(self, field_paths):
+        self.selected = list(field_paths)
+        return self
+
+    def stream(self):
+        self.queries += 1
+        return iter([FakeSnapshot(doc_id, {k: v for k, v in data.items() if self.selected is None or k in self.selected})
+                     for doc_id, data in self.docs.items() if data['PhoneNumber'] == self.phone_number])
+
+
+class TestUserCache(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeUsers({f"doc{i}": {'PhoneNumber': f"+1555000000{i}", 'NotionAPI': f"key{i}"} for i in range(4)})
+        self.clock = FakeClock(0.0)
+        self.cache = UserCache(self.db, ttl=60, max_size=2, clock=self.clock)
+
+    def test_hits_skip_firestore(self):
+        user = self.cache.get("+15550000001")
+        self.assertEqual(user.notion_api_key, "key1")
+        self.assertEqual(user.doc_id, "doc1")
+        self.assertIs(self.cache.get("+15550000001"), user)
+        self.assertEqual(self.db.queries, 1)
+
+    def test_entries_expire(self):
+        self.cache.get("+15550000001")
+        self.clock.now += 61
+        self.cache.get("+15550000001")
+        self.assertEqual(self.db.queries, 2)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.get("+15550000001")
+        self.cache.get("+15550000002")
+        self.cache.get("+15550000001")
+        self.cache.get("+15550000003")
+        self.assertEqual(len(self.cache), 2)
+        self.assertIn("+15550000001", self.cache.entries)
+        self.assertNotIn("+15550000002", self.cache.entries)
+
+    def test_put_and_invalidate(self):
+        self.cache.put(UserRecord("+15550000009", notion_api_key="new"))
+        self.assertEqual(self.cache.get("+15550000009").notion_api_key, "new")
+        self.cache.invalidate("+15550000009")
+        self.assertIsNone(self.cache.get("+15550000009"))
+        self.assertEqual(self.db.queries, 1)
+
+    def test_reads_only_requested_fields(self):
+        self.db.docs["doc1"]["Timezone"] = "America/New_York"
+        user = self.cache.get("+15550000001", fields=("notion_api_key",))
+        self.assertEqual(self.db.selected, ["NotionAPI", "PhoneNumber"])
+        self.assertEqual(user.notion_api_key, "key1")
+        self.assertEqual(user.timezone, "America/Los_Angeles")
+
+        # Covered by what is cached
+        self.assertIs(self.cache.get("+15550000001", fields=("notion_api_key",)), user)
+        self.assertEqual(self.db.queries, 1)
+
+        # More fields fetch the union; a full read replaces the partial record
+        user = self.cache.get("+15550000001", fields=("timezone",))
+        self.assertEqual(self.db.selected, ["NotionAPI", "PhoneNumber", "Timezone"])
+        self.assertEqual((user.notion_api_key, user.timezone), ("key1", "America/New_York"))
+        self.cache.get("+15550000001")
+        self.assertIsNone(self.db.selected)
+        self.cache.get("+15550000001", fields=("personality",))
+        self.assertEqual(self.db.queries, 3)
+
+    def test_update_keeps_partial_entries_partial(self):
+        self.cache.get("+15550000001", fields=("google_calendar_creds",))
+        self.cache.update("+15550000001", google_calendar_creds={"token": "new"})
+        self.assertEqual(self.cache.get("+15550000001", fields=("google_calendar_creds",)).google_calendar_creds, {"token": "new"})
+        self.assertEqual(self.db.queries, 1)
+        self.cache.get("+15550000001")
+        self.assertEqual(self.db.queries, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
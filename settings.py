@@ -0,0 +1,316 @@
+import copy
+import dataclasses
+import json
+import logging
+import os
+import signal
+import threading
+import time
+
+from dotenv import load_dotenv
+from constants.action_types import ActionType
+
+try:
+    load_dotenv()
+except:
+    pass
+
+
+# What Does this module do?
+# Loads configuration and secrets once, validates them, and hands out immutable snapshots
+#   - Values come from the environment, overridden by an optional JSON file (SETTINGS_FILE)
+#     that uses the same names, e.g. {"PUBLIC_URL": "...", "PERSONALITY": "uncle_iroh"}
+#   - The Google OAuth client secrets file is read and parsed once here, not per request
+#   - reload_settings() swaps in a new snapshot; watch_settings() calls it on SIGHUP or when
+#     either file changes. An invalid reload is logged and the previous snapshot is kept
+#   - Callers should call get_settings() once per request/job and use that snapshot throughout
+#   - A process passes the secrets it can't run without as `required` to its own load_settings()
+#     and watch_settings() calls; those loads (and reloads) fail while any of them is missing
+
+
+class SettingsError(ValueError):
+    pass
+
+
+def _flag(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _names(value) -> tuple:
+    """A comma-separated string (environment) or a list (settings file), upper-cased"""
+    if isinstance(value, str):
+        value = value.split(",")
+    return tuple(str(name).strip().upper() for name in value if str(name).strip())
+
+
+@dataclasses.dataclass(frozen=True)
+class Settings:
+    public_url: str = "https://textbot-service-939342988447.us-central1.run.app"
+    local_url: str = "https://fine-prawn-driven.ngrok-free.app"
+    is_public: bool = True
+    notion_database_id: str = "23eb9e96-e8f3-80a4-8b8d-c5e9cd16ef40"
+    # When on, Notion messages are appended to one page per user per day
+    # instead of each becoming its own titled page
+    notion_daily_log_mode: bool = False
+    flask_secret_key: str = "your-secret-key-here"
+    firebase_service_account: str = dataclasses.field(default=None, repr=False)
+    openai_api_key: str = dataclasses.field(default=None, repr=False)
+    openai_model: str = "gpt-4.1-mini"
+    grok_api_key: str = dataclasses.field(default=None, repr=False)
+    grok_model: str = "grok-4-latest"
+    personality: str = "schmidt"
+    google_client_secrets_file: str = "calendar_creds.json"
+    google_calendar_scopes: tuple = ("https://www.googleapis.com/auth/calendar",)
+    # Append sanitized /api/handleSmsReply payloads here (services/traffic_recorder.py)
+    traffic_record_path: str = None
+    # Key for the pseudonyms phone numbers get in recordings; default: random per process (startup only)
+    traffic_record_salt: str = dataclasses.field(default=None, repr=False)
+    # Local SQLite state (startup only). Must be on persistent storage that every instance mounts
+    # (e.g. a shared volume): on an instance's own disk it is lost on redeploy and each instance
+    # sees only its own copy
+    notion_queue_path: str = "notion_writes.db"
+    calendar_store_path: str = "calendar_events.db"
+    note_index_path: str = "note_index.db"
+    embedding_index_dir: str = "embeddings"
+    message_pool_path: str = "message_pool.db"
+    # Store embeddings as int8 instead of float32 (services/embedding_index.py, startup only)
+    embedding_index_quantize: bool = False
+    # Shards users are split into across instances, and seconds between broadcasts (0 = off) (startup only)
+    shard_count: int = 64
+    broadcast_interval_seconds: float = 0.0
+    # Per-sender reply lanes: how many, and replies each may queue before new ones are shed (startup only)
+    sms_lanes: int = 16
+    sms_lane_depth: int = 50
+    # Admission control: replies each sender may send per minute and in a burst, and replies
+    # processed or queued at once before the rest are shed (startup only)
+    sms_sender_per_minute: float = 10.0
+    sms_sender_burst: float = 5.0
+    sms_max_in_flight: int = 200
+    # Provider calls in flight at once, shared by interactive, scheduled and bulk work (startup only)
+    llm_concurrency: int = 8
+    sms_send_concurrency: int = 4
+    notion_concurrency: int = 4
+    calendar_concurrency: int = 4
+    # Load tests only: replace Grok, Notion, Google Calendar and Textbelt with stubs (startup only)
+    stub_providers: bool = False
+    # With stub_providers, the ActionType name every reply is classified as (default: guessed from its text)
+    stub_action: str = None
+    # Tests/benchmarks only: record or replay provider calls (services/cassette.py, startup only)
+    cassette_path: str = None
+    cassette_mode: str = "replay"
+    cassette_recorded_latency: bool = False
+    # ActionType names this deployment handles, e.g. ("NOTION", "NOTION_QUERY"); None means all
+    enabled_actions: tuple = None
+    _google_client_config: dict = dataclasses.field(default=None, repr=False, compare=False)
+
+    @property
+    def base_url(self) -> str:
+        """Where Textbelt replies and OAuth redirects reach this service"""
+        return self.public_url if self.is_public else self.local_url
+
+    @property
+    def google_oauth_redirect_uri(self) -> str:
+        return f"{self.base_url}/api/auth/google/callback"
+
+    def google_client_config(self) -> dict:
+        """A fresh copy of the parsed client secrets, for Flow.from_client_config"""
+        if self._google_client_config is None:
+            raise SettingsError(f"Google client secrets not found at {self.google_client_secrets_file}")
+        return copy.deepcopy(self._google_client_config)
+
+
+# Environment / settings-file name -> (field, parser)
+SETTING_SOURCES = {
+    "PUBLIC_URL": ("public_url", str),
+    "LOCAL_URL": ("local_url", str),
+    "IS_PUBLIC": ("is_public", _flag),
+    "NOTION_DATABASE_ID": ("notion_database_id", str),
+    "NOTION_DAILY_LOG_MODE": ("notion_daily_log_mode", _flag),
+    "FLASK_SECRET_KEY": ("flask_secret_key", str),
+    "FIREBASE_SERVICE_ACCOUNT": ("firebase_service_account", str),
+    "OPENAI_API_KEY": ("openai_api_key", str),
+    "OPENAI_MODEL": ("openai_model", str),
+    "GROK_API_KEY": ("grok_api_key", str),
+    "GROK_MODEL": ("grok_model", str),
+    "PERSONALITY": ("personality", str),
+    "GOOGLE_CLIENT_SECRETS_FILE": ("google_client_secrets_file", str),
+    "TRAFFIC_RECORD_PATH": ("traffic_record_path", str),
+    "TRAFFIC_RECORD_SALT": ("traffic_record_salt", str),
+    "NOTION_QUEUE_PATH": ("notion_queue_path", str),
+    "CALENDAR_STORE_PATH": ("calendar_store_path", str),
+    "NOTE_INDEX_PATH": ("note_index_path", str),
+    "EMBEDDING_INDEX_DIR": ("embedding_index_dir", str),
+    "MESSAGE_POOL_PATH": ("message_pool_path", str),
+    "EMBEDDING_INDEX_QUANTIZE": ("embedding_index_quantize", _flag),
+    "SHARD_COUNT": ("shard_count", int),
+    "BROADCAST_INTERVAL_SECONDS": ("broadcast_interval_seconds", float),
+    "SMS_LANES": ("sms_lanes", int),
+    "SMS_LANE_DEPTH": ("sms_lane_depth", int),
+    "SMS_SENDER_PER_MINUTE": ("sms_sender_per_minute", float),
+    "SMS_SENDER_BURST": ("sms_sender_burst", float),
+    "SMS_MAX_IN_FLIGHT": ("sms_max_in_flight", int),
+    "LLM_CONCURRENCY": ("llm_concurrency", int),
+    "SMS_SEND_CONCURRENCY": ("sms_send_concurrency", int),
+    "NOTION_CONCURRENCY": ("notion_concurrency", int),
+    "CALENDAR_CONCURRENCY": ("calendar_concurrency", int),
+    "STUB_PROVIDERS": ("stub_providers", _flag),
+    "STUB_ACTION": ("stub_action", lambda value: str(value).strip().upper()),
+    "CASSETTE_PATH": ("cassette_path", str),
+    "CASSETTE_MODE": ("cassette_mode", str),
+    "CASSETTE_RECORDED_LATENCY": ("cassette_recorded_latency", _flag),
+    "ENABLED_ACTIONS": ("enabled_actions", _names),
+}
+PERSONALITIES = ("rude_coach", "uncle_iroh", "schmidt", "normal_person", "random")
+
+# Counts and rates that must be above zero
+POSITIVE_SETTINGS = ("shard_count", "sms_lanes", "sms_lane_depth", "sms_sender_per_minute", "sms_sender_burst",
+                     "sms_max_in_flight", "llm_concurrency", "sms_send_concurrency", "notion_concurrency",
+                     "calendar_concurrency")
+
+
+def _check_required(fields: dict, required):
+    missing = sorted(name for name in required if fields.get(SETTING_SOURCES[name][0]) in (None, ""))
+    if missing:
+        raise SettingsError(f"Missing required settings: {', '.join(missing)}")
+
+
+def load_settings(environ=None, settings_file: str = None, required=()) -> Settings:
+    """
+    Build and validate a Settings snapshot
+
+    Args:
+        environ: Mapping to read (default: os.environ)
+        settings_file: JSON overrides (default: $SETTINGS_FILE, if set)
+        required: Setting names that must be set, e.g. ("FIREBASE_SERVICE_ACCOUNT",)
+
+    Raises:
+        SettingsError: On a malformed file, an invalid value or a missing required setting
+    """
+    environ = os.environ if environ is None else environ
+    values = {name: environ[name] for name in SETTING_SOURCES if environ.get(name) not in (None, "")}
+
+    settings_file = settings_file or environ.get("SETTINGS_FILE")
+    if settings_file:
+        try:
+            with open(settings_file) as f:
+                overrides = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise SettingsError(f"Could not read {settings_file}: {e}")
+        unknown = sorted(set(overrides) - set(SETTING_SOURCES))
+        if unknown:
+            raise SettingsError(f"Unknown settings in {settings_file}: {', '.join(unknown)}")
+        values.update(overrides)
+
+    fields = {}
+    for name, (field, parse) in SETTING_SOURCES.items():
+        if name in values:
+            try:
+                fields[field] = parse(values[name])
+            except (TypeError, ValueError) as e:
+                raise SettingsError(f"Invalid {name}: {e}")
+    _check_required(fields, required)
+
+    for field in ("public_url", "local_url"):
+        url = fields.get(field)
+        if url is not None and not url.startswith("https://"):
+            raise SettingsError(f"{field} must be an https:// URL")
+        if url is not None:
+            fields[field] = url.rstrip("/")
+    for field in POSITIVE_SETTINGS:
+        if field in fields and fields[field] <= 0:
+            raise SettingsError(f"{field} must be greater than zero")
+    if fields.get("broadcast_interval_seconds", 0) < 0:
+        raise SettingsError("broadcast_interval_seconds can't be negative")
+    if fields.get("personality", "schmidt") not in PERSONALITIES:
+        raise SettingsError(f"personality must be one of {', '.join(PERSONALITIES)}")
+    if fields.get("cassette_mode", "replay") not in ("replay", "record", "once"):
+        raise SettingsError("cassette_mode must be one of replay, record, once")
+    unknown_actions = sorted(set(fields.get("enabled_actions") or ()) - set(ActionType.__members__))
+    if unknown_actions:
+        raise SettingsError(f"Unknown actions in ENABLED_ACTIONS: {', '.join(unknown_actions)}")
+    if fields.get("stub_action") and fields["stub_action"] not in ActionType.__members__:
+        raise SettingsError(f"Unknown STUB_ACTION: {fields['stub_action']}")
+    if fields.get("firebase_service_account"):
+        try:
+            json.loads(fields["firebase_service_account"])
+        except json.JSONDecodeError as e:
+            raise SettingsError(f"FIREBASE_SERVICE_ACCOUNT is not valid JSON: {e}")
+
+    secrets_file = fields.get("google_client_secrets_file", Settings.google_client_secrets_file)
+    if os.path.exists(secrets_file):
+        try:
+            with open(secrets_file) as f:
+                client_config = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise SettingsError(f"Could not read {secrets_file}: {e}")
+        if "web" not in client_config and "installed" not in client_config:
+            raise SettingsError(f"{secrets_file} is not a Google OAuth client secrets file")
+        fields["_google_client_config"] = client_config
+
+    return Settings(**fields)
+
+
+_current = None
+_lock = threading.Lock()
+_watcher = None
+
+
+def get_settings() -> Settings:
+    """The current snapshot, loaded on first use"""
+    global _current
+    if _current is None:
+        with _lock:
+            if _current is None:
+                _current = load_settings()
+    return _current
+
+
+def reload_settings(required=()) -> bool:
+    """Load a new snapshot; on failure keep the old one. Returns whether settings were replaced"""
+    global _current
+    try:
+        new_settings = load_settings(required=required)
+    except SettingsError as e:
+        logging.error(f"Keeping previous settings: {e}")
+        return False
+    with _lock:
+        _current = new_settings
+    logging.info("Settings reloaded")
+    return True
+
+
+def _watched_mtimes() -> dict:
+    paths = [get_settings().google_client_secrets_file, os.environ.get("SETTINGS_FILE")]
+    return {path: os.path.getmtime(path) if os.path.exists(path) else None for path in paths if path}
+
+
+def watch_settings(interval: float = 5.0, required=()):
+    """
+    Reload on SIGHUP, and whenever the settings or client secrets file changes
+
+    Args:
+        interval: Seconds between checks of the watched files
+        required: Setting names a reload must keep set; otherwise the old snapshot stays
+    """
+    global _watcher
+    if _watcher:
+        return
+    try:
+        signal.signal(signal.SIGHUP, lambda signum, frame: reload_settings(required))
+    except (ValueError, AttributeError):
+        # Not on the main thread, or no SIGHUP on this platform; polling still works
+        pass
+
+    def poll():
+        seen = _watched_mtimes()
+        while True:
+            time.sleep(interval)
+            mtimes = _watched_mtimes()
+            if mtimes != seen:
+                reload_settings(required)
+                seen = _watched_mtimes()
+
+    _watcher = threading.Thread(target=poll, name="settings-watcher", daemon=True)
+    _watcher.start()
@@ -0,0 +1,144 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+from unittest.mock import patch
+import settings
+from settings import SettingsError, load_settings, reload_settings, get_settings
+
+
+class TestSettings(unittest.TestCase):
+    """Test suite for the settings loader"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.secrets_file = os.path.join(self.tmp.name, "calendar_creds.json")
+        self.settings_file = os.path.join(self.tmp.name, "settings.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, data):
+        with open(path, "w") as f:
+            f.write(data if isinstance(data, str) else json.dumps(data))
+
+    def test_defaults_and_environment(self):
+        loaded = load_settings({"IS_PUBLIC": "false", "NOTION_DAILY_LOG_MODE": "1", "GOOGLE_CLIENT_SECRETS_FILE": self.secrets_file})
+        self.assertFalse(loaded.is_public)
+        self.assertTrue(loaded.notion_daily_log_mode)
+        self.assertFalse(loaded.embedding_index_quantize)
+        self.assertEqual(loaded.base_url, loaded.local_url)
+        self.assertEqual(loaded.google_oauth_redirect_uri, f"{loaded.local_url}/api/auth/google/callback")
+        with self.assertRaises(SettingsError):
+            loaded.google_client_config()
+
+    def test_settings_file_overrides_environment(self):
+        self.write(self.settings_file, {"PUBLIC_URL": "https://example.com/", "PERSONALITY": "uncle_iroh"})
+        loaded = load_settings({"PUBLIC_URL": "https://env.example.com", "SETTINGS_FILE": self.settings_file})
+        self.assertEqual(loaded.public_url, "https://example.com")
+        self.assertEqual(loaded.personality, "uncle_iroh")
+
+    def test_snapshots_are_immutable(self):
+        loaded = load_settings({})
+        with self.assertRaises(AttributeError):
+            loaded.public_url = "https://other.example.com"
+
+    def test_client_secrets_are_parsed_once_and_copied_out(self):
+        self.write(self.secrets_file, {"web": {"client_id": "id", "client_secret": "secret"}})
+        loaded = load_settings({"GOOGLE_CLIENT_SECRETS_FILE": self.secrets_file})
+        os.remove(self.secrets_file)
+
+        config = loaded.google_client_config()
+        config["web"]["client_id"] = "changed"
+        self.assertEqual(loaded.google_client_config()["web"]["client_id"], "id")
+
+    def test_rejects_invalid_values(self):
+        for environ in [{"PUBLIC_URL": "http://insecure.example.com"}, {"PERSONALITY": "pirate"},
+                        {"FIREBASE_SERVICE_ACCOUNT": "{not json"}, {"ENABLED_ACTIONS": "notion,habitify"},
+                        {"CASSETTE_MODE": "rewind"}, {"STUB_ACTION": "habitify"}, {"LLM_CONCURRENCY": "eight"}, {"CALENDAR_CONCURRENCY": "0"}, {"SMS_SENDER_BURST": "0"}, {"SMS_LANES": "0"}, {"SHARD_COUNT": "many"},
+                        {"SHARD_COUNT": "0"}, {"BROADCAST_INTERVAL_SECONDS": "-1"}]:
+            with self.assertRaises(SettingsError):
+                load_settings(environ)
+
+        self.write(self.settings_file, {"PUBLC_URL": "https://typo.example.com"})
+        with self.assertRaises(SettingsError):
+            load_settings({"SETTINGS_FILE": self.settings_file})
+
+        self.write(self.secrets_file, {"client_id": "missing the web/installed wrapper"})
+        with self.assertRaises(SettingsError):
+            load_settings({"GOOGLE_CLIENT_SECRETS_FILE": self.secrets_file})
+
+    def test_tuning_knobs(self):
+        """Counts, rates and intervals are parsed into numbers"""
+        loaded = load_settings({"SHARD_COUNT": "16", "BROADCAST_INTERVAL_SECONDS": "3600", "TRAFFIC_RECORD_SALT": "pepper"})
+        self.assertEqual((loaded.shard_count, loaded.broadcast_interval_seconds), (16, 3600.0))
+        self.assertEqual(load_settings({}).broadcast_interval_seconds, 0.0)
+        self.assertEqual(load_settings({"SMS_LANES": "4"}).sms_lanes, 4)
+        self.assertEqual(load_settings({"SMS_SENDER_PER_MINUTE": "2.5"}).sms_sender_per_minute, 2.5)
+        self.assertEqual(load_settings({"LLM_CONCURRENCY": "3"}).llm_concurrency, 3)
+        self.assertEqual(load_settings({"NOTION_CONCURRENCY": "2"}).notion_concurrency, 2)
+        self.assertEqual(load_settings({"NOTION_QUEUE_PATH": "/mnt/state/notion_writes.db"}).notion_queue_path,
+                         "/mnt/state/notion_writes.db")
+        self.assertNotIn("pepper", repr(loaded))
+
+    def test_enabled_actions(self):
+        self.assertIsNone(load_settings({}).enabled_actions)
+        self.assertEqual(load_settings({"ENABLED_ACTIONS": "notion, notion_query"}).enabled_actions, ("NOTION", "NOTION_QUERY"))
+        self.write(self.settings_file, {"ENABLED_ACTIONS": ["CALENDAR"]})
+        self.assertEqual(load_settings({"SETTINGS_FILE": self.settings_file}).enabled_actions, ("CALENDAR",))
+
+    def test_reload_keeps_previous_snapshot_on_error(self):
+        self.write(self.settings_file, {"PERSONALITY": "uncle_iroh"})
+        with patch.dict(os.environ, {"SETTINGS_FILE": self.settings_file}), patch.object(settings, "_current", None):
+            self.assertEqual(get_settings().personality, "uncle_iroh")
+
+            self.write(self.settings_file, {"PERSONALITY": "normal_person"})
+            self.assertTrue(reload_settings())
+            self.assertEqual(get_settings().personality, "normal_person")
+
+            self.write(self.settings_file, "{broken")
+            self.assertFalse(reload_settings())
+            self.assertEqual(get_settings().personality, "normal_person")
+
+    def test_required_settings(self):
+        """A required secret that is missing fails the load, and a reload that drops it is refused"""
+        with self.assertRaises(SettingsError):
+            load_settings({}, required=("FIREBASE_SERVICE_ACCOUNT",))
+        self.assertEqual(load_settings({"FIREBASE_SERVICE_ACCOUNT": "{}"}, required=("FIREBASE_SERVICE_ACCOUNT",))
+                         .firebase_service_account, "{}")
+
+        self.write(self.settings_file, {"FIREBASE_SERVICE_ACCOUNT": "{}"})
+        with patch.dict(os.environ, {"SETTINGS_FILE": self.settings_file}), patch.object(settings, "_current", None):
+            self.assertEqual(get_settings().firebase_service_account, "{}")
+
+            self.write(self.settings_file, {})
+            self.assertFalse(reload_settings(required=("FIREBASE_SERVICE_ACCOUNT",)))
+            self.assertEqual(get_settings().firebase_service_account, "{}")
+            self.assertTrue(reload_settings())
+            self.assertIsNone(get_settings().firebase_service_account)
+
+    def test_importing_app_leaves_other_callers_alone(self):
+        """app requires Firebase for itself only; later loads elsewhere don't need it"""
+        script = textwrap.dedent("""
+            from unittest.mock import MagicMock, patch
+            import firebase_admin
+            from firebase_admin import credentials, firestore
+            with patch.object(firebase_admin, "initialize_app"), \\
+                    patch.object(credentials, "Certificate"), \\
+                    patch.object(firestore, "client", MagicMock()):
+                import app
+            import settings
+            print(settings.load_settings({}).firebase_service_account)
+        """)
+        environ = {**os.environ, "FIREBASE_SERVICE_ACCOUNT": "{}", "OPENAI_API_KEY": "test-key",
+                   "PYTHONPATH": os.path.dirname(os.path.abspath(__file__))}
+        result = subprocess.run([sys.executable, "-c", script], cwd=self.tmp.name, env=environ,
+                                capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip().splitlines()[-1], "None")
+
+if __name__ == '__main__':
+    unittest.main()
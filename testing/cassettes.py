@@ -0,0 +1,31 @@
+import os
+import unittest
+from services.cassette import Cassette
+
+
+# What Does this module do?
+# Cassettes for the live provider tests in api_interaction/
+#   - Calls are recorded on the first run with real keys, then replayed offline without them
+#   - CASSETTE_MODE=record refreshes a recording; the files live in api_interaction/cassettes/
+
+CASSETTES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api_interaction", "cassettes")
+
+
+def install_cassette(name: str) -> Cassette:
+    return Cassette(os.path.join(CASSETTES, name), os.getenv("CASSETTE_MODE", "once")).install()
+
+
+def install_or_skip(name: str, *env_vars: str) -> Cassette:
+    """
+    Install a cassette, or skip the test class if there is neither a recording to
+    replay nor the credentials to record one
+
+    Args:
+        name: Cassette file name
+        env_vars: Credentials a recording run needs
+    """
+    cassette = install_cassette(name)
+    if not cassette.recorded and not all(os.getenv(var) for var in env_vars):
+        cassette.eject()
+        raise unittest.SkipTest(f"No recording in {name}; record it with {', '.join(env_vars)} set")
+    return cassette
@@ -0,0 +1,20 @@
+# What Does this module do?
+# Manual clock for tests of code that takes an injected `clock` callable
+
+
+class FakeClock:
+    """
+    Callable stand-in for time.time / time.monotonic
+
+    Tests move time forward with `clock.now += seconds`. With a `step`, every
+    call advances the clock first, which gives each timed operation a fixed
+    duration.
+    """
+
+    def __init__(self, now: float = 1000.0, step: float = 0.0):
+        self.now = now
+        self.step = step
+
+    def __call__(self) -> float:
+        self.now += self.step
+        return self.now
@@ -1,16 +1,87 @@
-class User:
-    def __init__(self, phone_number, notion_api_key, interests):
-        self.phone_number = phone_number,
-        self.notion_api_key = notion_api_key
-        self.interests = interests
-    
-    def get_phone_number(self):
-        return self.phone_number
-
-    def get_interests(self):
-        return self.interests
-    
-    def get_notion_api_key(self):
-        return self.notion_api_key
-    
-    
\ No newline at end of file
+import dataclasses
+from constants.action_types import ActionType
+
+
+DEFAULT_TIMEZONE = 'America/Los_Angeles'
+
+# UserRecord field -> Firestore document field, for reading only some fields of a user
+FIRESTORE_FIELDS = {
+    'phone_number': 'PhoneNumber',
+    'notion_api_key': 'NotionAPI',
+    'interests': 'UserInterests',
+    'google_calendar_creds': 'GoogleCalendarCreds',
+    'timezone': 'Timezone',
+    'personality': 'Personality',
+}
+
+
+def parse_interests(value) -> tuple:
+    """
+    Interests as a tuple of strings
+
+    The canonical stored form is a list of strings. Older documents hold one
+    comma-separated string, which is split here.
+    """
+    if not value:
+        return ()
+    if isinstance(value, str):
+        value = value.split(',')
+    return tuple(item.strip() for item in value if item and item.strip())
+
+
+@dataclasses.dataclass(slots=True)
+class UserRecord:
+    """
+    One user, as cached in memory and shared by handlers and schedulers
+
+    Slotted, so each cached user costs a fixed handful of references.
+    Firestore field names are only known to FIRESTORE_FIELDS and
+    from_firestore/to_firestore.
+    """
+    phone_number: str
+    notion_api_key: str = None
+    interests: tuple = ()
+    google_calendar_creds: dict = None
+    timezone: str = DEFAULT_TIMEZONE
+    personality: str = None
+    doc_id: str = None
+
+    @classmethod
+    def from_firestore(cls, doc_id: str, data: dict) -> "UserRecord":
+        return cls(
+            phone_number=data.get('PhoneNumber'),
+            notion_api_key=data.get('NotionAPI'),
+            interests=parse_interests(data.get('UserInterests')),
+            google_calendar_creds=data.get('GoogleCalendarCreds'),
+            timezone=data.get('Timezone') or DEFAULT_TIMEZONE,
+            personality=data.get('Personality'),
+            doc_id=doc_id
+        )
+
+    def to_firestore(self) -> dict:
+        """Document fields for this user; unset optional fields are left out"""
+        data = {'PhoneNumber': self.phone_number}
+        if self.notion_api_key is not None:
+            data['NotionAPI'] = self.notion_api_key
+        if self.interests:
+            data['UserInterests'] = list(self.interests)
+        if self.google_calendar_creds is not None:
+            data['GoogleCalendarCreds'] = self.google_calendar_creds
+        if self.timezone != DEFAULT_TIMEZONE:
+            data['Timezone'] = self.timezone
+        if self.personality is not None:
+            data['Personality'] = self.personality
+        return data
+
+    @property
+    def interests_text(self) -> str:
+        """Interests as one string, for prompts"""
+        return ", ".join(self.interests)
+
+    def key_for(self, action_type: ActionType):
+        """The credential a handler needs for `action_type`, or None"""
+        if action_type in (ActionType.NOTION, ActionType.NOTION_QUERY):
+            return self.notion_api_key
+        if action_type in (ActionType.CALENDAR, ActionType.GOOGLE_CALENDAR):
+            return self.google_calendar_creds
+        return None
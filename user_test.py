@@ -0,0 +1,57 @@
+import dataclasses
+import unittest
+from constants.action_types import ActionType
+from user import UserRecord, DEFAULT_TIMEZONE, parse_interests
+
+
+class TestUserRecord(unittest.TestCase):
+    """Test suite for UserRecord"""
+
+    def test_round_trips_firestore_documents(self):
+        data = {
+            'PhoneNumber': '+15551234567',
+            'NotionAPI': 'secret',
+            'UserInterests': ['running', 'chess'],
+            'GoogleCalendarCreds': {'token': 't'},
+            'Timezone': 'America/New_York',
+            'Personality': 'uncle_iroh'
+        }
+        user = UserRecord.from_firestore('doc1', data)
+        self.assertEqual(user.phone_number, '+15551234567')
+        self.assertEqual(user.interests, ('running', 'chess'))
+        self.assertEqual(user.doc_id, 'doc1')
+        self.assertEqual(user.to_firestore(), data)
+
+    def test_minimal_document(self):
+        user = UserRecord.from_firestore('doc1', {'PhoneNumber': '+15551234567', 'UserInterests': 'running, chess'})
+        self.assertEqual(user.interests_text, 'running, chess')
+        self.assertEqual(user.timezone, DEFAULT_TIMEZONE)
+        self.assertIsNone(user.notion_api_key)
+        self.assertEqual(user.to_firestore(), {'PhoneNumber': '+15551234567', 'UserInterests': ['running', 'chess']})
+
+    def test_interests_round_trip_as_a_list(self):
+        """Legacy comma-separated interests are split once and then stay a list of strings"""
+        user = UserRecord('+15551234567', interests=('running', 'chess'))
+        self.assertEqual(UserRecord.from_firestore('doc1', user.to_firestore()), dataclasses.replace(user, doc_id='doc1'))
+
+        legacy = UserRecord.from_firestore('doc1', {'PhoneNumber': '+15551234567', 'UserInterests': ' running,,chess '})
+        self.assertEqual(legacy.interests, ('running', 'chess'))
+        self.assertEqual(UserRecord.from_firestore('doc1', legacy.to_firestore()), legacy)
+        self.assertEqual(parse_interests(None), ())
+
+    def test_key_for_action_type(self):
+        user = UserRecord('+15551234567', notion_api_key='secret', google_calendar_creds={'token': 't'})
+        self.assertEqual(user.key_for(ActionType.NOTION), 'secret')
+        self.assertEqual(user.key_for(ActionType.NOTION_QUERY), 'secret')
+        self.assertEqual(user.key_for(ActionType.GOOGLE_CALENDAR), {'token': 't'})
+        self.assertIsNone(user.key_for(ActionType.ERROR))
+
+    def test_slotted(self):
+        user = UserRecord('+15551234567')
+        self.assertFalse(hasattr(user, '__dict__'))
+        with self.assertRaises(AttributeError):
+            user.nickname = 'x'
+
+
+if __name__ == '__main__':
+    unittest.main()